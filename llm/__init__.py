@@ -1,4 +1,4 @@
-from .connector import LLMConnector
+from .connector import LLMConnector, get_llm_connector
 from .config import LLMConfig
 
-__all__ = ['LLMConnector', 'LLMConfig'] 
\ No newline at end of file
+__all__ = ['LLMConnector', 'LLMConfig', 'get_llm_connector'] 
\ No newline at end of file
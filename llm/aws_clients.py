@@ -0,0 +1,110 @@
+"""
+Process-wide pool of boto3 clients for the Bedrock provider.
+
+Creating a boto3 client loads the service model and resolves credentials,
+which takes tens of milliseconds. Provider instances are rebuilt whenever
+their configuration changes, and batch backends create their own clients.
+Instead of building new clients each time, they all share one client per
+service and settings. Low-level boto3 clients are thread-safe, so one client
+(and its connection pool) serves every thread in the worker.
+
+Clients are keyed by service, region, credentials and retry/pool settings:
+
+    ProviderConfig.base_url                     region (default us-east-1)
+    ProviderConfig.api_key                      "ACCESS_KEY:SECRET_KEY", or empty for
+                                                the default credential chain
+    additional_params["max_retries"]            total attempts per call (default 3)
+    additional_params["max_pool_connections"]   connections kept per client (default 25)
+"""
+import hashlib
+import threading
+from typing import Dict, Tuple
+
+import boto3
+from botocore.config import Config
+
+from .config import ProviderConfig
+
+DEFAULT_REGION = "us-east-1"
+# Total attempts per call, including the first one
+DEFAULT_MAX_RETRIES = 3
+# botocore keeps 10 by default, fewer than the job threads that share a client
+DEFAULT_MAX_POOL_CONNECTIONS = 25
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def client_settings(config: ProviderConfig) -> Dict:
+    """Read the client settings from a provider configuration."""
+    params = config.additional_params or {}
+    access_key = secret_key = None
+    # For Bedrock, the API key is actually the AWS access key ID
+    if config.api_key and ":" in config.api_key:
+        # Format: "ACCESS_KEY:SECRET_KEY"
+        access_key, secret_key = config.api_key.split(":", 1)
+    return {
+        "region": config.base_url or DEFAULT_REGION,
+        "access_key": access_key,
+        "secret_key": secret_key,
+        "max_attempts": int(params.get("max_retries", DEFAULT_MAX_RETRIES)),
+        "max_pool_connections": int(params.get("max_pool_connections", DEFAULT_MAX_POOL_CONNECTIONS)),
+    }
+
+
+def _key(service_name: str, settings: Dict) -> Tuple:
+    # The secret is only kept in the client itself, not in the key
+    secret_hash = hashlib.sha256(settings["secret_key"].encode()).hexdigest() if settings["secret_key"] else None
+    return (service_name, settings["region"], settings["access_key"], secret_hash,
+            settings["max_attempts"], settings["max_pool_connections"])
+
+
+def boto_config(settings: Dict) -> Config:
+    """The botocore Config for a set of client settings."""
+    # Throttling is handled by the connector's rate limiter, so keep
+    # boto's own retries short and latency predictable
+    return Config(
+        region_name=settings["region"],
+        signature_version="v4",
+        retries={"max_attempts": settings["max_attempts"], "mode": "standard"},
+        max_pool_connections=settings["max_pool_connections"]
+    )
+
+
+def get_client(service_name: str, settings: Dict):
+    """Get the shared client for a service and settings, creating it on first use."""
+    key = _key(service_name, settings)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _lock:
+        # Another thread may have created it while this one waited
+        client = _clients.get(key)
+        if client is None:
+            client_kwargs = {"service_name": service_name, "config": boto_config(settings)}
+            # Without keys, boto3 uses the default credential provider chain
+            if settings["access_key"]:
+                client_kwargs["aws_access_key_id"] = settings["access_key"]
+                client_kwargs["aws_secret_access_key"] = settings["secret_key"]
+            client = boto3.client(**client_kwargs)
+            _clients[key] = client
+        return client
+
+
+def release_clients(settings: Dict) -> int:
+    """Drop the clients built with these settings, for every service.
+
+    The next get_client creates new ones. Calls already running keep the
+    client they have, so it is not closed here.
+
+    Returns:
+        Number of clients dropped
+    """
+    settings_key = _key(None, settings)[1:]
+    with _lock:
+        keys = [key for key in _clients if key[1:] == settings_key]
+        for key in keys:
+            del _clients[key]
+    return len(keys)
+
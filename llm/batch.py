@@ -0,0 +1,368 @@
+"""
+Offline batch inference backends.
+
+Batch APIs take a JSONL file of requests, run them within a completion
+window (usually hours) at a lower price than synchronous calls, and return
+a JSONL file of results. Each backend turns prompts into its provider's
+request lines, submits the file, reports the job status and reads the
+results back as (record_id, text, error) tuples:
+
+    - OpenAIBatchBackend: the OpenAI Batch API (/v1/chat/completions)
+    - BedrockBatchBackend: Bedrock model invocation jobs, with the files on S3
+    - LocalBatchBackend: a file-based stand-in that runs the requests
+      through any provider's generate_text, for testing and development
+"""
+import json
+import os
+import shutil
+import uuid
+from datetime import datetime
+from typing import Dict, Iterator, Optional, Tuple
+from urllib.parse import urlsplit
+
+from .config import provider_type
+
+# Normalized job states
+BATCH_SUBMITTED = 'submitted'
+BATCH_IN_PROGRESS = 'in_progress'
+BATCH_COMPLETED = 'completed'
+BATCH_FAILED = 'failed'
+BATCH_CANCELLED = 'cancelled'
+BATCH_EXPIRED = 'expired'
+
+FINISHED_BATCH_STATES = (BATCH_COMPLETED, BATCH_FAILED, BATCH_CANCELLED, BATCH_EXPIRED)
+
+OPENAI_STATES = {
+    'validating': BATCH_SUBMITTED,
+    'in_progress': BATCH_IN_PROGRESS,
+    'finalizing': BATCH_IN_PROGRESS,
+    'completed': BATCH_COMPLETED,
+    'failed': BATCH_FAILED,
+    'expired': BATCH_EXPIRED,
+    'cancelling': BATCH_IN_PROGRESS,
+    'cancelled': BATCH_CANCELLED
+}
+
+BEDROCK_STATES = {
+    'Submitted': BATCH_SUBMITTED,
+    'Validating': BATCH_SUBMITTED,
+    'Scheduled': BATCH_SUBMITTED,
+    'InProgress': BATCH_IN_PROGRESS,
+    'Stopping': BATCH_IN_PROGRESS,
+    'Completed': BATCH_COMPLETED,
+    # Some records failed; their errors are reported per record
+    'PartiallyCompleted': BATCH_COMPLETED,
+    'Failed': BATCH_FAILED,
+    'Stopped': BATCH_CANCELLED,
+    'Expired': BATCH_EXPIRED
+}
+
+DEFAULT_COMPLETION_WINDOW = '24h'
+DEFAULT_BEDROCK_TIMEOUT_HOURS = 24
+# Batch jobs run Claude models through the Messages API only
+BEDROCK_ANTHROPIC_VERSION = 'bedrock-2023-05-31'
+
+
+class BatchBackend:
+    """Base class for batch inference backends.
+
+    A job handle is a JSON-serializable dict returned by `submit`; callers
+    store it and pass it back to `status`, `results` and `cancel`.
+    """
+
+    name = 'base'
+
+    def request_line(self, record_id: str, prompt: str, max_tokens: Optional[int] = None,
+                     temperature: Optional[float] = None) -> Dict:
+        """Build one line of the input JSONL file."""
+        raise NotImplementedError
+
+    def submit(self, input_path: str, job_name: str) -> Dict:
+        """Submit an input file; returns the job handle."""
+        raise NotImplementedError
+
+    def status(self, handle: Dict) -> Tuple[str, Dict]:
+        """Get the job state (one of the BATCH_* states) and its request counts."""
+        raise NotImplementedError
+
+    def results(self, handle: Dict) -> Iterator[Tuple[str, Optional[str], Optional[str]]]:
+        """Yield (record_id, text, error) for every record of a finished job."""
+        raise NotImplementedError
+
+    def cancel(self, handle: Dict):
+        """Ask the provider to stop the job."""
+        raise NotImplementedError
+
+
+class OpenAIBatchBackend(BatchBackend):
+    """OpenAI Batch API: chat completions run within a 24 hour window."""
+
+    name = 'openai'
+
+    def __init__(self, provider, completion_window: str = DEFAULT_COMPLETION_WINDOW):
+        self.provider = provider
+        self.client = provider.client
+        self.completion_window = completion_window
+
+    def request_line(self, record_id: str, prompt: str, max_tokens: Optional[int] = None,
+                     temperature: Optional[float] = None) -> Dict:
+        config = self.provider.config
+        return {
+            'custom_id': record_id,
+            'method': 'POST',
+            'url': '/v1/chat/completions',
+            'body': {
+                'model': self.provider.model,
+                'messages': [{'role': 'user', 'content': prompt}],
+                'max_tokens': max_tokens or config.max_tokens,
+                'temperature': temperature if temperature is not None else config.temperature
+            }
+        }
+
+    def submit(self, input_path: str, job_name: str) -> Dict:
+        with open(input_path, 'rb') as f:
+            input_file = self.client.files.create(file=f, purpose='batch')
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint='/v1/chat/completions',
+            completion_window=self.completion_window,
+            metadata={'name': job_name}
+        )
+        return {'backend': self.name, 'batch_id': batch.id, 'input_file_id': input_file.id}
+
+    def status(self, handle: Dict) -> Tuple[str, Dict]:
+        batch = self.client.batches.retrieve(handle['batch_id'])
+        counts = batch.request_counts
+        return OPENAI_STATES.get(batch.status, BATCH_IN_PROGRESS), {
+            'total': getattr(counts, 'total', 0) if counts else 0,
+            'completed': getattr(counts, 'completed', 0) if counts else 0,
+            'failed': getattr(counts, 'failed', 0) if counts else 0
+        }
+
+    def results(self, handle: Dict) -> Iterator[Tuple[str, Optional[str], Optional[str]]]:
+        batch = self.client.batches.retrieve(handle['batch_id'])
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            content = self.client.files.content(file_id)
+            for line in content.text.splitlines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                response = record.get('response') or {}
+                body = response.get('body') or {}
+                if record.get('error') or response.get('status_code', 200) != 200:
+                    error = record.get('error') or body.get('error') or f"HTTP {response.get('status_code')}"
+                    yield record['custom_id'], None, json.dumps(error) if not isinstance(error, str) else error
+                else:
+                    yield record['custom_id'], body['choices'][0]['message']['content'], None
+
+    def cancel(self, handle: Dict):
+        self.client.batches.cancel(handle['batch_id'])
+
+
+class BedrockBatchBackend(BatchBackend):
+    """Bedrock model invocation jobs.
+
+    The input file is uploaded to S3 and results are read from S3. Needs an
+    S3 location (`batch_s3_uri`) and an IAM service role Bedrock can assume
+    to read and write it (`batch_role_arn`), both from the provider's
+    additional_params or the BEDROCK_BATCH_S3_URI / BEDROCK_BATCH_ROLE_ARN
+    environment variables.
+    """
+
+    name = 'bedrock'
+
+    def __init__(self, provider, s3_uri: Optional[str] = None, role_arn: Optional[str] = None,
+                 timeout_hours: int = DEFAULT_BEDROCK_TIMEOUT_HOURS):
+        params = provider.config.additional_params
+        self.provider = provider
+        self.s3_uri = (s3_uri or params.get('batch_s3_uri') or os.environ.get('BEDROCK_BATCH_S3_URI', '')).rstrip('/')
+        self.role_arn = role_arn or params.get('batch_role_arn') or os.environ.get('BEDROCK_BATCH_ROLE_ARN')
+        if not self.s3_uri.startswith('s3://') or not self.role_arn:
+            raise ValueError("Bedrock batch inference needs batch_s3_uri and batch_role_arn")
+        self.timeout_hours = timeout_hours
+        self.bedrock = provider.aws_client('bedrock')
+        self.s3 = provider.aws_client('s3')
+        self.is_claude = 'claude' in provider.model_id.lower()
+
+    def request_line(self, record_id: str, prompt: str, max_tokens: Optional[int] = None,
+                     temperature: Optional[float] = None) -> Dict:
+        if self.is_claude:
+            model_input = {
+                'anthropic_version': BEDROCK_ANTHROPIC_VERSION,
+                'messages': [{'role': 'user', 'content': [{'type': 'text', 'text': prompt}]}],
+                'max_tokens': int(max_tokens if max_tokens is not None else self.provider.max_tokens),
+                'temperature': float(temperature if temperature is not None else self.provider.temperature)
+            }
+        else:
+            model_input = json.loads(self.provider._build_body(prompt, max_tokens, temperature))
+        return {'recordId': record_id, 'modelInput': model_input}
+
+    def _output_text(self, model_output: Dict) -> str:
+        if self.is_claude:
+            return ''.join(block.get('text', '') for block in model_output.get('content', [])
+                           if block.get('type') == 'text')
+        return self.provider._extract_text(model_output)
+
+    @staticmethod
+    def _split_uri(uri: str) -> Tuple[str, str]:
+        parts = urlsplit(uri)
+        return parts.netloc, parts.path.lstrip('/')
+
+    def submit(self, input_path: str, job_name: str) -> Dict:
+        input_uri = f"{self.s3_uri}/input/{job_name}.jsonl"
+        output_uri = f"{self.s3_uri}/output/{job_name}/"
+        bucket, key = self._split_uri(input_uri)
+        self.s3.upload_file(input_path, bucket, key)
+
+        response = self.bedrock.create_model_invocation_job(
+            jobName=job_name,
+            roleArn=self.role_arn,
+            modelId=self.provider.model_id,
+            inputDataConfig={'s3InputDataConfig': {'s3Uri': input_uri, 's3InputFormat': 'JSONL'}},
+            outputDataConfig={'s3OutputDataConfig': {'s3Uri': output_uri}},
+            timeoutDurationInHours=self.timeout_hours
+        )
+        return {'backend': self.name, 'job_arn': response['jobArn'], 'output_uri': output_uri}
+
+    def status(self, handle: Dict) -> Tuple[str, Dict]:
+        job = self.bedrock.get_model_invocation_job(jobIdentifier=handle['job_arn'])
+        return BEDROCK_STATES.get(job['status'], BATCH_IN_PROGRESS), {'message': job.get('message')}
+
+    def results(self, handle: Dict) -> Iterator[Tuple[str, Optional[str], Optional[str]]]:
+        # Output files are written under <output_uri>/<job id>/<input name>.out
+        job_id = handle['job_arn'].rsplit('/', 1)[-1]
+        bucket, prefix = self._split_uri(f"{handle['output_uri'].rstrip('/')}/{job_id}/")
+        paginator = self.s3.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            for item in page.get('Contents', []):
+                if not item['Key'].endswith('.jsonl.out'):
+                    continue
+                body = self.s3.get_object(Bucket=bucket, Key=item['Key'])['Body']
+                for line in body.iter_lines():
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    if record.get('error') or 'modelOutput' not in record:
+                        error = record.get('error') or 'No model output'
+                        yield record['recordId'], None, json.dumps(error) if not isinstance(error, str) else error
+                    else:
+                        yield record['recordId'], self._output_text(record['modelOutput']), None
+
+    def cancel(self, handle: Dict):
+        self.bedrock.stop_model_invocation_job(jobIdentifier=handle['job_arn'])
+
+
+class LocalBatchBackend(BatchBackend):
+    """File-based stand-in for a batch API.
+
+    `submit` copies the input file into `directory/<batch id>/`. The
+    requests run through the provider's generate_text the first time the
+    status is checked after `delay` seconds, and the results are written
+    next to the input. Works with any provider, including test fakes.
+    """
+
+    name = 'local'
+
+    def __init__(self, provider, directory: str, delay: float = 0.0):
+        self.provider = provider
+        self.directory = directory
+        self.delay = delay
+
+    def request_line(self, record_id: str, prompt: str, max_tokens: Optional[int] = None,
+                     temperature: Optional[float] = None) -> Dict:
+        return {'custom_id': record_id, 'prompt': prompt, 'max_tokens': max_tokens, 'temperature': temperature}
+
+    def _path(self, handle: Dict, name: str) -> str:
+        return os.path.join(self.directory, handle['batch_id'], name)
+
+    def _write_state(self, handle: Dict, state: Dict):
+        with open(self._path(handle, 'state.json'), 'w') as f:
+            json.dump(state, f)
+
+    def _read_state(self, handle: Dict) -> Dict:
+        with open(self._path(handle, 'state.json')) as f:
+            return json.load(f)
+
+    def submit(self, input_path: str, job_name: str) -> Dict:
+        handle = {'backend': self.name, 'batch_id': f"{job_name}-{uuid.uuid4().hex[:8]}"}
+        os.makedirs(os.path.join(self.directory, handle['batch_id']), exist_ok=True)
+        shutil.copyfile(input_path, self._path(handle, 'input.jsonl'))
+        self._write_state(handle, {'status': BATCH_SUBMITTED, 'submitted_at': datetime.now().timestamp()})
+        return handle
+
+    def _run(self, handle: Dict) -> Dict:
+        counts = {'total': 0, 'completed': 0, 'failed': 0}
+        with open(self._path(handle, 'input.jsonl')) as source, open(self._path(handle, 'output.jsonl'), 'w') as out:
+            for line in source:
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                counts['total'] += 1
+                result = {'custom_id': request['custom_id']}
+                try:
+                    text = self.provider.generate_text(request['prompt'], max_tokens=request.get('max_tokens'),
+                                                       temperature=request.get('temperature'))
+                except Exception as e:
+                    text = f"Error: {e}"
+                # Providers report most failures as an "Error: ..." text
+                if (text or '').startswith('Error:'):
+                    result['error'] = text[len('Error:'):].strip()
+                    counts['failed'] += 1
+                else:
+                    result['text'] = text
+                    counts['completed'] += 1
+                out.write(json.dumps(result) + '\n')
+        return counts
+
+    def status(self, handle: Dict) -> Tuple[str, Dict]:
+        state = self._read_state(handle)
+        if state['status'] == BATCH_SUBMITTED and datetime.now().timestamp() - state['submitted_at'] >= self.delay:
+            state.update(status=BATCH_IN_PROGRESS)
+            self._write_state(handle, state)
+            try:
+                state.update(status=BATCH_COMPLETED, counts=self._run(handle))
+            except Exception as e:
+                state.update(status=BATCH_FAILED, error=str(e))
+            self._write_state(handle, state)
+        return state['status'], state.get('counts', {})
+
+    def results(self, handle: Dict) -> Iterator[Tuple[str, Optional[str], Optional[str]]]:
+        with open(self._path(handle, 'output.jsonl')) as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    yield record['custom_id'], record.get('text'), record.get('error')
+
+    def cancel(self, handle: Dict):
+        state = self._read_state(handle)
+        if state['status'] not in FINISHED_BATCH_STATES:
+            state['status'] = BATCH_CANCELLED
+            self._write_state(handle, state)
+
+
+def get_batch_backend(llm_connector, provider_name: str, backend: Optional[str] = None,
+                      directory: Optional[str] = None) -> BatchBackend:
+    """Pick the batch backend for a provider.
+
+    Args:
+        llm_connector: LLMConnector holding the provider
+        provider_name: Provider key
+        backend: 'local' to force the file-based stand-in; by default the
+            provider's own batch API is used
+        directory: Working directory of the local backend
+
+    Returns:
+        A BatchBackend
+    """
+    provider = llm_connector.get_provider(provider_name)
+    if backend == 'local':
+        return LocalBatchBackend(provider, directory or 'batch_inference')
+
+    kind = provider_type(provider_name, provider.config)
+    if kind == 'openai':
+        return OpenAIBatchBackend(provider)
+    if kind == 'bedrock':
+        return BedrockBatchBackend(provider)
+    raise ValueError(f"Provider '{provider_name}' has no batch API; use the local backend")
@@ -0,0 +1,187 @@
+"""
+Response cache for LLM calls.
+
+Identical prompts sent to the same provider and model with the same
+generation parameters are answered from the cache instead of being billed
+again. The cache has two tiers:
+
+    - an in-process LRU with a TTL (always on)
+    - an optional MongoDB tier (`llm_cache` collection) shared by every
+      worker, with a TTL index so MongoDB expires old entries itself
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL = 24 * 60 * 60  # seconds
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Normalize a prompt so whitespace-only differences share a cache entry."""
+    return re.sub(r'\s+', ' ', prompt).strip()
+
+
+def make_cache_key(provider: str, model: Optional[str], prompt: str,
+                   max_tokens: Optional[int], temperature: Optional[float], **kwargs) -> str:
+    """Hash provider, model, normalized prompt and generation parameters into a key."""
+    key_data = {
+        "provider": provider,
+        "model": model,
+        "prompt": normalize_prompt(prompt),
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        "params": kwargs
+    }
+    encoded = json.dumps(key_data, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe in-process LRU cache with a per-entry TTL."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: int = DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class MongoCacheTier:
+    """Cache tier stored in a MongoDB collection."""
+
+    def __init__(self, collection, ttl: int = DEFAULT_TTL):
+        self.collection = collection
+        self.ttl = ttl
+        # MongoDB removes documents once expires_at has passed
+        self.collection.create_index('expires_at', expireAfterSeconds=0)
+
+    def get(self, key: str) -> Optional[Any]:
+        doc = self.collection.find_one({'_id': key, 'expires_at': {'$gt': datetime.utcnow()}})
+        return doc['response'] if doc else None
+
+    def set(self, key: str, value: Any, provider: Optional[str] = None, model: Optional[str] = None):
+        now = datetime.utcnow()
+        self.collection.update_one(
+            {'_id': key},
+            {'$set': {
+                'response': value,
+                'provider': provider,
+                'model': model,
+                'created_at': now,
+                'expires_at': now + timedelta(seconds=self.ttl)
+            }},
+            upsert=True
+        )
+
+    def clear(self):
+        self.collection.delete_many({})
+
+
+class ResponseCache:
+    """Two-tier LLM response cache with hit and miss counters."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: int = DEFAULT_TTL, mongo_collection=None):
+        self.ttl = ttl
+        self.memory = LRUCache(max_entries=max_entries, ttl=ttl)
+        self.mongo = None
+        if mongo_collection is not None:
+            self.attach_mongo(mongo_collection)
+
+        self._lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "mongo_hits": 0, "misses": 0, "stores": 0, "errors": 0}
+
+    def attach_mongo(self, collection):
+        """Enable the shared MongoDB tier."""
+        self.mongo = MongoCacheTier(collection, ttl=self.ttl)
+
+    def _count(self, counter: str):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def get(self, key: str) -> Optional[Any]:
+        """Look a key up in memory first, then in MongoDB."""
+        value = self.memory.get(key)
+        if value is not None:
+            self._count("memory_hits")
+            return value
+
+        if self.mongo is not None:
+            try:
+                value = self.mongo.get(key)
+            except Exception as e:
+                print(f"Error reading LLM cache from database: {str(e)}")
+                self._count("errors")
+                value = None
+            if value is not None:
+                # Promote to the in-process tier for the next lookup
+                self.memory.set(key, value)
+                self._count("mongo_hits")
+                return value
+
+        self._count("misses")
+        return None
+
+    def set(self, key: str, value: Any, provider: Optional[str] = None, model: Optional[str] = None):
+        """Store a response in every tier."""
+        self.memory.set(key, value)
+        if self.mongo is not None:
+            try:
+                self.mongo.set(key, value, provider=provider, model=model)
+            except Exception as e:
+                print(f"Error writing LLM cache to database: {str(e)}")
+                self._count("errors")
+        self._count("stores")
+
+    def clear(self):
+        """Drop every cached response."""
+        self.memory.clear()
+        if self.mongo is not None:
+            self.mongo.clear()
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and sizes."""
+        with self._lock:
+            counters = dict(self._counters)
+        hits = counters["memory_hits"] + counters["mongo_hits"]
+        lookups = hits + counters["misses"]
+        counters.update({
+            "hits": hits,
+            "hit_rate": round(hits / lookups * 100, 1) if lookups else 0.0,
+            "memory_entries": len(self.memory),
+            "max_entries": self.memory.max_entries,
+            "ttl": self.ttl,
+            "mongo_enabled": self.mongo is not None
+        })
+        return counters
@@ -0,0 +1,151 @@
+"""
+Circuit breakers for LLM providers.
+
+Every provider key gets a breaker that opens after a run of failed or slow
+calls. While it is open, calls to that provider fail immediately (or fail
+over to the next provider) instead of waiting out its timeout. After
+`breaker_reset_timeout` seconds a single trial call is let through; if it
+succeeds the breaker closes again.
+
+Settings come from the provider's `additional_params`:
+
+    breaker_failures        consecutive failures that open the breaker (default 5)
+    breaker_reset_timeout   seconds before a trial call is allowed (default 30)
+    latency_budget          seconds; slower calls count as failures (default: none)
+"""
+import threading
+import time
+from typing import Dict, Optional
+
+from .config import ProviderConfig
+
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 30.0
+
+# Breaker states
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when no provider could be called because their breakers are open."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a latency budget."""
+
+    def __init__(self, name: str, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout: float = DEFAULT_RESET_TIMEOUT, latency_budget: Optional[float] = None):
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = float(reset_timeout)
+        self.latency_budget = float(latency_budget) if latency_budget else None
+
+        self._lock = threading.Lock()
+        self._state = STATE_CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = None
+        self._trial_in_progress = False
+        self._successes = 0
+        self._failures = 0
+        self._rejected = 0
+        self._last_error = None
+        self._last_latency = None
+
+    @classmethod
+    def from_config(cls, name: str, config: ProviderConfig) -> 'CircuitBreaker':
+        params = config.additional_params or {}
+        return cls(
+            name,
+            failure_threshold=params.get('breaker_failures', DEFAULT_FAILURE_THRESHOLD),
+            reset_timeout=params.get('breaker_reset_timeout', DEFAULT_RESET_TIMEOUT),
+            latency_budget=params.get('latency_budget')
+        )
+
+    def _current_state(self, now: float) -> str:
+        if self._state == STATE_OPEN and now - self._opened_at >= self.reset_timeout:
+            self._state = STATE_HALF_OPEN
+            self._trial_in_progress = False
+        return self._state
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def allow_request(self) -> bool:
+        """Whether a call may go to this provider now."""
+        with self._lock:
+            state = self._current_state(time.monotonic())
+            if state == STATE_CLOSED:
+                return True
+            if state == STATE_HALF_OPEN and not self._trial_in_progress:
+                # Let exactly one trial call through
+                self._trial_in_progress = True
+                return True
+            self._rejected += 1
+            return False
+
+    def record_success(self, latency: float):
+        """Record a completed call; calls over the latency budget count as failures."""
+        if self.latency_budget and latency > self.latency_budget:
+            self.record_failure(f"Slow response: {latency:.1f}s (budget {self.latency_budget:.1f}s)", latency)
+            return
+
+        with self._lock:
+            self._successes += 1
+            self._consecutive_failures = 0
+            self._last_latency = latency
+            self._state = STATE_CLOSED
+            self._trial_in_progress = False
+
+    def record_failure(self, error: Optional[str] = None, latency: Optional[float] = None):
+        """Record a failed call and open the breaker once the threshold is reached."""
+        with self._lock:
+            self._failures += 1
+            self._consecutive_failures += 1
+            self._last_error = error
+            if latency is not None:
+                self._last_latency = latency
+
+            if self._state == STATE_HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                self._state = STATE_OPEN
+                self._opened_at = time.monotonic()
+            self._trial_in_progress = False
+
+    def release_trial(self):
+        """Free the half-open trial after a call that ended without an outcome.
+
+        Used when the caller abandons a call (e.g. a stream whose client went
+        away); it counts as neither a success nor a failure.
+        """
+        with self._lock:
+            self._trial_in_progress = False
+
+    def reset(self):
+        """Close the breaker by hand."""
+        with self._lock:
+            self._state = STATE_CLOSED
+            self._consecutive_failures = 0
+            self._trial_in_progress = False
+
+    def stats(self) -> Dict:
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            retry_in = None
+            if state == STATE_OPEN:
+                retry_in = round(max(0.0, self.reset_timeout - (now - self._opened_at)), 1)
+            return {
+                'state': state,
+                'consecutive_failures': self._consecutive_failures,
+                'failure_threshold': self.failure_threshold,
+                'latency_budget': self.latency_budget,
+                'successes': self._successes,
+                'failures': self._failures,
+                'rejected': self._rejected,
+                'last_error': self._last_error,
+                'last_latency_ms': round(self._last_latency * 1000, 1) if self._last_latency is not None else None,
+                'retry_in': retry_in
+            }
@@ -2,8 +2,10 @@
 Configuration for LLM connections.
 """
 import os
-from dataclasses import dataclass
-from typing import Dict, Optional
+import threading
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Callable, Dict, Optional
 import json
 from pathlib import Path
 from dotenv import load_dotenv
@@ -11,6 +13,32 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
+# additional_params keys that configure the connector itself rather than
+# being forwarded to the provider API in the request body
+CONNECTOR_PARAMS = {
+    # Request routing and response parsing (generic connector)
+    'completion_endpoint', 'chat_endpoint', 'text_path', 'content_path',
+    # HTTP connection pool
+    'pool_size', 'pool_block', 'connect_timeout', 'read_timeout',
+    # Rate limiting (see llm.rate_limit); max_concurrency is the older name of max_in_flight
+    'rpm', 'tpm', 'max_in_flight', 'max_concurrency',
+    # Retry attempts and connection pool size for boto3 clients (see llm.aws_clients)
+    'max_retries', 'max_pool_connections',
+    # Bedrock request API: 'converse' (default) or 'invoke'
+    'bedrock_api',
+    # Circuit breaker (see llm.circuit_breaker)
+    'breaker_failures', 'breaker_reset_timeout', 'latency_budget',
+    # Prompt budgeting (see llm.utils.context_window)
+    'context_window', 'tokenizer',
+    # Offline batch inference (see llm.batch)
+    'batch_s3_uri', 'batch_role_arn',
+    # Implementation to use for a provider key (see provider_type)
+    'provider_type',
+}
+
+# Provider types with their own connector; any other key uses the generic connector
+PROVIDER_TYPES = ('openai', 'anthropic', 'ollama', 'grok', 'bedrock')
+
 @dataclass
 class ProviderConfig:
     """Configuration for a specific LLM provider."""
@@ -26,13 +54,77 @@ class ProviderConfig:
         if self.additional_params is None:
             self.additional_params = {}
 
+    def request_params(self) -> Dict:
+        """additional_params that should be sent to the provider API."""
+        return {key: value for key, value in self.additional_params.items() if key not in CONNECTOR_PARAMS}
+
+
+def provider_type(provider_name: str, provider_config: Optional[ProviderConfig] = None) -> str:
+    """Work out which connector implementation a provider key uses.
+
+    Keys created in the admin page combine the provider and the model
+    ('openai_gpt-4o'), so the part before the first underscore is used. The
+    `provider_type` additional param overrides this.
+    """
+    if provider_config and provider_config.additional_params.get('provider_type'):
+        return provider_config.additional_params['provider_type']
+    base = (provider_name or '').split('_', 1)[0]
+    return base if base in PROVIDER_TYPES else 'generic'
+
+
+def provider_config_from_doc(doc: Dict) -> ProviderConfig:
+    """Build a provider config from an `llm_configs` document."""
+    return ProviderConfig(
+        api_key=doc.get('api_key') or '',
+        base_url=doc.get('base_url'),
+        model_name=doc.get('model_name'),
+        timeout=doc.get('timeout', 30),
+        max_tokens=doc.get('max_tokens', 1000),
+        temperature=doc.get('temperature', 0.7),
+        additional_params=dict(doc.get('additional_params') or {})
+    )
+
+
+# `llm_configs` documents of the Bedrock provider point at the settings saved
+# from /admin/bedrock instead of holding the AWS keys
+BEDROCK_SETTINGS_REF = 'settings:bedrock_config'
+
+
+def bedrock_config_from_settings(settings: Dict) -> ProviderConfig:
+    """Build the Bedrock provider config from the `bedrock_config` settings document."""
+    return ProviderConfig(
+        api_key=f"{settings.get('aws_access_key')}:{settings.get('aws_secret_key')}",
+        base_url=settings.get('aws_region', 'us-east-1'),
+        model_name=settings.get('model_id', 'amazon.titan-text-express-v1'),
+        max_tokens=1000,
+        temperature=0.7
+    )
+
 
 class LLMConfig:
-    """Configuration manager for LLM connections."""
+    """Configuration manager for LLM connections.
+    
+    Providers come from environment variables, then from the `llm_configs`
+    collection and the Bedrock settings once MongoDB is attached. Changes
+    go through add_provider/remove_provider. These store the change, bump
+    the config version and tell listeners (the connector) which provider
+    changed, so only that provider's cached client is rebuilt. Other workers
+    hear about the change through the change feed (see llm.config_sync) and
+    reload just that provider; requests never query the store.
+    """
     
     def __init__(self):
         """Initialize configuration manager."""
         self.providers = {}
+        # Incremented on every change; provider_versions holds the version of each provider's last change
+        self.version = 0
+        self.provider_versions = {}
+        self.mongo_db = None
+        self.change_feed = None
+        # Providers loaded from or saved to `llm_configs`
+        self._stored = set()
+        self._listeners = []
+        self._lock = threading.RLock()
         
         # Load from environment variables
         self._load_from_env()
@@ -41,19 +133,53 @@ class LLMConfig:
         try:
             from flask import current_app
             if hasattr(current_app, 'mongo'):
-                bedrock_config = current_app.mongo.db.settings.find_one({'setting_type': 'bedrock_config'})
-                if bedrock_config:
-                    # Add Bedrock provider
-                    self.providers['bedrock'] = ProviderConfig(
-                        api_key=f"{bedrock_config.get('aws_access_key')}:{bedrock_config.get('aws_secret_key')}",
-                        base_url=bedrock_config.get('aws_region', 'us-east-1'),
-                        model_name=bedrock_config.get('model_id', 'amazon.titan-text-express-v1'),
-                        max_tokens=1000,
-                        temperature=0.7
-                    )
+                self._load_bedrock_settings(current_app.mongo.db)
         except Exception as e:
             print(f"Error loading Bedrock config from database: {str(e)}")
     
+    def attach_mongo(self, db, watch: bool = True, poll_interval: Optional[float] = None):
+        """Load the providers stored in MongoDB and keep them in sync with other workers.
+        
+        Args:
+            db: MongoDB database handle
+            watch: Start the background check for changes made by other workers
+            poll_interval: Seconds between those checks
+        """
+        self.mongo_db = db
+        try:
+            db.llm_configs.create_index('provider_name', unique=True)
+            # Earlier versions saved the AWS keys here too
+            db.llm_configs.update_many(
+                {'provider_name': 'bedrock', 'api_key': {'$nin': [None, '']}},
+                {'$set': {'api_key': None, 'api_key_ref': BEDROCK_SETTINGS_REF}}
+            )
+            for doc in db.llm_configs.find():
+                self._load_doc(doc)
+        except Exception as e:
+            print(f"Error loading LLM configs from database: {str(e)}")
+        try:
+            self._load_bedrock_settings(db)
+        except Exception as e:
+            print(f"Error loading Bedrock config from database: {str(e)}")
+        
+        if watch:
+            from .config_sync import ConfigChangeFeed, DEFAULT_POLL_INTERVAL
+            self.change_feed = ConfigChangeFeed(db.llm_config_events, self,
+                                                poll_interval=poll_interval or DEFAULT_POLL_INTERVAL)
+            self.change_feed.start()
+    
+    def _load_doc(self, doc: Dict):
+        self._stored.add(doc['provider_name'])
+        self.add_provider(doc['provider_name'], provider_config_from_doc(doc), persist=False)
+    
+    def _load_bedrock_settings(self, db) -> bool:
+        """Apply the Bedrock settings saved from /admin/bedrock; returns False if there are none."""
+        bedrock_config = db.settings.find_one({'setting_type': 'bedrock_config'})
+        if not bedrock_config:
+            return False
+        self.add_provider('bedrock', bedrock_config_from_settings(bedrock_config), persist=False)
+        return True
+    
     def _load_from_env(self):
         """Load configuration from environment variables."""
         # OpenAI configuration
@@ -87,6 +213,97 @@ class LLMConfig:
                 model_name=os.environ.get('GROK_MODEL_NAME', 'grok-1')
             )
     
+    def add_listener(self, callback: Callable[[str], None]):
+        """Call `callback(provider_name)` after a provider is added, changed or removed."""
+        self._listeners.append(callback)
+    
+    def _changed(self, provider_name: str):
+        for callback in list(self._listeners):
+            try:
+                callback(provider_name)
+            except Exception as e:
+                print(f"Error applying config change for {provider_name}: {str(e)}")
+    
+    def add_provider(self, provider_name: str, provider_config: ProviderConfig, persist: bool = True):
+        """Add or replace a provider's configuration.
+        
+        With `persist` (and MongoDB attached) the configuration is saved to
+        `llm_configs` and the other workers are told to reload it.
+        """
+        with self._lock:
+            self.providers[provider_name] = provider_config
+            self.version += 1
+            self.provider_versions[provider_name] = self.version
+        self._changed(provider_name)
+    
+        if persist and self.mongo_db is not None:
+            doc = asdict(provider_config)
+            doc.update(provider_name=provider_name, updated_at=datetime.now())
+            if provider_name == 'bedrock':
+                # The AWS keys stay in the Bedrock settings, which win on reload
+                doc.update(api_key=None, api_key_ref=BEDROCK_SETTINGS_REF)
+            self._stored.add(provider_name)
+            self.mongo_db.llm_configs.replace_one({'provider_name': provider_name}, doc, upsert=True)
+            if self.change_feed:
+                self.change_feed.publish(provider_name)
+    
+    def remove_provider(self, provider_name: str, persist: bool = True) -> bool:
+        """Remove a provider; returns False if it was not configured."""
+        with self._lock:
+            if provider_name not in self.providers:
+                return False
+            del self.providers[provider_name]
+            self._stored.discard(provider_name)
+            self.version += 1
+            self.provider_versions[provider_name] = self.version
+        self._changed(provider_name)
+        
+        if persist and self.mongo_db is not None:
+            self.mongo_db.llm_configs.delete_one({'provider_name': provider_name})
+            if self.change_feed:
+                from .config_sync import ACTION_REMOVED
+                self.change_feed.publish(provider_name, ACTION_REMOVED)
+        return True
+    
+    def reload_provider(self, provider_name: str) -> bool:
+        """Re-read a provider's stored configuration, after another worker changed it.
+        
+        Returns:
+            True if the provider's configuration was found and applied
+        """
+        if self.mongo_db is None:
+            return False
+        doc = self.mongo_db.llm_configs.find_one({'provider_name': provider_name})
+        if doc:
+            self._load_doc(doc)
+        # The Bedrock settings page stays the source of truth for 'bedrock'
+        if provider_name == 'bedrock' and self._load_bedrock_settings(self.mongo_db):
+            return True
+        return doc is not None
+    
+    def reload_all(self) -> int:
+        """Re-read every stored provider, after another worker's changes were missed.
+        
+        Providers deleted from `llm_configs` since they were loaded are removed.
+        
+        Returns:
+            Number of providers reloaded or removed
+        """
+        if self.mongo_db is None:
+            return 0
+        docs = list(self.mongo_db.llm_configs.find())
+        removed = self._stored - {doc['provider_name'] for doc in docs}
+        for provider_name in removed:
+            self.remove_provider(provider_name, persist=False)
+        for doc in docs:
+            self._load_doc(doc)
+        self._load_bedrock_settings(self.mongo_db)
+        return len(removed) + len(docs)
+    
+    def get_provider_version(self, provider_name: str) -> int:
+        """Version of the provider's last configuration change (0 if it never changed)."""
+        return self.provider_versions.get(provider_name, 0)
+    
     def get_provider_config(self, provider_name: str) -> Optional[ProviderConfig]:
         """Get configuration for a provider."""
         return self.providers.get(provider_name)
@@ -0,0 +1,147 @@
+"""
+Cross-worker notification of LLM configuration changes.
+
+Each gunicorn worker holds its own LLMConfig and connector. When a
+provider is changed in one worker (LLMConfig.add_provider/remove_provider
+save it to `llm_configs`), that worker publishes a change event (the
+provider name and a sequence number) to a MongoDB collection. Every worker
+polls the sequence counter, a single indexed read, every few seconds. When
+it has moved, the worker reads the new events and reloads only the
+providers they name, so all workers converge without a restart. If an
+event number stays missing for `gap_timeout` seconds, the worker reloads
+every stored provider instead.
+"""
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+from pymongo import ReturnDocument
+
+DEFAULT_POLL_INTERVAL = 5.0             # seconds between version checks
+EVENT_TTL_SECONDS = 24 * 60 * 60        # events are removed after a day
+DEFAULT_GAP_TIMEOUT = 30.0              # seconds to wait for a missing event before a full reload
+
+# Document holding the latest sequence number
+SEQUENCE_ID = 'sequence'
+
+ACTION_UPDATED = 'updated'
+ACTION_REMOVED = 'removed'
+
+
+class ConfigChangeFeed:
+    """Publishes this worker's provider changes and applies other workers' changes."""
+
+    def __init__(self, collection, config, poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 gap_timeout: float = DEFAULT_GAP_TIMEOUT):
+        """
+        Args:
+            collection: MongoDB collection for the change events
+            config: The LLMConfig to keep in sync
+            poll_interval: Seconds between version checks
+            gap_timeout: Seconds to keep re-reading a missing event before reloading every provider
+        """
+        self.collection = collection
+        self.config = config
+        self.poll_interval = poll_interval
+        self.gap_timeout = gap_timeout
+        self.origin = f"{socket.gethostname()}:{os.getpid()}"
+        self._last_seq = 0
+        # (missing sequence number, when it was first seen missing)
+        self._gap = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+        try:
+            self.collection.create_index('seq')
+            self.collection.create_index('created_at', expireAfterSeconds=EVENT_TTL_SECONDS)
+            self._last_seq = self._current_seq()
+        except Exception as e:
+            print(f"Error setting up LLM config change feed: {str(e)}")
+
+    def _current_seq(self) -> int:
+        counter = self.collection.find_one({'_id': SEQUENCE_ID}, {'seq': 1})
+        return counter['seq'] if counter else 0
+
+    def publish(self, provider_name: str, action: str = ACTION_UPDATED):
+        """Tell the other workers that a provider was changed in this one."""
+        try:
+            counter = self.collection.find_one_and_update(
+                {'_id': SEQUENCE_ID},
+                {'$inc': {'seq': 1}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            self.collection.insert_one({
+                'seq': counter['seq'],
+                'provider': provider_name,
+                'action': action,
+                'origin': self.origin,
+                'created_at': datetime.now()
+            })
+        except Exception as e:
+            print(f"Error publishing LLM config change for {provider_name}: {str(e)}")
+
+    def poll(self) -> int:
+        """Apply the changes published since the last check.
+
+        Returns:
+            Number of changes applied
+        """
+        with self._lock:
+            seq = self._current_seq()
+            if seq <= self._last_seq:
+                return 0
+
+            applied = 0
+            events = self.collection.find(
+                {'seq': {'$gt': self._last_seq}, '_id': {'$ne': SEQUENCE_ID}}
+            ).sort('seq', 1)
+            for event in events:
+                if event['seq'] != self._last_seq + 1:
+                    break
+                self._last_seq = event['seq']
+                if event.get('origin') == self.origin:
+                    continue
+                self._apply(event['provider'], event.get('action', ACTION_UPDATED))
+                applied += 1
+            if self._last_seq >= seq:
+                self._gap = None
+                return applied
+
+            # The next event is missing. Its insert may not have landed yet (the
+            # counter is bumped first), so keep re-reading it for a while; after
+            # that it is lost and the only safe state is a full reload
+            missing = self._last_seq + 1
+            if self._gap is None or self._gap[0] != missing:
+                self._gap = (missing, time.monotonic())
+            elif time.monotonic() - self._gap[1] >= self.gap_timeout:
+                print(f"LLM config change {missing} not found after {self.gap_timeout}s, reloading all providers")
+                applied += self.config.reload_all()
+                self._last_seq = seq
+                self._gap = None
+            return applied
+
+    def _apply(self, provider_name: str, action: str):
+        if action == ACTION_REMOVED:
+            self.config.remove_provider(provider_name, persist=False)
+        elif not self.config.reload_provider(provider_name):
+            print(f"LLM provider {provider_name} changed in another worker but its stored config was not found")
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Error checking for LLM config changes: {str(e)}")
+
+    def start(self):
+        """Start checking for changes in a background thread."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='llm-config-feed', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
@@ -1,56 +1,285 @@
 """
 Main connector module for LLM integration.
 """
-from typing import Dict, List, Optional, Union
-from .config import LLMConfig
+import asyncio
+import threading
+import time
+from contextlib import nullcontext
+from typing import Dict, Iterator, List, Optional, Union
+from .config import LLMConfig, provider_type
+from .cache import ResponseCache, make_cache_key
+from .rate_limit import ProviderLimiter
+from .tokens import TokenCounter, build_token_counter
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .utils import context_window
 
 
 class LLMConnector:
     """Main connector class for interacting with LLM models."""
     
-    def __init__(self, config: Optional[LLMConfig] = None):
-        """Initialize with optional configuration."""
+    def __init__(self, config: Optional[LLMConfig] = None, cache: Optional[ResponseCache] = None):
+        """Initialize with optional configuration and response cache."""
         self.config = config or LLMConfig()
         self.provider_instances = {}
+        # Config version each provider instance was built from
+        self._instance_versions = {}
+        self._providers_lock = threading.RLock()
+        self.cache = cache if cache is not None else ResponseCache()
+        self._limiters = {}
+        self._limiters_lock = threading.Lock()
+        self._breakers = {}
+        self._breakers_lock = threading.Lock()
+        self._token_counters = {}
+        self._token_counters_lock = threading.Lock()
+        # Provider order for failover; None uses get_available_providers()
+        self.failover_order = None
+        self.config.add_listener(self.invalidate_provider)
     
     def get_provider(self, provider_name: str):
         """Get or create an instance of the specified provider."""
-        if provider_name not in self.provider_instances:
+        instance = self.provider_instances.get(provider_name)
+        version = self.config.get_provider_version(provider_name)
+        if instance is not None and self._instance_versions.get(provider_name, version) == version:
+            return instance
+        
+        with self._providers_lock:
+            # Another thread may have built it while this one waited
+            instance = self.provider_instances.get(provider_name)
+            if instance is not None and self._instance_versions.get(provider_name, version) == version:
+                return instance
+            stale = instance
+            
             # Lazy-load provider implementations
             provider_config = self.config.get_provider_config(provider_name)
             if not provider_config:
                 raise ValueError(f"Provider '{provider_name}' not configured")
             
-            if provider_name == 'openai':
+            kind = provider_type(provider_name, provider_config)
+            if kind == 'openai':
                 from .providers.openai_connector import OpenAIConnector
-                self.provider_instances[provider_name] = OpenAIConnector(provider_config)
-            elif provider_name == 'anthropic':
+                instance = OpenAIConnector(provider_config)
+            elif kind == 'anthropic':
                 from .providers.anthropic_connector import AnthropicConnector
-                self.provider_instances[provider_name] = AnthropicConnector(provider_config)
-            elif provider_name == 'ollama':
+                instance = AnthropicConnector(provider_config)
+            elif kind == 'ollama':
                 from .providers.ollama_connector import OllamaConnector
-                self.provider_instances[provider_name] = OllamaConnector(provider_config)
-            elif provider_name == 'grok':
+                instance = OllamaConnector(provider_config)
+            elif kind == 'grok':
                 from .providers.grok_connector import GrokConnector
-                self.provider_instances[provider_name] = GrokConnector(provider_config)
-            elif provider_name == 'bedrock':
+                instance = GrokConnector(provider_config)
+            elif kind == 'bedrock':
                 from .providers.bedrock_connector import BedrockConnector
-                self.provider_instances[provider_name] = BedrockConnector(provider_config)
+                instance = BedrockConnector(provider_config)
             else:
                 from .providers.generic_connector import GenericConnector
-                self.provider_instances[provider_name] = GenericConnector(provider_config)
+                instance = GenericConnector(provider_config)
                 
-        return self.provider_instances[provider_name]
+            self.provider_instances[provider_name] = instance
+            self._instance_versions[provider_name] = version
+        if stale is not None:
+            self._close_provider(provider_name, stale)
+        return instance
+    
+    def _close_provider(self, provider_name: str, instance):
+        try:
+            instance.close()
+        except Exception as e:
+            print(f"Error closing connections of provider {provider_name}: {str(e)}")
+    
+    def invalidate_provider(self, provider_name: str):
+        """Drop everything cached for one provider after its configuration changed.
+        
+        The client, rate limiter, circuit breaker and token counter are
+        rebuilt from the new configuration on next use; other providers keep
+        theirs. The old client's connections are closed.
+        """
+        with self._providers_lock:
+            instance = self.provider_instances.pop(provider_name, None)
+            self._instance_versions.pop(provider_name, None)
+        if instance is not None:
+            self._close_provider(provider_name, instance)
+        with self._limiters_lock:
+            self._limiters.pop(provider_name, None)
+        with self._token_counters_lock:
+            self._token_counters.pop(provider_name, None)
+        self.reset_breaker(provider_name)
     
     def get_available_providers(self) -> List[str]:
         """Get a list of available providers based on configuration."""
         return self.config.get_available_providers()
     
+    def get_pool_stats(self) -> Dict[str, Dict]:
+        """Get HTTP connection pool statistics for every instantiated provider."""
+        stats = {}
+        with self._providers_lock:
+            instances = list(self.provider_instances.items())
+        for name, instance in instances:
+            provider_stats = instance.get_pool_stats()
+            if provider_stats is not None:
+                stats[name] = provider_stats
+        return stats
+    
+    def get_usage_stats(self) -> Dict[str, Dict]:
+        """Get the token usage reported by the provider APIs, per instantiated provider."""
+        stats = {}
+        with self._providers_lock:
+            instances = list(self.provider_instances.items())
+        for name, instance in instances:
+            provider_stats = instance.get_usage_stats()
+            if provider_stats is not None:
+                stats[name] = provider_stats
+        return stats
+    
+    def get_limiter(self, provider_name: str) -> Optional[ProviderLimiter]:
+        """Get the rate limiter for a provider, or None if it has no limits configured."""
+        provider_config = self.config.get_provider_config(provider_name)
+        if not provider_config:
+            return None
+        
+        with self._limiters_lock:
+            limiter = self._limiters.get(provider_name)
+            # Rebuild when the limits in the configuration have changed
+            if limiter is None or not limiter.matches(provider_config):
+                limiter = ProviderLimiter.from_config(provider_name, provider_config)
+                self._limiters[provider_name] = limiter
+            return limiter
+    
+    def get_limiter_stats(self) -> Dict[str, Dict]:
+        """Get queue depth, in-flight and wait time metrics for every rate-limited provider."""
+        with self._limiters_lock:
+            limiters = list(self._limiters.items())
+        return {name: limiter.stats() for name, limiter in limiters if limiter is not None}
+    
+    def get_token_counter(self, provider_name: Optional[str] = None) -> TokenCounter:
+        """Get the token counter for a provider's model (see llm.tokens)."""
+        provider_name = self._resolve_provider_name(provider_name)
+        provider_config = self.config.get_provider_config(provider_name)
+        if not provider_config:
+            raise ValueError(f"Provider '{provider_name}' not configured")
+        
+        key = (provider_config.model_name, provider_config.additional_params.get('tokenizer'))
+        with self._token_counters_lock:
+            entry = self._token_counters.get(provider_name)
+            # Rebuild when the model or tokenizer setting has changed
+            if entry is None or entry[0] != key:
+                counter = build_token_counter(provider_type(provider_name, provider_config),
+                                              provider_config.model_name, provider_config.additional_params)
+                entry = (key, counter)
+                self._token_counters[provider_name] = entry
+            return entry[1]
+    
+    def count_tokens(self, text: str, provider: Optional[str] = None) -> int:
+        """Count the tokens in a text for a provider's model."""
+        return self.get_token_counter(provider)(text)
+    
+    def _estimate_tokens(self, provider: str, text: str, max_tokens: Optional[int],
+                         cache_prefix: Optional[str] = None) -> int:
+        """Tokens a call counts against a tokens-per-minute limit: prompt plus completion budget.
+        
+        A fixed prompt prefix is counted through the counter's template cache.
+        """
+        provider_config = self.config.get_provider_config(provider)
+        counter = self.get_token_counter(provider)
+        if cache_prefix and text and text.startswith(cache_prefix):
+            prompt_tokens = counter.count_template(cache_prefix) + counter(text[len(cache_prefix):])
+        else:
+            prompt_tokens = counter(text)
+        return prompt_tokens + int(max_tokens or provider_config.max_tokens or 0)
+    
+    def get_prompt_budget(self, provider_name: Optional[str] = None, max_tokens: Optional[int] = None) -> int:
+        """Tokens a prompt may use with a provider's model: its context window minus the completion budget."""
+        provider_name = self._resolve_provider_name(provider_name)
+        provider_config = self.config.get_provider_config(provider_name)
+        if not provider_config:
+            raise ValueError(f"Provider '{provider_name}' not configured")
+        window = context_window(provider_config.model_name, provider_type(provider_name, provider_config),
+                                provider_config.additional_params)
+        return max(0, window - int(max_tokens or provider_config.max_tokens or 0))
+    
+    def _limit(self, provider: str, text: str, max_tokens: Optional[int], cache_prefix: Optional[str] = None):
+        """Context manager that waits for rate limit capacity for one call."""
+        limiter = self.get_limiter(provider)
+        if limiter is None:
+            return nullcontext()
+        return limiter.limit(self._estimate_tokens(provider, text, max_tokens, cache_prefix))
+    
+    def _alimit(self, provider: str, text: str, max_tokens: Optional[int], cache_prefix: Optional[str] = None):
+        """Async context manager counterpart of _limit."""
+        limiter = self.get_limiter(provider)
+        if limiter is None:
+            return nullcontext()
+        return limiter.alimit(self._estimate_tokens(provider, text, max_tokens, cache_prefix))
+    
+    def get_breaker(self, provider_name: str) -> CircuitBreaker:
+        """Get the circuit breaker for a provider key."""
+        with self._breakers_lock:
+            breaker = self._breakers.get(provider_name)
+            if breaker is None:
+                provider_config = self.config.get_provider_config(provider_name)
+                if provider_config:
+                    breaker = CircuitBreaker.from_config(provider_name, provider_config)
+                else:
+                    breaker = CircuitBreaker(provider_name)
+                self._breakers[provider_name] = breaker
+            return breaker
+    
+    def reset_breaker(self, provider_name: str):
+        """Forget a provider's breaker, e.g. after its configuration changed."""
+        with self._breakers_lock:
+            self._breakers.pop(provider_name, None)
+    
+    def get_breaker_stats(self) -> Dict[str, Dict]:
+        """Get circuit breaker state for every configured provider."""
+        return {name: self.get_breaker(name).stats() for name in self.get_available_providers()}
+    
+    def _failover_chain(self, provider: str, failover: Union[bool, List[str]]) -> List[str]:
+        """Providers to try, in order, for a call to `provider`."""
+        if not failover:
+            return [provider]
+        fallbacks = failover if isinstance(failover, list) else (self.failover_order or self.get_available_providers())
+        return [provider] + [name for name in fallbacks if name != provider and self.config.get_provider_config(name)]
+    
+    def get_cache_stats(self) -> Dict:
+        """Get response cache hit and miss counters."""
+        return self.cache.stats()
+    
+    def _cache_key(self, provider: str, prompt: str, max_tokens: Optional[int],
+                   temperature: Optional[float], **kwargs) -> str:
+        """Build the cache key for a generate_text call, using effective parameter values."""
+        provider_config = self.config.get_provider_config(provider)
+        return make_cache_key(
+            provider,
+            provider_config.model_name,
+            prompt,
+            max_tokens or provider_config.max_tokens,
+            temperature if temperature is not None else provider_config.temperature,
+            **kwargs
+        )
+    
+    def _store(self, cache_key: str, provider: str, response: str):
+        """Cache a response unless it is empty or an error message returned as text."""
+        if not response or _is_error_response(response):
+            return
+        provider_config = self.config.get_provider_config(provider)
+        self.cache.set(cache_key, response, provider=provider, model=provider_config.model_name)
+    
+    def _resolve_provider_name(self, provider: Optional[str] = None) -> str:
+        """Return the requested provider, or the first available one."""
+        if not provider:
+            available_providers = self.get_available_providers()
+            if not available_providers:
+                raise ValueError("No LLM providers configured")
+            provider = available_providers[0]
+        return provider
+    
     def generate_text(self, 
                      prompt: str, 
                      provider: Optional[str] = None,
                      max_tokens: Optional[int] = None,
                      temperature: Optional[float] = None,
+                     use_cache: bool = True,
+                     failover: Union[bool, List[str]] = False,
+                     cache_prefix: Optional[str] = None,
                      **kwargs) -> str:
         """
         Generate text from a prompt using the specified provider.
@@ -60,54 +289,381 @@ class LLMConnector:
             provider: The LLM provider to use (if None, uses the first available)
             max_tokens: Maximum tokens in the response
             temperature: Temperature for generation
+            use_cache: Set to False to bypass the response cache for this call
+            failover: True to fall back to the other configured providers when
+                this one fails or its circuit breaker is open, or a list of
+                fallback provider keys
+            cache_prefix: Leading part of the prompt that stays the same across
+                calls (e.g. a template's instructions). Providers with prompt
+                caching (Anthropic, Bedrock Claude) mark it as cacheable; the
+                others ignore it
             **kwargs: Additional provider-specific parameters
             
         Returns:
             Generated text response
         """
-        if not provider:
-            available_providers = self.get_available_providers()
-            if not available_providers:
-                raise ValueError("No LLM providers configured")
-            provider = available_providers[0]
+        attempts = _Attempts()
+        for name in self._failover_chain(self._resolve_provider_name(provider), failover):
+            cache_key = None
+            if use_cache:
+                cache_key = self._cache_key(name, prompt, max_tokens, temperature, **kwargs)
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    return cached
+        
+            breaker = self.get_breaker(name)
+            if not breaker.allow_request():
+                attempts.skipped(name)
+                continue
+        
+            started = time.monotonic()
+            try:
+                provider_instance = self.get_provider(name)
+                with self._limit(name, prompt, max_tokens, cache_prefix):
+                    # Time spent queued in the limiter does not count toward the latency budget
+                    started = time.monotonic()
+                    response = provider_instance.generate_text(
+                        prompt=prompt,
+                        max_tokens=max_tokens,
+                        temperature=temperature,
+                        **_prefix_kwargs(provider_instance, prompt, cache_prefix),
+                        **kwargs
+                    )
+            except Exception as e:
+                attempts.failed(name, breaker, started, error=e)
+                continue
+        
+            if _is_error_response(response):
+                attempts.failed(name, breaker, started, response=response)
+                continue
             
-        provider_instance = self.get_provider(provider)
-        return provider_instance.generate_text(
-            prompt=prompt,
-            max_tokens=max_tokens,
-            temperature=temperature,
-            **kwargs
-        )
+            breaker.record_success(time.monotonic() - started)
+            if cache_key:
+                self._store(cache_key, name, response)
+            return response
+        
+        return attempts.outcome()
+    
+    def stream_text(self,
+                    prompt: str,
+                    provider: Optional[str] = None,
+                    max_tokens: Optional[int] = None,
+                    temperature: Optional[float] = None,
+                    use_cache: bool = True,
+                    failover: Union[bool, List[str]] = False,
+                    cache_prefix: Optional[str] = None,
+                    **kwargs) -> Iterator[str]:
+        """
+        Generate text from a prompt, yielding text deltas as the provider sends them.
+        
+        Cached responses are yielded as a single delta, and the full text of a
+        completed stream is added to the cache. Failover only happens before
+        the first delta; a stream that breaks part-way raises. The circuit
+        breaker's latency budget is checked against the time to first delta.
+        
+        Args:
+            prompt: The text prompt to send to the model
+            provider: The LLM provider to use (if None, uses the first available)
+            max_tokens: Maximum tokens in the response
+            temperature: Temperature for generation
+            use_cache: Set to False to bypass the response cache for this call
+            failover: Same as for generate_text
+            cache_prefix: Same as for generate_text
+            **kwargs: Additional provider-specific parameters
+            
+        Yields:
+            Pieces of the generated text
+        """
+        attempts = _Attempts()
+        for name in self._failover_chain(self._resolve_provider_name(provider), failover):
+            cache_key = None
+            if use_cache:
+                cache_key = self._cache_key(name, prompt, max_tokens, temperature, **kwargs)
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    yield cached
+                    return
+            
+            breaker = self.get_breaker(name)
+            if not breaker.allow_request():
+                attempts.skipped(name)
+                continue
+            
+            started = time.monotonic()
+            first_delta_at = None
+            error_response = None
+            parts = []
+            try:
+                provider_instance = self.get_provider(name)
+                with self._limit(name, prompt, max_tokens, cache_prefix):
+                    started = time.monotonic()
+                    for delta in provider_instance.stream_text(
+                        prompt=prompt,
+                        max_tokens=max_tokens,
+                        temperature=temperature,
+                        **_prefix_kwargs(provider_instance, prompt, cache_prefix),
+                        **kwargs
+                    ):
+                        if not parts and _is_error_response(delta):
+                            error_response = delta
+                            break
+                        if first_delta_at is None:
+                            first_delta_at = time.monotonic()
+                        parts.append(delta)
+                        yield delta
+            except Exception as e:
+                if parts:
+                    # Text has already gone to the caller, so there is nothing to fail over to
+                    breaker.record_failure(str(e), time.monotonic() - started)
+                    raise
+                attempts.failed(name, breaker, started, error=e)
+                continue
+            except BaseException:
+                # The caller stopped reading (GeneratorExit on a client
+                # disconnect); that says nothing about the provider, but a
+                # half-open trial must not stay taken
+                breaker.release_trial()
+                raise
+            
+            if error_response is not None:
+                attempts.failed(name, breaker, started, response=error_response)
+                continue
+            
+            breaker.record_success((first_delta_at or time.monotonic()) - started)
+            if cache_key:
+                self._store(cache_key, name, "".join(parts))
+            return
+        
+        # Providers that report errors as text stream the error text
+        yield attempts.outcome()
     
     def chat(self,
             messages: List[Dict[str, str]],
             provider: Optional[str] = None,
             max_tokens: Optional[int] = None,
             temperature: Optional[float] = None,
+            failover: Union[bool, List[str]] = False,
             **kwargs) -> Dict:
         """
         Generate a chat response from a list of messages.
         
+        Messages with `"cache": True` end a prefix that providers with prompt
+        caching mark as cacheable; the flag is removed for the others.
+        
         Args:
             messages: List of message dictionaries with 'role' and 'content'
             provider: The LLM provider to use (if None, uses the first available)
             max_tokens: Maximum tokens in the response
             temperature: Temperature for generation
+            failover: Fall back to other providers, as in generate_text
             **kwargs: Additional provider-specific parameters
             
         Returns:
             Response dictionary containing generated text and metadata
         """
-        if not provider:
-            available_providers = self.get_available_providers()
-            if not available_providers:
-                raise ValueError("No LLM providers configured")
-            provider = available_providers[0]
+        attempts = _Attempts()
+        for name in self._failover_chain(self._resolve_provider_name(provider), failover):
+            breaker = self.get_breaker(name)
+            if not breaker.allow_request():
+                attempts.skipped(name)
+                continue
             
-        provider_instance = self.get_provider(provider)
-        return provider_instance.chat(
-            messages=messages,
-            max_tokens=max_tokens,
-            temperature=temperature,
-            **kwargs
-        ) 
\ No newline at end of file
+            started = time.monotonic()
+            try:
+                provider_instance = self.get_provider(name)
+                with self._limit(name, _messages_text(messages), max_tokens):
+                    started = time.monotonic()
+                    response = provider_instance.chat(
+                        messages=_chat_messages(provider_instance, messages),
+                        max_tokens=max_tokens,
+                        temperature=temperature,
+                        **kwargs
+                    )
+            except Exception as e:
+                attempts.failed(name, breaker, started, error=e)
+                continue
+            
+            if _is_error_response(response):
+                attempts.failed(name, breaker, started, response=response)
+                continue
+            
+            breaker.record_success(time.monotonic() - started)
+            return response
+        
+        return attempts.outcome()
+    
+    async def agenerate_text(self,
+                             prompt: str,
+                             provider: Optional[str] = None,
+                             max_tokens: Optional[int] = None,
+                             temperature: Optional[float] = None,
+                             use_cache: bool = True,
+                             failover: Union[bool, List[str]] = False,
+                             cache_prefix: Optional[str] = None,
+                             **kwargs) -> str:
+        """
+        Async counterpart of generate_text.
+        
+        Many calls can be in flight at once from a single event loop, e.g.
+        with asyncio.gather, without holding a worker thread per call.
+        """
+        attempts = _Attempts()
+        for name in self._failover_chain(self._resolve_provider_name(provider), failover):
+            cache_key = None
+            if use_cache:
+                cache_key = self._cache_key(name, prompt, max_tokens, temperature, **kwargs)
+                # The MongoDB tier does blocking I/O, keep it off the event loop
+                cached = await asyncio.to_thread(self.cache.get, cache_key)
+                if cached is not None:
+                    return cached
+        
+            breaker = self.get_breaker(name)
+            if not breaker.allow_request():
+                attempts.skipped(name)
+                continue
+        
+            started = time.monotonic()
+            try:
+                provider_instance = self.get_provider(name)
+                async with self._alimit(name, prompt, max_tokens, cache_prefix):
+                    started = time.monotonic()
+                    response = await provider_instance.agenerate_text(
+                        prompt=prompt,
+                        max_tokens=max_tokens,
+                        temperature=temperature,
+                        **_prefix_kwargs(provider_instance, prompt, cache_prefix),
+                        **kwargs
+                    )
+            except Exception as e:
+                attempts.failed(name, breaker, started, error=e)
+                continue
+        
+            if _is_error_response(response):
+                attempts.failed(name, breaker, started, response=response)
+                continue
+            
+            breaker.record_success(time.monotonic() - started)
+            if cache_key:
+                await asyncio.to_thread(self._store, cache_key, name, response)
+            return response
+        
+        return attempts.outcome()
+    
+    async def achat(self,
+                    messages: List[Dict[str, str]],
+                    provider: Optional[str] = None,
+                    max_tokens: Optional[int] = None,
+                    temperature: Optional[float] = None,
+                    failover: Union[bool, List[str]] = False,
+                    **kwargs) -> Dict:
+        """Async counterpart of chat."""
+        attempts = _Attempts()
+        for name in self._failover_chain(self._resolve_provider_name(provider), failover):
+            breaker = self.get_breaker(name)
+            if not breaker.allow_request():
+                attempts.skipped(name)
+                continue
+            
+            started = time.monotonic()
+            try:
+                provider_instance = self.get_provider(name)
+                async with self._alimit(name, _messages_text(messages), max_tokens):
+                    started = time.monotonic()
+                    response = await provider_instance.achat(
+                        messages=_chat_messages(provider_instance, messages),
+                        max_tokens=max_tokens,
+                        temperature=temperature,
+                        **kwargs
+                    )
+            except Exception as e:
+                attempts.failed(name, breaker, started, error=e)
+                continue
+            
+            if _is_error_response(response):
+                attempts.failed(name, breaker, started, response=response)
+                continue
+            
+            breaker.record_success(time.monotonic() - started)
+            return response
+        
+        return attempts.outcome()
+
+
+_shared_connector = None
+_shared_connector_lock = threading.Lock()
+
+
+def get_llm_connector(config: Optional[LLMConfig] = None) -> LLMConnector:
+    """Get the process-wide connector, creating it on first use.
+    
+    Provider clients, rate limiters, breakers and caches live on the
+    connector, so routes and jobs should share this one rather than build
+    their own. `config` is only used when the connector is first created.
+    """
+    global _shared_connector
+    if _shared_connector is None:
+        with _shared_connector_lock:
+            if _shared_connector is None:
+                _shared_connector = LLMConnector(config=config)
+    return _shared_connector
+
+
+class _Attempts:
+    """Outcome of the providers tried for one call."""
+    
+    def __init__(self):
+        self.errors = []
+        self.last_exception = None
+        self.last_response = None
+    
+    def skipped(self, name: str):
+        self.errors.append(f"{name}: circuit open")
+    
+    def failed(self, name: str, breaker: CircuitBreaker, started: float, error: Exception = None, response=None):
+        message = str(error) if error is not None else _response_text(response)
+        breaker.record_failure(message, time.monotonic() - started)
+        self.errors.append(f"{name}: {message}")
+        if error is not None:
+            self.last_exception = error
+        else:
+            self.last_response = response
+    
+    def outcome(self):
+        """Return or raise what the caller would have seen without failover."""
+        if self.last_response is not None:
+            # Providers that report errors as text keep doing so
+            return self.last_response
+        if self.last_exception is not None:
+            raise self.last_exception
+        raise CircuitOpenError(f"No LLM provider available ({'; '.join(self.errors)})")
+
+
+def _response_text(response) -> str:
+    """Text of a generate_text (str) or chat (dict) response."""
+    if isinstance(response, dict):
+        return str(response.get('content') or '')
+    return str(response or '')
+
+
+def _is_error_response(response) -> bool:
+    """Whether a provider reported a failure as an 'Error: ...' response instead of raising."""
+    return _response_text(response).startswith("Error:")
+
+
+def _messages_text(messages: List[Dict[str, str]]) -> str:
+    """Concatenate chat message contents for token estimation."""
+    return "\n".join(str(message.get('content', '')) for message in messages) 
+
+
+def _prefix_kwargs(provider_instance, prompt: str, cache_prefix: Optional[str]) -> Dict:
+    """Pass cache_prefix on to providers with prompt caching, if the prompt starts with it."""
+    if cache_prefix and provider_instance.supports_prompt_cache and prompt.startswith(cache_prefix):
+        return {'cache_prefix': cache_prefix}
+    return {}
+
+
+def _chat_messages(provider_instance, messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """Drop the prompt cache marks from messages for providers without prompt caching."""
+    if provider_instance.supports_prompt_cache or not any('cache' in message for message in messages):
+        return messages
+    return [{key: value for key, value in message.items() if key != 'cache'} for message in messages]
@@ -0,0 +1,124 @@
+"""
+Keep-alive HTTP connection pools for the REST based providers.
+
+Each provider instance owns one `PooledHTTPClient`, so consecutive calls
+reuse TCP/TLS connections instead of paying a new handshake every time.
+Pool size and timeouts come from the provider configuration:
+
+    ProviderConfig.timeout                      read timeout (seconds)
+    additional_params["connect_timeout"]        connect timeout (default 5)
+    additional_params["read_timeout"]           overrides ProviderConfig.timeout
+    additional_params["pool_size"]              max connections per host (default 10)
+    additional_params["pool_block"]             wait for a free connection instead of
+                                                opening an extra one (default False)
+"""
+import threading
+import time
+from typing import Dict
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from .config import ProviderConfig
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_CONNECT_TIMEOUT = 5.0
+
+
+def pool_settings(config: ProviderConfig) -> Dict:
+    """Read pool size and timeouts from a provider configuration."""
+    params = config.additional_params or {}
+    return {
+        "pool_size": int(params.get("pool_size", DEFAULT_POOL_SIZE)),
+        "pool_block": bool(params.get("pool_block", False)),
+        "connect_timeout": float(params.get("connect_timeout", DEFAULT_CONNECT_TIMEOUT)),
+        "read_timeout": float(params.get("read_timeout", config.timeout)),
+    }
+
+
+def build_async_client(config: ProviderConfig) -> httpx.AsyncClient:
+    """Create an httpx client with the same pool limits as the sync session."""
+    settings = pool_settings(config)
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=settings["pool_size"],
+            max_keepalive_connections=settings["pool_size"]
+        ),
+        timeout=httpx.Timeout(settings["read_timeout"], connect=settings["connect_timeout"])
+    )
+
+
+class PooledHTTPClient:
+    """A `requests.Session` with a sized connection pool, default timeouts and counters."""
+
+    def __init__(self, config: ProviderConfig):
+        settings = pool_settings(config)
+        self.pool_size = settings["pool_size"]
+        self.timeout = (settings["connect_timeout"], settings["read_timeout"])
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_size,
+            pool_maxsize=self.pool_size,
+            pool_block=settings["pool_block"]
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._adapter = adapter
+
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._errors = 0
+        self._total_time = 0.0
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send a request through the pooled session."""
+        kwargs.setdefault("timeout", self.timeout)
+        started = time.perf_counter()
+        try:
+            return self.session.request(method, url, **kwargs)
+        except requests.RequestException:
+            with self._lock:
+                self._errors += 1
+            raise
+        finally:
+            with self._lock:
+                self._requests += 1
+                self._total_time += time.perf_counter() - started
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def stats(self) -> Dict:
+        """Request counters plus per-host connection pool statistics."""
+        pools = []
+        pool_manager = self._adapter.poolmanager
+        for key in list(pool_manager.pools.keys()):
+            pool = pool_manager.pools.get(key)
+            if pool is None:
+                continue
+            pools.append({
+                "host": f"{pool.scheme}://{pool.host}:{pool.port}",
+                "connections_opened": pool.num_connections,
+                "requests": pool.num_requests,
+                "idle_connections": pool.pool.qsize() if pool.pool is not None else 0
+            })
+
+        with self._lock:
+            requests_sent = self._requests
+            return {
+                "pool_size": self.pool_size,
+                "connect_timeout": self.timeout[0],
+                "read_timeout": self.timeout[1],
+                "requests": requests_sent,
+                "errors": self._errors,
+                "avg_latency_ms": round(self._total_time / requests_sent * 1000, 1) if requests_sent else 0.0,
+                "pools": pools
+            }
+
+    def close(self):
+        self.session.close()
@@ -1,13 +1,18 @@
 """Anthropic Claude implementation for LLM provider."""
 import anthropic
-from typing import Dict, List, Optional, Union
+from typing import Dict, Iterator, List, Optional, Union
 from .base_provider import BaseProvider
 from ..config import ProviderConfig
 
+# Marks the end of a cacheable prompt prefix (cached for 5 minutes after last use)
+CACHE_CONTROL = {"type": "ephemeral"}
+
 
 class AnthropicConnector(BaseProvider):
     """Connector for Anthropic Claude API."""
     
+    supports_prompt_cache = True
+    
     def __init__(self, config: ProviderConfig):
         super().__init__(config)
         # Initialize client with base_url if provided
@@ -15,24 +20,122 @@ class AnthropicConnector(BaseProvider):
         if config.base_url:
             client_kwargs["base_url"] = config.base_url
         self.client = anthropic.Anthropic(**client_kwargs)
+        self._client_kwargs = client_kwargs
         self.model = config.model_name or "claude-3-opus-20240229"
+    
+    def close(self):
+        """Close the SDK clients' connection pools."""
+        self.client.close()
+        super().close()
+    
+    def _async_client(self):
+        """Get the AsyncAnthropic client for the running event loop."""
+        return self._get_async_client(lambda: anthropic.AsyncAnthropic(**self._client_kwargs))
         
     def generate_text(self, prompt: str, max_tokens: Optional[int] = None, 
-                     temperature: Optional[float] = None, **kwargs) -> str:
-        """Generate text completion from a prompt."""
+                     temperature: Optional[float] = None, cache_prefix: Optional[str] = None, **kwargs) -> str:
+        """Generate text completion from a prompt.
+        
+        With cache_prefix, that leading part of the prompt is sent as its own
+        block with a cache breakpoint, so repeated calls read it from the
+        prompt cache.
+        """
         # Anthropic requires using the chat endpoint even for simple completions
         response = self.client.messages.create(
             model=self.model,
-            messages=[{"role": "user", "content": prompt}],
+            messages=self._prompt_messages(prompt, cache_prefix),
             max_tokens=max_tokens or self.config.max_tokens,
             temperature=temperature or self.config.temperature,
             **kwargs
         )
+        self._record_usage(response.usage)
+        return response.content[0].text
+    
+    def stream_text(self, prompt: str, max_tokens: Optional[int] = None,
+                    temperature: Optional[float] = None, cache_prefix: Optional[str] = None,
+                    **kwargs) -> Iterator[str]:
+        """Stream a completion from the Messages API, yielding text deltas."""
+        with self.client.messages.stream(
+            model=self.model,
+            messages=self._prompt_messages(prompt, cache_prefix),
+            max_tokens=max_tokens or self.config.max_tokens,
+            temperature=temperature or self.config.temperature,
+            **kwargs
+        ) as stream:
+            for text in stream.text_stream:
+                yield text
+            self._record_usage(stream.get_final_message().usage)
+    
+    async def agenerate_text(self, prompt: str, max_tokens: Optional[int] = None,
+                             temperature: Optional[float] = None, cache_prefix: Optional[str] = None,
+                             **kwargs) -> str:
+        """Generate text completion from a prompt asynchronously."""
+        response = await self._async_client().messages.create(
+            model=self.model,
+            messages=self._prompt_messages(prompt, cache_prefix),
+            max_tokens=max_tokens or self.config.max_tokens,
+            temperature=temperature or self.config.temperature,
+            **kwargs
+        )
+        self._record_usage(response.usage)
         return response.content[0].text
     
     def chat(self, messages: List[Dict[str, str]], max_tokens: Optional[int] = None,
             temperature: Optional[float] = None, **kwargs) -> Dict:
-        """Generate a chat response from a list of messages."""
+        """Generate a chat response from a list of messages.
+        
+        Messages (including the system message) with `"cache": True` get a
+        cache breakpoint, so everything up to and including them is cached.
+        """
+        anthropic_messages, system_message = self._convert_messages(messages)
+        
+        response = self.client.messages.create(
+            model=self.model,
+            messages=anthropic_messages,
+            system=system_message,
+            max_tokens=max_tokens or self.config.max_tokens,
+            temperature=temperature or self.config.temperature,
+            **kwargs
+        )
+        
+        return self._format_chat_response(response)
+    
+    async def achat(self, messages: List[Dict[str, str]], max_tokens: Optional[int] = None,
+                    temperature: Optional[float] = None, **kwargs) -> Dict:
+        """Generate a chat response from a list of messages asynchronously."""
+        anthropic_messages, system_message = self._convert_messages(messages)
+        
+        response = await self._async_client().messages.create(
+            model=self.model,
+            messages=anthropic_messages,
+            system=system_message,
+            max_tokens=max_tokens or self.config.max_tokens,
+            temperature=temperature or self.config.temperature,
+            **kwargs
+        )
+        
+        return self._format_chat_response(response)
+    
+    def _prompt_messages(self, prompt: str, cache_prefix: Optional[str] = None) -> List[Dict]:
+        """The messages for a single prompt, with the cached prefix in its own block."""
+        if not cache_prefix:
+            return [{"role": "user", "content": prompt}]
+        
+        content = [{"type": "text", "text": cache_prefix, "cache_control": CACHE_CONTROL}]
+        rest = prompt[len(cache_prefix):]
+        # Empty (or whitespace-only) text blocks are rejected
+        if rest.strip():
+            content.append({"type": "text", "text": rest})
+        return [{"role": "user", "content": content}]
+    
+    def _content(self, message: Dict[str, str]):
+        """Message content, as a text block with a cache breakpoint if the message is marked."""
+        if not message.get("cache"):
+            return message["content"]
+        return [{"type": "text", "text": message["content"], "cache_control": CACHE_CONTROL}]
+    
+    def _convert_messages(self, messages: List[Dict[str, str]]):
+        """Split OpenAI-style messages into Anthropic messages and a system prompt."""
         # Convert messages to Anthropic format if needed
         anthropic_messages = []
         for msg in messages:
@@ -46,28 +149,36 @@ class AnthropicConnector(BaseProvider):
             else:
                 role = "user"
             
-            anthropic_messages.append({"role": role, "content": msg["content"]})
+            anthropic_messages.append({"role": role, "content": self._content(msg)})
         
         # Add system message as a parameter if present
-        system_message = next((m["content"] for m in messages if m["role"] == "system"), None)
+        system_message = next((self._content(m) for m in messages if m["role"] == "system"), None)
         
-        response = self.client.messages.create(
-            model=self.model,
-            messages=anthropic_messages,
-            system=system_message,
-            max_tokens=max_tokens or self.config.max_tokens,
-            temperature=temperature or self.config.temperature,
-            **kwargs
-        )
+        return anthropic_messages, system_message
+    
+    def _record_usage(self, usage) -> Dict:
+        """Record a response's token counts and return them in the common usage format.
+        
+        input_tokens does not include the prompt tokens read from or written
+        to the cache; those are reported separately.
+        """
+        cache_read = getattr(usage, "cache_read_input_tokens", None) or 0
+        cache_write = getattr(usage, "cache_creation_input_tokens", None) or 0
+        self.usage.record(usage.input_tokens, usage.output_tokens, cache_read, cache_write)
+        return {
+            "input_tokens": usage.input_tokens,
+            "output_tokens": usage.output_tokens,
+            "total_tokens": usage.input_tokens + usage.output_tokens,
+            "cache_read_tokens": cache_read,
+            "cache_write_tokens": cache_write
+        }
         
+    def _format_chat_response(self, response) -> Dict:
+        """Convert a Messages API response into the common result format."""
         result = {
             "content": response.content[0].text,
             "model": response.model,
-            "usage": {
-                "input_tokens": response.usage.input_tokens,
-                "output_tokens": response.usage.output_tokens,
-                "total_tokens": response.usage.input_tokens + response.usage.output_tokens
-            }
+            "usage": self._record_usage(response.usage)
         }
         
         return result 
\ No newline at end of file
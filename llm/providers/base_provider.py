@@ -1,14 +1,25 @@
 """Base provider class for LLM implementations."""
+import asyncio
+import weakref
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional, Union
+from typing import Callable, Dict, Iterator, List, Optional, Union
 from ..config import ProviderConfig
+from ..usage import UsageMeter
 
 
 class BaseProvider(ABC):
     """Abstract base class for LLM providers."""
     
+    # Whether generate_text/stream_text accept cache_prefix and chat accepts
+    # messages marked with "cache" (see LLMConnector.generate_text)
+    supports_prompt_cache = False
+    
     def __init__(self, config: ProviderConfig):
         self.config = config
+        # Async clients are bound to the event loop that created them
+        self._async_clients = weakref.WeakKeyDictionary()
+        # Token usage reported by the provider API (see llm.usage)
+        self.usage = UsageMeter()
     
     @abstractmethod
     def generate_text(self, prompt: str, max_tokens: Optional[int] = None, 
@@ -20,4 +31,69 @@ class BaseProvider(ABC):
     def chat(self, messages: List[Dict[str, str]], max_tokens: Optional[int] = None,
             temperature: Optional[float] = None, **kwargs) -> Dict:
         """Generate a chat response from a list of messages."""
-        pass 
\ No newline at end of file
+        pass 
+
+    async def agenerate_text(self, prompt: str, max_tokens: Optional[int] = None,
+                             temperature: Optional[float] = None, **kwargs) -> str:
+        """Generate text from a prompt without blocking the event loop.
+
+        Providers with an async SDK or HTTP client override this. The default
+        runs the blocking call in a worker thread.
+        """
+        return await asyncio.to_thread(
+            self.generate_text, prompt, max_tokens=max_tokens, temperature=temperature, **kwargs
+        )
+
+    async def achat(self, messages: List[Dict[str, str]], max_tokens: Optional[int] = None,
+                    temperature: Optional[float] = None, **kwargs) -> Dict:
+        """Generate a chat response without blocking the event loop."""
+        return await asyncio.to_thread(
+            self.chat, messages, max_tokens=max_tokens, temperature=temperature, **kwargs
+        )
+
+    def stream_text(self, prompt: str, max_tokens: Optional[int] = None,
+                    temperature: Optional[float] = None, **kwargs) -> Iterator[str]:
+        """Generate text from a prompt, yielding text deltas as they arrive.
+
+        Providers with a streaming API override this. The default yields the
+        whole completion as a single delta.
+        """
+        yield self.generate_text(prompt, max_tokens=max_tokens, temperature=temperature, **kwargs)
+
+    def get_pool_stats(self) -> Optional[Dict]:
+        """Connection pool statistics, for providers that manage their own HTTP pool."""
+        return None
+
+    def get_usage_stats(self) -> Optional[Dict]:
+        """Token usage totals, for providers that record the usage their API reports."""
+        return self.usage.stats()
+
+    def close(self):
+        """Close this instance's connections, once the connector has replaced or dropped it.
+
+        Providers with their own sync HTTP client extend this. Each async
+        client is closed on the event loop that created it; calls still
+        running on this instance may fail.
+        """
+        clients = list(self._async_clients.items())
+        self._async_clients.clear()
+        for loop, client in clients:
+            if loop.is_closed():
+                # Its connections went with the loop
+                continue
+            # httpx clients have aclose(), the OpenAI and Anthropic SDK clients an async close()
+            close = getattr(client, 'aclose', None) or client.close
+            try:
+                loop.call_soon_threadsafe(lambda close=close, loop=loop: loop.create_task(close()))
+            except RuntimeError:
+                # The loop closed in the meantime
+                pass
+
+    def _get_async_client(self, factory: Callable):
+        """Get the async client for the running event loop, creating it on first use."""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = factory()
+            self._async_clients[loop] = client
+        return client
@@ -1,19 +1,30 @@
 """
 Connector for Amazon Bedrock API.
 """
-import boto3
 import json
 import logging
-from botocore.config import Config
 from botocore.exceptions import ClientError, BotoCoreError
-from typing import List, Dict, Any, Union, Optional
+from typing import List, Dict, Any, Iterator, Union, Optional
 
 from .base_provider import BaseProvider
+from ..aws_clients import boto_config, client_settings, get_client
 from ..config import ProviderConfig
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Request APIs: the Converse API (native messages and system prompts, token
+# usage in every response) or the model-specific invoke_model bodies
+API_CONVERSE = "converse"
+API_INVOKE = "invoke"
+
+# Response headers with the token counts of an invoke_model call
+INPUT_TOKENS_HEADER = "x-amzn-bedrock-input-token-count"
+OUTPUT_TOKENS_HEADER = "x-amzn-bedrock-output-token-count"
+
+# Converse content block that ends a cacheable prompt prefix
+CACHE_POINT = {"cachePoint": {"type": "default"}}
+
 class BedrockConnector(BaseProvider):
     """Connector for Amazon Bedrock API."""
     
@@ -27,47 +38,24 @@ class BedrockConnector(BaseProvider):
         
         # Get configuration parameters
         self.model_id = config.model_name or "amazon.titan-text-express-v1"
-        self.region = config.base_url or "us-east-1"  # Default to us-east-1 if not specified
         self.max_tokens = config.max_tokens or 1000
         self.temperature = config.temperature or 0.7
         
+        # Region, credentials, retries and pool size (see llm.aws_clients)
+        self.client_settings = client_settings(config)
+        self.region = self.client_settings["region"]
+        self.boto_config = boto_config(self.client_settings)
+        
+        # Converse is used unless configured off; models it does not support
+        # switch this to False on the first call and use invoke_model after
+        self.use_converse = config.additional_params.get("bedrock_api", API_CONVERSE) != API_INVOKE
+        # Claude models take cache points; one that rejects them turns this off
+        self._prompt_cache = "claude" in self.model_id.lower()
+        
         try:
-            # Initialize Bedrock client with proper credentials
-            boto_config = Config(
-                region_name=self.region,
-                signature_version="v4",
-                retries={"max_attempts": 10, "mode": "standard"}
-            )
-            
-            # Get credentials from config or environment
-            # For Bedrock, the API key is actually the AWS access key ID
-            if config.api_key and ":" in config.api_key:
-                # Format: "ACCESS_KEY:SECRET_KEY"
-                access_key, secret_key = config.api_key.split(":", 1)
-                self.bedrock_runtime = boto3.client(
-                    service_name="bedrock-runtime",
-                    config=boto_config,
-                    aws_access_key_id=access_key,
-                    aws_secret_access_key=secret_key
-                )
-                logger.info(f"Initialized Bedrock runtime client with explicit credentials in region {self.region}")
-                
-                # We don't need this service client for runtime operations
-                # Only create it if needed for listing models or other operations
-                # self.bedrock = boto3.client(
-                #     service_name="bedrock",
-                #     config=boto_config,
-                #     aws_access_key_id=access_key,
-                #     aws_secret_access_key=secret_key
-                # )
-            else:
-                # Fall back to default credential provider chain
-                self.bedrock_runtime = boto3.client(
-                    service_name="bedrock-runtime",
-                    config=boto_config
-                )
-                logger.info(f"Initialized Bedrock runtime client with environment credentials in region {self.region}")
-                
+            # Get the Bedrock client for these credentials from the pool
+            self.bedrock_runtime = self.aws_client("bedrock-runtime")
+            logger.info(f"Initialized Bedrock runtime client in region {self.region}")
             logger.info(f"Using model: {self.model_id}")
             
         except Exception as e:
@@ -75,13 +63,296 @@ class BedrockConnector(BaseProvider):
             print(f"Failed to initialize Bedrock client: {str(e)}")
             self.bedrock_runtime = None
     
-    def generate_text(self, prompt: str, max_tokens: Optional[int] = None, temperature: Optional[float] = None, **kwargs) -> str:
+    @property
+    def supports_prompt_cache(self) -> bool:
+        """Prompt caching needs the Converse API and a model that supports it."""
+        return self.use_converse and self._prompt_cache
+    
+    def aws_client(self, service_name: str):
+        """Get the shared boto3 client for an AWS service with this provider's region and credentials.
+        
+        Used for the runtime client and for the services batch inference
+        needs (the `bedrock` control plane and S3). Clients come from the
+        process-wide pool, so rebuilding the provider does not create new ones.
+        """
+        return get_client(service_name, self.client_settings)
+    
+    def _build_body(self, prompt: str, max_tokens: Optional[int] = None, temperature: Optional[float] = None, **kwargs) -> str:
+        """Build the JSON request body for the configured model family."""
+        model_id = self.model_id
+        
+        # Set proper parameters based on the model type
+        body_params = {}
+        
+        # Extract numeric values to ensure they're JSON serializable
+        max_tokens_val = int(max_tokens if max_tokens is not None else self.max_tokens)
+        temp_val = float(temperature if temperature is not None else self.temperature)
+        
+        # Handle different model formats - each model family has different parameters
+        if "claude" in model_id.lower():
+            # Anthropic Claude models
+            body_params = {
+                "prompt": f"\n\nHuman: {prompt}\n\nAssistant:",
+                "max_tokens_to_sample": max_tokens_val,
+                "temperature": temp_val,
+                "stop_sequences": ["\n\nHuman:"]
+            }
+        elif "titan" in model_id.lower():
+            # Amazon Titan models
+            body_params = {
+                "inputText": prompt,
+                "textGenerationConfig": {
+                    "maxTokenCount": max_tokens_val,
+                    "temperature": temp_val,
+                    "stopSequences": []
+                }
+            }
+        elif "llama" in model_id.lower() or "meta" in model_id.lower():
+            # Meta Llama models
+            body_params = {
+                "prompt": prompt,
+                "max_gen_len": max_tokens_val,
+                "temperature": temp_val
+            }
+        elif "mistral" in model_id.lower():
+            # Mistral models
+            body_params = {
+                "prompt": prompt,
+                "max_tokens": max_tokens_val,
+                "temperature": temp_val
+            }
+        else:
+            # Generic fallback
+            body_params = {
+                "prompt": prompt,
+                "max_tokens": max_tokens_val,
+                "temperature": temp_val
+            }
+        
+        # Add any additional parameters
+        for key, value in kwargs.items():
+            if key not in ["model_id", "prompt", "max_tokens", "temperature"]:
+                body_params[key] = value
+        
+        # Convert to JSON - this is where the error was happening
+        return json.dumps(body_params)
+    
+    def _extract_text(self, response_body: Dict) -> str:
+        """Pull the generated text out of a response body (or a streamed chunk)."""
+        model_id = self.model_id
+        
+        if "claude" in model_id.lower():
+            return response_body.get('completion', '')
+        elif "titan" in model_id.lower():
+            # Streamed chunks carry outputText at the top level
+            if 'outputText' in response_body:
+                return response_body['outputText']
+            return response_body.get('results', [{}])[0].get('outputText', '')
+        elif "llama" in model_id.lower() or "meta" in model_id.lower():
+            return response_body.get('generation', '')
+        elif "mistral" in model_id.lower():
+            return response_body.get('outputs', [{}])[0].get('text', '')
+        else:
+            # Try to find any text field in the response
+            for key in ['text', 'content', 'output', 'completion', 'response', 'generated_text']:
+                if key in response_body:
+                    return response_body[key]
+            return str(response_body)  # Last resort
+    
+    def _inference_config(self, max_tokens: Optional[int] = None, temperature: Optional[float] = None) -> Dict:
+        return {
+            "maxTokens": int(max_tokens if max_tokens is not None else self.max_tokens),
+            "temperature": float(temperature if temperature is not None else self.temperature)
+        }
+    
+    def _converse_request(self, messages: List[Dict], system: Optional[List[Dict]] = None,
+                          max_tokens: Optional[int] = None, temperature: Optional[float] = None, **kwargs) -> Dict:
+        """Build the Converse/ConverseStream parameters.
+        
+        Extra keyword arguments are model-specific and go in
+        additionalModelRequestFields.
+        """
+        request = {
+            "modelId": self.model_id,
+            "messages": messages,
+            "inferenceConfig": self._inference_config(max_tokens, temperature)
+        }
+        if system:
+            request["system"] = system
+        extra = {key: value for key, value in kwargs.items() if key not in ["model_id", "prompt", "messages", "system"]}
+        if extra:
+            request["additionalModelRequestFields"] = extra
+        return request
+    
+    def _convert_messages(self, messages: List[Dict[str, str]]):
+        """Split OpenAI-style messages into Converse messages and system blocks.
+        
+        Converse wants the conversation to start with a user turn and the
+        roles to alternate, so consecutive messages from the same role are
+        merged into one message with several content blocks. Messages with
+        `"cache": True` are followed by a cache point.
+        """
+        system = []
+        converse_messages = []
+        for message in messages:
+            role = message.get("role", "user")
+            blocks = [{"text": message.get("content", "")}]
+            if message.get("cache") and self.supports_prompt_cache:
+                blocks.append(CACHE_POINT)
+            if role == "system":
+                system.extend(blocks)
+                continue
+            # A leading assistant message has nothing to answer; send it as context
+            role = "assistant" if role == "assistant" and converse_messages else "user"
+            if converse_messages and converse_messages[-1]["role"] == role:
+                converse_messages[-1]["content"].extend(blocks)
+            else:
+                converse_messages.append({"role": role, "content": blocks})
+        return converse_messages, system
+    
+    def _prompt_messages(self, prompt: str, cache_prefix: Optional[str] = None) -> List[Dict]:
+        """The Converse messages for a single prompt, with a cache point after the cached prefix."""
+        if not cache_prefix or not self.supports_prompt_cache:
+            return [{"role": "user", "content": [{"text": prompt}]}]
+        
+        content = [{"text": cache_prefix}, CACHE_POINT]
+        rest = prompt[len(cache_prefix):]
+        if rest.strip():
+            content.append({"text": rest})
+        return [{"role": "user", "content": content}]
+    
+    def _send(self, operation, messages: List[Dict], system: Optional[List[Dict]] = None,
+              max_tokens: Optional[int] = None, temperature: Optional[float] = None, **kwargs) -> Dict:
+        """Call converse or converse_stream.
+        
+        A request with cache points that the model rejects is sent again
+        without them, and prompt caching is turned off for this model.
+        """
+        try:
+            return operation(**self._converse_request(messages, system, max_tokens, temperature, **kwargs))
+        except ClientError as e:
+            blocks = [block for message in messages for block in message["content"]] + (system or [])
+            if CACHE_POINT not in blocks or not self._is_cache_rejected(e):
+                raise
+            logger.warning(f"Prompt caching not available for {self.model_id}: {str(e)}")
+            self._prompt_cache = False
+        
+        messages = [{"role": message["role"], "content": [block for block in message["content"] if block != CACHE_POINT]}
+                    for message in messages]
+        system = [block for block in system or [] if block != CACHE_POINT]
+        return operation(**self._converse_request(messages, system, max_tokens, temperature, **kwargs))
+    
+    def _is_cache_rejected(self, error: ClientError) -> bool:
+        """Whether a validation error is about the request's cache points."""
+        error_info = error.response.get("Error", {})
+        # Covers "cache point" and "cachePoint" messages
+        return (error_info.get("Code") == "ValidationException"
+                and "cache" in error_info.get("Message", "").lower())
+    
+    def _is_unsupported(self, error: Exception) -> bool:
+        """Whether an error means the model (or installed boto3) cannot use the Converse API."""
+        if isinstance(error, AttributeError):
+            # boto3 older than 1.34.116 has no converse method
+            return True
+        if isinstance(error, ClientError):
+            error_info = error.response.get("Error", {})
+            return (error_info.get("Code") == "ValidationException"
+                    and "support" in error_info.get("Message", "").lower())
+        return False
+    
+    def _fall_back_to_invoke(self, error: Exception):
+        logger.warning(f"Converse API not available for {self.model_id}, using invoke_model: {str(error)}")
+        self.use_converse = False
+    
+    def _record_usage(self, input_tokens, output_tokens, cache_read_tokens=0, cache_write_tokens=0) -> Dict:
+        """Record a call's token counts and return them in the common usage format.
+        
+        prompt_tokens does not include the tokens read from or written to the
+        prompt cache; those are reported separately.
+        """
+        input_tokens = int(input_tokens or 0)
+        output_tokens = int(output_tokens or 0)
+        cache_read_tokens = int(cache_read_tokens or 0)
+        cache_write_tokens = int(cache_write_tokens or 0)
+        self.usage.record(input_tokens, output_tokens, cache_read_tokens, cache_write_tokens)
+        return {
+            "prompt_tokens": input_tokens,
+            "completion_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+            "cache_read_tokens": cache_read_tokens,
+            "cache_write_tokens": cache_write_tokens
+        }
+    
+    def _record_converse_usage(self, usage: Dict) -> Dict:
+        return self._record_usage(usage.get("inputTokens"), usage.get("outputTokens"),
+                                  usage.get("cacheReadInputTokens"), usage.get("cacheWriteInputTokens"))
+    
+    def converse(self, messages: List[Dict[str, str]], max_tokens: Optional[int] = None,
+                 temperature: Optional[float] = None, **kwargs) -> Dict:
+        """Send a conversation with the Converse API.
+        
+        Args:
+            messages: List of message dictionaries with 'role' and 'content'
+                (and optionally 'cache', see _convert_messages)
+            max_tokens: Maximum tokens in the response (overrides config)
+            temperature: Temperature for generation (overrides config)
+            **kwargs: Additional model-specific parameters
+            
+        Returns:
+            Dictionary with 'content', 'model', 'usage' and 'stop_reason'
+        """
+        converse_messages, system = self._convert_messages(messages)
+        return self._converse(converse_messages, system, max_tokens, temperature, **kwargs)
+    
+    def _converse(self, messages: List[Dict], system: Optional[List[Dict]] = None, max_tokens: Optional[int] = None,
+                  temperature: Optional[float] = None, **kwargs) -> Dict:
+        response = self._send(self.bedrock_runtime.converse, messages, system, max_tokens, temperature, **kwargs)
+        
+        content = response.get("output", {}).get("message", {}).get("content", [])
+        return {
+            "content": "".join(block.get("text", "") for block in content),
+            "model": self.model_id,
+            "usage": self._record_converse_usage(response.get("usage", {})),
+            "stop_reason": response.get("stopReason")
+        }
+    
+    def _invoke(self, prompt: str, max_tokens: Optional[int] = None, temperature: Optional[float] = None, **kwargs):
+        """Generate text with invoke_model and the model family's own request body.
+        
+        Returns:
+            Tuple of (text, usage); usage is empty if Bedrock sent no token counts
+        """
+        body = self._build_body(prompt, max_tokens, temperature, **kwargs)
+        
+        # Call the Bedrock Runtime service
+        response = self.bedrock_runtime.invoke_model(
+            modelId=self.model_id,
+            body=body
+        )
+        
+        # Bedrock reports the token counts in the response headers
+        headers = response.get("ResponseMetadata", {}).get("HTTPHeaders", {})
+        usage = {}
+        if INPUT_TOKENS_HEADER in headers:
+            usage = self._record_usage(headers.get(INPUT_TOKENS_HEADER), headers.get(OUTPUT_TOKENS_HEADER))
+        
+        # Process the response based on the model
+        response_body = json.loads(response.get('body').read())
+        return self._extract_text(response_body), usage
+    
+    def generate_text(self, prompt: str, max_tokens: Optional[int] = None, temperature: Optional[float] = None,
+                      cache_prefix: Optional[str] = None, **kwargs) -> str:
         """Generate text using the Amazon Bedrock service.
         
+        Uses the Converse API, falling back to invoke_model for models it
+        does not support.
+        
         Args:
             prompt: The text prompt to send to the model
             max_tokens: Maximum tokens in the response (overrides config)
             temperature: Temperature for generation (overrides config)
+            cache_prefix: Leading part of the prompt to put before a cache
+                point (Claude models with the Converse API)
             **kwargs: Additional parameters for the model
             
         Returns:
@@ -91,97 +362,76 @@ class BedrockConnector(BaseProvider):
             return "Error: Bedrock client not initialized"
         
         try:
-            # Determine the model ID from the configuration
-            model_id = self.model_id
-            
-            # Set proper parameters based on the model type
-            body_params = {}
-            
-            # Extract numeric values to ensure they're JSON serializable
-            max_tokens_val = int(max_tokens if max_tokens is not None else self.max_tokens)
-            temp_val = float(temperature if temperature is not None else self.temperature)
-            
-            # Handle different model formats - each model family has different parameters
-            if "claude" in model_id.lower():
-                # Anthropic Claude models
-                body_params = {
-                    "prompt": f"\n\nHuman: {prompt}\n\nAssistant:",
-                    "max_tokens_to_sample": max_tokens_val,
-                    "temperature": temp_val,
-                    "stop_sequences": ["\n\nHuman:"]
-                }
-            elif "titan" in model_id.lower():
-                # Amazon Titan models
-                body_params = {
-                    "inputText": prompt,
-                    "textGenerationConfig": {
-                        "maxTokenCount": max_tokens_val,
-                        "temperature": temp_val,
-                        "stopSequences": []
-                    }
-                }
-            elif "llama" in model_id.lower() or "meta" in model_id.lower():
-                # Meta Llama models
-                body_params = {
-                    "prompt": prompt,
-                    "max_gen_len": max_tokens_val,
-                    "temperature": temp_val
-                }
-            elif "mistral" in model_id.lower():
-                # Mistral models
-                body_params = {
-                    "prompt": prompt,
-                    "max_tokens": max_tokens_val,
-                    "temperature": temp_val
-                }
-            else:
-                # Generic fallback
-                body_params = {
-                    "prompt": prompt,
-                    "max_tokens": max_tokens_val,
-                    "temperature": temp_val
-                }
-            
-            # Add any additional parameters
-            for key, value in kwargs.items():
-                if key not in ["model_id", "prompt", "max_tokens", "temperature"]:
-                    body_params[key] = value
-            
-            # Convert to JSON - this is where the error was happening
-            body = json.dumps(body_params)
-            
-            # Call the Bedrock Runtime service
-            response = self.bedrock_runtime.invoke_model(
-                modelId=model_id,
-                body=body
-            )
-            
-            # Process the response based on the model
-            response_body = json.loads(response.get('body').read())
-            
-            if "claude" in model_id.lower():
-                return response_body.get('completion', '')
-            elif "titan" in model_id.lower():
-                return response_body.get('results', [{}])[0].get('outputText', '')
-            elif "llama" in model_id.lower() or "meta" in model_id.lower():
-                return response_body.get('generation', '')
-            elif "mistral" in model_id.lower():
-                return response_body.get('outputs', [{}])[0].get('text', '')
-            else:
-                # Try to find any text field in the response
-                for key in ['text', 'content', 'output', 'completion', 'response', 'generated_text']:
-                    if key in response_body:
-                        return response_body[key]
-                return str(response_body)  # Last resort
+            if self.use_converse:
+                try:
+                    return self._converse(self._prompt_messages(prompt, cache_prefix), None, max_tokens,
+                                          temperature, **kwargs)["content"]
+                except (ClientError, AttributeError) as e:
+                    if not self._is_unsupported(e):
+                        raise
+                    self._fall_back_to_invoke(e)
+            return self._invoke(prompt, max_tokens, temperature, **kwargs)[0]
                 
         except Exception as e:
             error_msg = f"Error in Bedrock text generation: {str(e)}"
             logger.error(error_msg)
             return f"Error: {error_msg}"
     
+    def stream_text(self, prompt: str, max_tokens: Optional[int] = None, temperature: Optional[float] = None,
+                    cache_prefix: Optional[str] = None, **kwargs) -> Iterator[str]:
+        """Stream text with converse_stream (or invoke_model_with_response_stream), yielding text deltas.
+        
+        Unlike generate_text, errors are raised so the caller can tell a
+        failed stream from generated text. The token usage sent at the end
+        of the stream is recorded.
+        """
+        if not self.bedrock_runtime:
+            raise RuntimeError("Bedrock client not initialized")
+        
+        if self.use_converse:
+            try:
+                response = self._send(self.bedrock_runtime.converse_stream, self._prompt_messages(prompt, cache_prefix),
+                                      None, max_tokens, temperature, **kwargs)
+            except (ClientError, AttributeError) as e:
+                if not self._is_unsupported(e):
+                    raise
+                self._fall_back_to_invoke(e)
+            else:
+                for event in response.get("stream"):
+                    if "contentBlockDelta" in event:
+                        text = event["contentBlockDelta"].get("delta", {}).get("text")
+                        if text:
+                            yield text
+                    elif "metadata" in event:
+                        self._record_converse_usage(event["metadata"].get("usage", {}))
+                return
+        
+        body = self._build_body(prompt, max_tokens, temperature, **kwargs)
+        response = self.bedrock_runtime.invoke_model_with_response_stream(
+            modelId=self.model_id,
+            body=body
+        )
+        
+        for event in response.get('body'):
+            chunk = event.get('chunk')
+            if not chunk:
+                continue
+            chunk_body = json.loads(chunk.get('bytes'))
+            # The last chunk carries the token counts for the whole call
+            metrics = chunk_body.get('amazon-bedrock-invocationMetrics')
+            if metrics:
+                self._record_usage(metrics.get('inputTokenCount'), metrics.get('outputTokenCount'))
+            text = self._extract_text(chunk_body)
+            if text:
+                yield text
+    
     def chat(self, messages: List[Dict[str, str]], **kwargs) -> Dict:
         """Generate a response to a conversation using Amazon Bedrock.
         
+        With the Converse API the messages and system prompt are sent as they
+        are and the usage is what Bedrock reports; with invoke_model they are
+        flattened into a single prompt.
+        
         Args:
             messages: List of message dictionaries with 'role' and 'content'
             **kwargs: Additional parameters
@@ -190,6 +440,17 @@ class BedrockConnector(BaseProvider):
             Dictionary containing the response and metadata
         """
         try:
+            if not self.bedrock_runtime:
+                return {"content": "Error: Bedrock client not initialized", "model": self.model_id, "usage": {}}
+            
+            if self.use_converse:
+                try:
+                    return self.converse(messages, **kwargs)
+                except (ClientError, AttributeError) as e:
+                    if not self._is_unsupported(e):
+                        raise
+                    self._fall_back_to_invoke(e)
+            
             # Most Bedrock models don't have a native chat format, so we'll convert
             # the messages to a prompt string
             
@@ -230,18 +491,13 @@ class BedrockConnector(BaseProvider):
                     prompt += "\nAssistant:"
             
             # Generate the response
-            response_text = self.generate_text(prompt, **kwargs)
+            response_text, usage = self._invoke(prompt, **kwargs)
             
             # Return in a format compatible with other providers
             return {
                 "content": response_text,
                 "model": self.model_id,
-                "usage": {
-                    # Bedrock doesn't provide token counts in a standard way
-                    "prompt_tokens": 0,
-                    "completion_tokens": 0,
-                    "total_tokens": 0
-                }
+                "usage": usage
             }
         
         except Exception as e:
@@ -1,8 +1,8 @@
 """Generic REST API implementation for other LLM providers."""
-import requests
 from typing import Dict, List, Optional, Union
 from .base_provider import BaseProvider
 from ..config import ProviderConfig
+from ..http_pool import PooledHTTPClient, build_async_client
 
 
 class GenericConnector(BaseProvider):
@@ -13,17 +13,39 @@ class GenericConnector(BaseProvider):
         self.api_key = config.api_key
         self.base_url = config.base_url 
         self.model = config.model_name
+        # Keep-alive connection pool shared by every call on this instance
+        self.http = PooledHTTPClient(config)
         
+    def _headers(self) -> Dict:
+        """Request headers for the API."""
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+    
+    def get_pool_stats(self) -> Dict:
+        """Connection pool statistics for this provider."""
+        return self.http.stats()
+    
+    def close(self):
+        """Close the pooled session and the async clients."""
+        self.http.close()
+        super().close()
+    
     def _make_request(self, endpoint: str, payload: Dict) -> Dict:
         """Make a request to the API."""
         url = f"{self.base_url}/{endpoint}"
         
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
+        response = self.http.post(url, json=payload, headers=self._headers())
+        response.raise_for_status()
+        
+        return response.json()
+    
+    async def _amake_request(self, endpoint: str, payload: Dict) -> Dict:
+        """Make a request to the API without blocking the event loop."""
+        client = self._get_async_client(lambda: build_async_client(self.config))
         
-        response = requests.post(url, json=payload, headers=headers)
+        response = await client.post(f"{self.base_url}/{endpoint}", json=payload, headers=self._headers())
         response.raise_for_status()
         
         return response.json()
@@ -31,6 +53,22 @@ class GenericConnector(BaseProvider):
     def generate_text(self, prompt: str, max_tokens: Optional[int] = None, 
                      temperature: Optional[float] = None, **kwargs) -> str:
         """Generate text completion from a prompt."""
+        payload, endpoint = self._completion_request(prompt, max_tokens, temperature, **kwargs)
+        response = self._make_request(endpoint, payload)
+        
+        return self._extract_text(response)
+    
+    async def agenerate_text(self, prompt: str, max_tokens: Optional[int] = None,
+                             temperature: Optional[float] = None, **kwargs) -> str:
+        """Generate text completion from a prompt asynchronously."""
+        payload, endpoint = self._completion_request(prompt, max_tokens, temperature, **kwargs)
+        response = await self._amake_request(endpoint, payload)
+        
+        return self._extract_text(response)
+    
+    def _completion_request(self, prompt: str, max_tokens: Optional[int] = None,
+                            temperature: Optional[float] = None, **kwargs):
+        """Build the completion payload and endpoint."""
         payload = {
             "model": self.model,
             "prompt": prompt,
@@ -39,8 +77,7 @@ class GenericConnector(BaseProvider):
         }
         
         # Add any additional parameters from config
-        if self.config.additional_params:
-            payload.update(self.config.additional_params)
+        payload.update(self.config.request_params())
             
         # Add any runtime parameters
         payload.update(kwargs)
@@ -48,8 +85,10 @@ class GenericConnector(BaseProvider):
         # The endpoint path is configurable through additional_params
         endpoint = self.config.additional_params.get("completion_endpoint", "completions")
         
-        response = self._make_request(endpoint, payload)
+        return payload, endpoint
         
+    def _extract_text(self, response: Dict) -> str:
+        """Pull the completion text out of a response body."""
         # The response parsing is configurable through additional_params
         text_path = self.config.additional_params.get("text_path", "choices.0.text")
         
@@ -69,6 +108,22 @@ class GenericConnector(BaseProvider):
     def chat(self, messages: List[Dict[str, str]], max_tokens: Optional[int] = None,
             temperature: Optional[float] = None, **kwargs) -> Dict:
         """Generate a chat response from a list of messages."""
+        payload, endpoint = self._chat_request(messages, max_tokens, temperature, **kwargs)
+        response = self._make_request(endpoint, payload)
+        
+        return self._format_chat_response(response)
+    
+    async def achat(self, messages: List[Dict[str, str]], max_tokens: Optional[int] = None,
+                    temperature: Optional[float] = None, **kwargs) -> Dict:
+        """Generate a chat response from a list of messages asynchronously."""
+        payload, endpoint = self._chat_request(messages, max_tokens, temperature, **kwargs)
+        response = await self._amake_request(endpoint, payload)
+        
+        return self._format_chat_response(response)
+    
+    def _chat_request(self, messages: List[Dict[str, str]], max_tokens: Optional[int] = None,
+                      temperature: Optional[float] = None, **kwargs):
+        """Build the chat payload and endpoint."""
         payload = {
             "model": self.model,
             "messages": messages,
@@ -77,8 +132,7 @@ class GenericConnector(BaseProvider):
         }
         
         # Add any additional parameters from config
-        if self.config.additional_params:
-            payload.update(self.config.additional_params)
+        payload.update(self.config.request_params())
             
         # Add any runtime parameters
         payload.update(kwargs)
@@ -86,8 +140,10 @@ class GenericConnector(BaseProvider):
         # The endpoint path is configurable through additional_params
         endpoint = self.config.additional_params.get("chat_endpoint", "chat/completions")
         
-        response = self._make_request(endpoint, payload)
+        return payload, endpoint
         
+    def _format_chat_response(self, response: Dict) -> Dict:
+        """Convert a chat response body into the common result format."""
         # The response parsing is configurable through additional_params
         content_path = self.config.additional_params.get("content_path", "choices.0.message.content")
         
@@ -1,8 +1,8 @@
 """Grok AI implementation for LLM provider."""
-import requests
 from typing import Dict, List, Optional, Union
 from .base_provider import BaseProvider
 from ..config import ProviderConfig
+from ..http_pool import PooledHTTPClient, build_async_client
 
 
 class GrokConnector(BaseProvider):
@@ -13,17 +13,39 @@ class GrokConnector(BaseProvider):
         self.api_key = config.api_key
         self.base_url = config.base_url or "https://api.grok.ai/v1"
         self.model = config.model_name or "grok-1"
+        # Keep-alive connection pool shared by every call on this instance
+        self.http = PooledHTTPClient(config)
         
+    def _headers(self) -> Dict:
+        """Request headers for the Grok API."""
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+    
+    def get_pool_stats(self) -> Dict:
+        """Connection pool statistics for this provider."""
+        return self.http.stats()
+    
+    def close(self):
+        """Close the pooled session and the async clients."""
+        self.http.close()
+        super().close()
+    
     def _make_request(self, endpoint: str, payload: Dict) -> Dict:
         """Make a request to the Grok API."""
         url = f"{self.base_url}/{endpoint}"
         
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
+        response = self.http.post(url, json=payload, headers=self._headers())
+        response.raise_for_status()
         
-        response = requests.post(url, json=payload, headers=headers)
+        return response.json()
+    
+    async def _amake_request(self, endpoint: str, payload: Dict) -> Dict:
+        """Make a request to the Grok API without blocking the event loop."""
+        client = self._get_async_client(lambda: build_async_client(self.config))
+        
+        response = await client.post(f"{self.base_url}/{endpoint}", json=payload, headers=self._headers())
         response.raise_for_status()
         
         return response.json()
@@ -31,6 +53,22 @@ class GrokConnector(BaseProvider):
     def generate_text(self, prompt: str, max_tokens: Optional[int] = None, 
                      temperature: Optional[float] = None, **kwargs) -> str:
         """Generate text completion from a prompt."""
+        payload = self._completion_payload(prompt, max_tokens, temperature, **kwargs)
+        response = self._make_request("completions", payload)
+        
+        return response.get("choices", [{}])[0].get("text", "")
+    
+    async def agenerate_text(self, prompt: str, max_tokens: Optional[int] = None,
+                             temperature: Optional[float] = None, **kwargs) -> str:
+        """Generate text completion from a prompt asynchronously."""
+        payload = self._completion_payload(prompt, max_tokens, temperature, **kwargs)
+        response = await self._amake_request("completions", payload)
+        
+        return response.get("choices", [{}])[0].get("text", "")
+    
+    def _completion_payload(self, prompt: str, max_tokens: Optional[int] = None,
+                            temperature: Optional[float] = None, **kwargs) -> Dict:
+        """Build the request body for the completions endpoint."""
         payload = {
             "model": self.model,
             "prompt": prompt,
@@ -41,13 +79,27 @@ class GrokConnector(BaseProvider):
         # Add any additional parameters
         payload.update(kwargs)
         
-        response = self._make_request("completions", payload)
-        
-        return response.get("choices", [{}])[0].get("text", "")
+        return payload
     
     def chat(self, messages: List[Dict[str, str]], max_tokens: Optional[int] = None,
             temperature: Optional[float] = None, **kwargs) -> Dict:
         """Generate a chat response from a list of messages."""
+        payload = self._chat_payload(messages, max_tokens, temperature, **kwargs)
+        response = self._make_request("chat/completions", payload)
+        
+        return self._format_chat_response(response)
+    
+    async def achat(self, messages: List[Dict[str, str]], max_tokens: Optional[int] = None,
+                    temperature: Optional[float] = None, **kwargs) -> Dict:
+        """Generate a chat response from a list of messages asynchronously."""
+        payload = self._chat_payload(messages, max_tokens, temperature, **kwargs)
+        response = await self._amake_request("chat/completions", payload)
+        
+        return self._format_chat_response(response)
+    
+    def _chat_payload(self, messages: List[Dict[str, str]], max_tokens: Optional[int] = None,
+                      temperature: Optional[float] = None, **kwargs) -> Dict:
+        """Build the request body for the chat completions endpoint."""
         payload = {
             "model": self.model,
             "messages": messages,
@@ -58,8 +110,10 @@ class GrokConnector(BaseProvider):
         # Add any additional parameters
         payload.update(kwargs)
         
-        response = self._make_request("chat/completions", payload)
+        return payload
         
+    def _format_chat_response(self, response: Dict) -> Dict:
+        """Convert a chat completion body into the common result format."""
         result = {
             "content": response.get("choices", [{}])[0].get("message", {}).get("content", ""),
             "model": self.model,
@@ -1,9 +1,9 @@
 """Ollama implementation for local LLM provider."""
-import requests
 import json
-from typing import Dict, List, Optional, Union
+from typing import Dict, Iterator, List, Optional, Union
 from .base_provider import BaseProvider
 from ..config import ProviderConfig
+from ..http_pool import PooledHTTPClient, build_async_client
 
 
 class OllamaConnector(BaseProvider):
@@ -13,12 +13,63 @@ class OllamaConnector(BaseProvider):
         super().__init__(config)
         self.base_url = config.base_url or "http://localhost:11434"
         self.model = config.model_name or "llama3"
+        # Keep-alive connection pool shared by every call on this instance
+        self.http = PooledHTTPClient(config)
+        
+    def get_pool_stats(self) -> Dict:
+        """Connection pool statistics for this provider."""
+        return self.http.stats()
+    
+    def close(self):
+        """Close the pooled session and the async clients."""
+        self.http.close()
+        super().close()
+    
+    def _async_client(self):
+        """Get the httpx client for the running event loop."""
+        return self._get_async_client(lambda: build_async_client(self.config))
         
     def generate_text(self, prompt: str, max_tokens: Optional[int] = None, 
                      temperature: Optional[float] = None, **kwargs) -> str:
         """Generate text completion from a prompt."""
-        url = f"{self.base_url}/api/generate"
+        payload = self._generate_payload(prompt, max_tokens, temperature, **kwargs)
         
+        response = self.http.post(f"{self.base_url}/api/generate", json=payload)
+        response.raise_for_status()
+        
+        return response.json().get("response", "")
+    
+    def stream_text(self, prompt: str, max_tokens: Optional[int] = None,
+                    temperature: Optional[float] = None, **kwargs) -> Iterator[str]:
+        """Stream a completion from /api/generate, yielding text deltas."""
+        payload = self._generate_payload(prompt, max_tokens, temperature, **kwargs)
+        payload["stream"] = True
+        
+        with self.http.post(f"{self.base_url}/api/generate", json=payload, stream=True) as response:
+            response.raise_for_status()
+            # Ollama streams one JSON object per line
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                if data.get("response"):
+                    yield data["response"]
+                if data.get("done"):
+                    break
+    
+    async def agenerate_text(self, prompt: str, max_tokens: Optional[int] = None,
+                             temperature: Optional[float] = None, **kwargs) -> str:
+        """Generate text completion from a prompt asynchronously."""
+        payload = self._generate_payload(prompt, max_tokens, temperature, **kwargs)
+        
+        response = await self._async_client().post(f"{self.base_url}/api/generate", json=payload)
+        response.raise_for_status()
+        
+        return response.json().get("response", "")
+    
+    def _generate_payload(self, prompt: str, max_tokens: Optional[int] = None,
+                          temperature: Optional[float] = None, **kwargs) -> Dict:
+        """Build the request body for /api/generate."""
         payload = {
             "model": self.model,
             "prompt": prompt,
@@ -33,16 +84,31 @@ class OllamaConnector(BaseProvider):
         # Add any additional parameters
         payload.update(kwargs)
         
-        response = requests.post(url, json=payload)
-        response.raise_for_status()
-        
-        return response.json().get("response", "")
+        return payload
     
     def chat(self, messages: List[Dict[str, str]], max_tokens: Optional[int] = None,
             temperature: Optional[float] = None, **kwargs) -> Dict:
         """Generate a chat response from a list of messages."""
-        url = f"{self.base_url}/api/chat"
+        payload = self._chat_payload(messages, max_tokens, temperature, **kwargs)
+        
+        response = self.http.post(f"{self.base_url}/api/chat", json=payload)
+        response.raise_for_status()
         
+        return self._format_chat_response(response.json())
+    
+    async def achat(self, messages: List[Dict[str, str]], max_tokens: Optional[int] = None,
+                    temperature: Optional[float] = None, **kwargs) -> Dict:
+        """Generate a chat response from a list of messages asynchronously."""
+        payload = self._chat_payload(messages, max_tokens, temperature, **kwargs)
+        
+        response = await self._async_client().post(f"{self.base_url}/api/chat", json=payload)
+        response.raise_for_status()
+        
+        return self._format_chat_response(response.json())
+    
+    def _chat_payload(self, messages: List[Dict[str, str]], max_tokens: Optional[int] = None,
+                      temperature: Optional[float] = None, **kwargs) -> Dict:
+        """Build the request body for /api/chat."""
         payload = {
             "model": self.model,
             "messages": messages,
@@ -57,10 +123,10 @@ class OllamaConnector(BaseProvider):
         # Add any additional parameters
         payload.update(kwargs)
         
-        response = requests.post(url, json=payload)
-        response.raise_for_status()
-        response_data = response.json()
+        return payload
         
+    def _format_chat_response(self, response_data: Dict) -> Dict:
+        """Convert an /api/chat body into the common result format."""
         result = {
             "content": response_data.get("message", {}).get("content", ""),
             "model": self.model,
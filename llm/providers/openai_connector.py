@@ -1,6 +1,6 @@
 """OpenAI implementation for LLM provider."""
 import openai
-from typing import Dict, List, Optional, Union
+from typing import Dict, Iterator, List, Optional, Union
 from .base_provider import BaseProvider
 from ..config import ProviderConfig
 
@@ -16,6 +16,18 @@ class OpenAIConnector(BaseProvider):
         )
         self.model = config.model_name or "gpt-4o"
         
+    def close(self):
+        """Close the SDK clients' connection pools."""
+        self.client.close()
+        super().close()
+        
+    def _async_client(self):
+        """Get the AsyncOpenAI client for the running event loop."""
+        return self._get_async_client(lambda: openai.AsyncOpenAI(
+            api_key=self.config.api_key,
+            base_url=self.config.base_url
+        ))
+
     def generate_text(self, prompt: str, max_tokens: Optional[int] = None, 
                      temperature: Optional[float] = None, **kwargs) -> str:
         """Generate text completion from a prompt."""
@@ -27,6 +39,33 @@ class OpenAIConnector(BaseProvider):
             **kwargs
         )
         return response.choices[0].text.strip()
+
+    def stream_text(self, prompt: str, max_tokens: Optional[int] = None,
+                    temperature: Optional[float] = None, **kwargs) -> Iterator[str]:
+        """Stream a text completion, yielding text deltas."""
+        stream = self.client.completions.create(
+            model=self.model,
+            prompt=prompt,
+            max_tokens=max_tokens or self.config.max_tokens,
+            temperature=temperature or self.config.temperature,
+            stream=True,
+            **kwargs
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].text:
+                yield chunk.choices[0].text
+
+    async def agenerate_text(self, prompt: str, max_tokens: Optional[int] = None,
+                             temperature: Optional[float] = None, **kwargs) -> str:
+        """Generate text completion from a prompt asynchronously."""
+        response = await self._async_client().completions.create(
+            model=self.model,
+            prompt=prompt,
+            max_tokens=max_tokens or self.config.max_tokens,
+            temperature=temperature or self.config.temperature,
+            **kwargs
+        )
+        return response.choices[0].text.strip()
     
     def chat(self, messages: List[Dict[str, str]], max_tokens: Optional[int] = None,
             temperature: Optional[float] = None, **kwargs) -> Dict:
@@ -39,6 +78,23 @@ class OpenAIConnector(BaseProvider):
             **kwargs
         )
         
+        return self._format_chat_response(response)
+
+    async def achat(self, messages: List[Dict[str, str]], max_tokens: Optional[int] = None,
+                    temperature: Optional[float] = None, **kwargs) -> Dict:
+        """Generate a chat response from a list of messages asynchronously."""
+        response = await self._async_client().chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=max_tokens or self.config.max_tokens,
+            temperature=temperature or self.config.temperature,
+            **kwargs
+        )
+
+        return self._format_chat_response(response)
+
+    def _format_chat_response(self, response) -> Dict:
+        """Convert a chat completion into the common result format."""
         result = {
             "content": response.choices[0].message.content,
             "model": response.model,
@@ -49,4 +105,4 @@ class OpenAIConnector(BaseProvider):
             }
         }
         
-        return result 
\ No newline at end of file
+        return result 
@@ -0,0 +1,227 @@
+"""
+Per-provider rate limiting for LLM calls.
+
+Each provider can be limited through its `additional_params`:
+
+    rpm             requests per minute
+    tpm             tokens per minute (prompt estimate + max_tokens per call)
+    max_in_flight   concurrent calls (`max_concurrency`, the older bulk job
+                    setting, is read as max_in_flight when it is not set)
+
+Limits are shared by every thread in the worker process. Calls over the
+limit wait for capacity instead of failing, and the time spent waiting is
+reported by `ProviderLimiter.stats()`.
+"""
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Optional
+
+from .config import ProviderConfig
+
+LIMIT_PARAMS = ('rpm', 'tpm', 'max_in_flight')
+
+# Async callers poll for a free in-flight slot, backing off between these (seconds)
+SLOT_POLL_MIN = 0.005
+SLOT_POLL_MAX = 0.1
+
+
+def _limit_settings(config: ProviderConfig) -> Dict:
+    """Read the limit params from a provider configuration."""
+    params = config.additional_params or {}
+    settings = {key: params.get(key) for key in LIMIT_PARAMS}
+    if not settings['max_in_flight']:
+        settings['max_in_flight'] = params.get('max_concurrency')
+    return settings
+
+
+class TokenBucket:
+    """Thread-safe token bucket that refills continuously at `per_minute`."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = float(per_minute) / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` tokens and return how long the caller must wait before using them."""
+        # A single call larger than the bucket would otherwise wait forever
+        amount = min(float(amount), self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def available(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+
+class ProviderLimiter:
+    """Requests/min, tokens/min and in-flight limits for one provider."""
+
+    def __init__(self, name: str, rpm: Optional[float] = None, tpm: Optional[float] = None,
+                 max_in_flight: Optional[int] = None):
+        self.name = name
+        self.settings = {'rpm': rpm, 'tpm': tpm, 'max_in_flight': max_in_flight}
+        self.requests_bucket = TokenBucket(rpm) if rpm else None
+        self.tokens_bucket = TokenBucket(tpm) if tpm else None
+        self.in_flight_slots = threading.BoundedSemaphore(int(max_in_flight)) if max_in_flight else None
+
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._max_queued = 0
+        self._in_flight = 0
+        self._requests = 0
+        self._delayed = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    @classmethod
+    def from_config(cls, name: str, config: ProviderConfig) -> Optional['ProviderLimiter']:
+        """Build a limiter from a provider configuration, or None if it sets no limits."""
+        settings = _limit_settings(config)
+        if not any(settings.values()):
+            return None
+        return cls(
+            name,
+            rpm=float(settings['rpm']) if settings['rpm'] else None,
+            tpm=float(settings['tpm']) if settings['tpm'] else None,
+            max_in_flight=int(settings['max_in_flight']) if settings['max_in_flight'] else None
+        )
+
+    def matches(self, config: ProviderConfig) -> bool:
+        """Whether this limiter was built from the same limit settings."""
+        current = _limit_settings(config)
+        return all(
+            (float(current[key]) if current[key] else None) == (float(value) if value else None)
+            for key, value in self.settings.items()
+        )
+
+    def _enqueue(self) -> float:
+        with self._lock:
+            self._queued += 1
+            self._max_queued = max(self._max_queued, self._queued)
+        return time.monotonic()
+
+    def _dequeue(self, started: float, admitted: bool) -> float:
+        """Leave the queue; a call that got through counts as in flight."""
+        waited = time.monotonic() - started
+        with self._lock:
+            self._queued -= 1
+            if admitted:
+                self._in_flight += 1
+                self._requests += 1
+                self._total_wait += waited
+                self._max_wait = max(self._max_wait, waited)
+                if waited > 0.001:
+                    self._delayed += 1
+        return waited
+
+    def _reserve(self, tokens: int) -> float:
+        """Reserve from both buckets; returns the longer of the two waits."""
+        delay = 0.0
+        if self.requests_bucket:
+            delay = max(delay, self.requests_bucket.reserve(1))
+        if self.tokens_bucket:
+            delay = max(delay, self.tokens_bucket.reserve(tokens))
+        return delay
+
+    def _acquire(self, tokens: int) -> float:
+        """Block until the call may start; returns the time spent waiting."""
+        started = self._enqueue()
+        admitted = False
+        try:
+            if self.in_flight_slots:
+                self.in_flight_slots.acquire()
+            try:
+                delay = self._reserve(tokens)
+                if delay > 0:
+                    time.sleep(delay)
+            except BaseException:
+                if self.in_flight_slots:
+                    self.in_flight_slots.release()
+                raise
+            admitted = True
+        finally:
+            waited = self._dequeue(started, admitted)
+        return waited
+
+    async def _aacquire(self, tokens: int) -> float:
+        """Async version of `_acquire`.
+
+        Waits on the event loop rather than in a worker thread, so waiting
+        calls do not use up the default executor, and a cancelled call
+        never holds a slot.
+        """
+        started = self._enqueue()
+        admitted = False
+        try:
+            if self.in_flight_slots:
+                backoff = SLOT_POLL_MIN
+                while not self.in_flight_slots.acquire(blocking=False):
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, SLOT_POLL_MAX)
+            try:
+                delay = self._reserve(tokens)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            except BaseException:
+                if self.in_flight_slots:
+                    self.in_flight_slots.release()
+                raise
+            admitted = True
+        finally:
+            waited = self._dequeue(started, admitted)
+        return waited
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+        if self.in_flight_slots:
+            self.in_flight_slots.release()
+
+    @contextmanager
+    def limit(self, tokens: int = 1):
+        """Wait for capacity, then hold an in-flight slot for the duration of the call."""
+        self._acquire(tokens)
+        try:
+            yield
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def alimit(self, tokens: int = 1):
+        """Async version of `limit`; waiting does not block the event loop."""
+        await self._aacquire(tokens)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def stats(self) -> Dict:
+        """Queue depth, in-flight calls and wait time."""
+        with self._lock:
+            return {
+                'rpm': self.settings['rpm'],
+                'tpm': self.settings['tpm'],
+                'max_in_flight': self.settings['max_in_flight'],
+                'queue_depth': self._queued,
+                'max_queue_depth': self._max_queued,
+                'in_flight': self._in_flight,
+                'requests': self._requests,
+                'delayed': self._delayed,
+                'avg_wait_ms': round(self._total_wait / self._requests * 1000, 1) if self._requests else 0.0,
+                'max_wait_ms': round(self._max_wait * 1000, 1)
+            }
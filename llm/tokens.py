@@ -0,0 +1,207 @@
+"""
+Token counting for prompt budgets and rate limits.
+
+Each provider gets a token counter:
+
+    - OpenAI-style models use their BPE vocabulary through `tiktoken` when it
+      is installed and the vocabulary is available offline
+    - everything else (and OpenAI without tiktoken) uses a heuristic that
+      counts words, letters, digits, punctuation runs and non-Latin
+      characters, with weights fitted against cl100k_base, and is scaled
+      per model family
+
+Counts of prompt templates and fixed prompt prefixes, which repeat across
+calls, are memoized in a small LRU cache per counter (`count_template`);
+other texts are counted every time. A provider's counter can be chosen with
+the `tokenizer` additional param: 'heuristic' or a tiktoken encoding name
+such as 'cl100k_base'.
+"""
+import re
+import threading
+from functools import lru_cache
+from typing import Dict, Optional
+
+# Template counts kept per counter
+TEMPLATE_CACHE_SIZE = 256
+
+
+def _char_class(char: str) -> str:
+    """Class of a character: 'a' letter (ASCII or accented Latin), '0' digit, ' ' space, '.' ASCII symbol."""
+    # Other non-ASCII characters are kept as they are
+    if char.isalpha():
+        return 'a'
+    if char.isspace():
+        return ' '
+    if not char.isascii():
+        return char
+    return '0' if char.isdigit() else '.'
+
+
+# Translation table from ASCII and Latin characters to their class
+_CHAR_CLASSES = str.maketrans({chr(code): _char_class(chr(code)) for code in range(0x250)})
+_CJK_PATTERN = re.compile('[\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af\uff00-\uffef]')
+
+# Tokens per feature, fitted against cl100k_base with least squares on
+# English and non-English prose, HTML, page text, Markdown and JSON (231
+# chunks of up to ~1500 characters). Mean error is 5.1% (7.1% on files left
+# out of the fit) and 90% of chunks are within 10%. The outliers are URLs,
+# about 35% high, and German and Spanish prose, about 30% low because their
+# long words split into more tokens than English ones.
+# scripts/benchmark_token_counter.py reports the error on other samples.
+TOKENS_PER_WORD = 0.88
+TOKENS_PER_LETTER = 0.057
+TOKENS_PER_DIGIT = 0.66
+TOKENS_PER_SYMBOL_RUN = 0.95
+TOKENS_PER_CJK_CHAR = 1.23
+TOKENS_PER_OTHER_NON_ASCII = 0.55
+
+# Heuristic scale per model family, relative to cl100k_base
+FAMILY_SCALES = [
+    ('gpt-4o', 0.95),
+    ('gpt-4.1', 0.95),
+    ('claude', 1.1),
+    ('llama3', 0.95),
+    ('llama-3', 0.95),
+    ('llama', 1.2),
+    ('mistral', 1.15),
+    ('mixtral', 1.15),
+    ('titan', 1.1),
+]
+
+
+def _runs(classes: str, char_class: str) -> int:
+    """Count the runs of one character class in a translated string."""
+    starts = sum(classes.count(other + char_class) for other in 'a0 .' if other != char_class)
+    return starts + classes.startswith(char_class)
+
+
+class TokenCounter:
+    """Base class: counts tokens in a string."""
+
+    name = 'base'
+
+    def count(self, text: str) -> int:
+        raise NotImplementedError
+
+    def __call__(self, text: Optional[str]) -> int:
+        return self.count(text or '')
+
+    def count_template(self, text: Optional[str]) -> int:
+        """Count a prompt template or fixed prompt prefix, memoized."""
+        template_counts = self.__dict__.get('_template_counts')
+        if template_counts is None:
+            template_counts = self._template_counts = lru_cache(maxsize=TEMPLATE_CACHE_SIZE)(self.count)
+        return template_counts(text or '')
+
+
+class HeuristicCounter(TokenCounter):
+    """Estimates BPE token counts without a vocabulary."""
+
+    name = 'heuristic'
+
+    def __init__(self, scale: float = 1.0):
+        self.scale = scale
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        # translate() and count() run in C, so this costs less than splitting into pieces
+        classes = text.translate(_CHAR_CLASSES)
+        letters = classes.count('a')
+        digits = classes.count('0')
+        tokens = (TOKENS_PER_WORD * _runs(classes, 'a') + TOKENS_PER_LETTER * letters
+                  + TOKENS_PER_DIGIT * digits + TOKENS_PER_SYMBOL_RUN * _runs(classes, '.'))
+        if not text.isascii():
+            non_ascii = len(text) - letters - digits - classes.count('.') - classes.count(' ')
+            cjk = len(_CJK_PATTERN.findall(text))
+            tokens += TOKENS_PER_CJK_CHAR * cjk + TOKENS_PER_OTHER_NON_ASCII * (non_ascii - cjk)
+        return max(1, round(tokens * self.scale))
+
+
+class TiktokenCounter(TokenCounter):
+    """Exact counts from a tiktoken BPE vocabulary."""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        self.name = f"tiktoken:{encoding.name}"
+
+    def count(self, text: str) -> int:
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+
+_encodings_lock = threading.Lock()
+_encodings = {}
+
+
+def _load_encoding(model_name: Optional[str] = None, encoding_name: Optional[str] = None):
+    """Load a tiktoken encoding, or return None if tiktoken or its vocabulary is unavailable."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+
+    key = encoding_name or model_name
+    with _encodings_lock:
+        if key in _encodings:
+            return _encodings[key]
+        try:
+            if encoding_name:
+                encoding = tiktoken.get_encoding(encoding_name)
+            else:
+                try:
+                    encoding = tiktoken.encoding_for_model(model_name)
+                except KeyError:
+                    encoding = tiktoken.get_encoding('cl100k_base')
+        except Exception as e:
+            # The vocabulary is downloaded on first use; offline hosts fall back to the heuristic
+            print(f"Tokenizer vocabulary unavailable, using heuristic token counts: {str(e)}")
+            encoding = None
+        _encodings[key] = encoding
+        return encoding
+
+
+def _family_scale(model_name: Optional[str]) -> float:
+    model = (model_name or '').lower()
+    for fragment, scale in FAMILY_SCALES:
+        if fragment in model:
+            return scale
+    return 1.0
+
+
+def build_token_counter(provider_name: Optional[str] = None, model_name: Optional[str] = None,
+                        params: Optional[Dict] = None) -> TokenCounter:
+    """
+    Pick the token counter for a provider and model.
+
+    Args:
+        provider_name: Provider key
+        model_name: Model name or ID
+        params: The provider's additional_params (`tokenizer` overrides the choice)
+
+    Returns:
+        A TokenCounter
+    """
+    tokenizer = (params or {}).get('tokenizer')
+    if tokenizer == 'heuristic':
+        return HeuristicCounter(scale=_family_scale(model_name))
+    if tokenizer:
+        encoding = _load_encoding(encoding_name=tokenizer)
+        if encoding is not None:
+            return TiktokenCounter(encoding)
+
+    model = (model_name or '').lower()
+    if provider_name == 'openai' or model.startswith(('gpt-', 'o1', 'o3', 'text-')):
+        encoding = _load_encoding(model_name=model_name or 'gpt-4')
+        if encoding is not None:
+            return TiktokenCounter(encoding)
+    return HeuristicCounter(scale=_family_scale(model_name))
+
+
+# Counter for callers that do not know the model
+default_counter = HeuristicCounter()
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """Estimate the tokens in a text with the default (heuristic) counter."""
+    return default_counter(text)
+
@@ -0,0 +1,53 @@
+"""
+Token usage accounting per provider.
+
+Providers whose API reports usage record every call on their meter. The
+totals are added up under a lock and read in one go by the admin stats,
+so recording stays cheap on the request path. The numbers are what the
+provider billed, not estimates, which makes them usable for throughput and
+capacity planning.
+"""
+import threading
+import time
+from typing import Dict, Optional
+
+
+class UsageMeter:
+    """Running totals of requests and tokens for one provider."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        # Prompt cache reads and writes, counted apart from input_tokens
+        self.cache_read_tokens = 0
+        self.cache_write_tokens = 0
+
+    def record(self, input_tokens: int = 0, output_tokens: int = 0, cache_read_tokens: int = 0,
+               cache_write_tokens: int = 0):
+        """Add one call's reported usage."""
+        with self._lock:
+            self.requests += 1
+            self.input_tokens += input_tokens or 0
+            self.output_tokens += output_tokens or 0
+            self.cache_read_tokens += cache_read_tokens or 0
+            self.cache_write_tokens += cache_write_tokens or 0
+
+    def stats(self) -> Optional[Dict]:
+        """Totals since the meter was created, or None if nothing was recorded."""
+        with self._lock:
+            if not self.requests:
+                return None
+            minutes = max((time.time() - self.started) / 60, 1 / 60)
+            return {
+                'requests': self.requests,
+                'input_tokens': self.input_tokens,
+                'output_tokens': self.output_tokens,
+                'cache_read_tokens': self.cache_read_tokens,
+                'cache_write_tokens': self.cache_write_tokens,
+                'tokens_per_minute': round((self.input_tokens + self.output_tokens) / minutes, 1),
+                'avg_input_tokens': round(self.input_tokens / self.requests, 1),
+                'avg_output_tokens': round(self.output_tokens / self.requests, 1)
+            }
@@ -3,6 +3,8 @@ import time
 from typing import Dict, List, Optional, Callable
 from functools import wraps
 
+from .tokens import estimate_tokens as heuristic_estimate
+
 
 def retry_with_backoff(max_retries: int = 3, base_delay: float = 1.0, 
                       max_delay: float = 10.0):
@@ -40,10 +42,10 @@ def retry_with_backoff(max_retries: int = 3, base_delay: float = 1.0,
 
 def estimate_tokens(text: str) -> int:
     """
-    Roughly estimate the number of tokens in a text.
+    Estimate the number of tokens in a text.
     
-    This is a very simple approximation based on whitespace tokenization
-    that can be used when you don't want to load a full tokenizer.
+    Uses the heuristic counter from llm.tokens; for model-specific counts use
+    LLMConnector.count_tokens.
     
     Args:
         text: Input text
@@ -51,11 +53,66 @@ def estimate_tokens(text: str) -> int:
     Returns:
         Estimated token count
     """
-    # Very rough approximation: words + punctuation
-    words = text.split()
-    # Add 1 token for approximately every 3 punctuation marks
-    punctuation = sum(c in '.,;:!?"\'()[]{}' for c in text) // 3
-    return len(words) + punctuation 
+    return heuristic_estimate(text) 
+
+
+# Context window sizes (tokens) by model name fragment; the first match wins
+MODEL_CONTEXT_WINDOWS = [
+    ('gpt-4o', 128000),
+    ('gpt-4.1', 1000000),
+    ('gpt-4-turbo', 128000),
+    ('gpt-4-32k', 32768),
+    ('gpt-4', 8192),
+    ('gpt-3.5-turbo-instruct', 4096),
+    ('gpt-3.5', 16385),
+    ('claude', 200000),
+    ('titan-text-lite', 4096),
+    ('titan-text-express', 8192),
+    ('titan-text-premier', 32000),
+    ('llama3-1', 128000),
+    ('llama3.1', 128000),
+    ('llama3-2', 128000),
+    ('llama3.2', 128000),
+    ('llama3', 8192),
+    ('llama2', 4096),
+    ('mistral-large', 128000),
+    ('mixtral', 32000),
+    ('mistral', 32000),
+    ('grok', 131072),
+]
+
+DEFAULT_CONTEXT_WINDOW = 4096
+
+# Ollama runs every model with this context unless num_ctx is set
+OLLAMA_DEFAULT_CONTEXT = 2048
+
+
+def context_window(model_name: Optional[str], provider_name: Optional[str] = None,
+                   params: Optional[Dict] = None) -> int:
+    """
+    Look up the context window of a model.
+    
+    Args:
+        model_name: Model name or ID as configured for the provider
+        provider_name: Provider key, used for provider-specific defaults
+        params: The provider's additional_params; `context_window` (or
+            Ollama's `num_ctx`) overrides the lookup
+        
+    Returns:
+        Context window size in tokens
+    """
+    params = params or {}
+    if params.get('context_window'):
+        return int(params['context_window'])
+    if provider_name == 'ollama':
+        options = params.get('options') or {}
+        return int(params.get('num_ctx') or options.get('num_ctx') or OLLAMA_DEFAULT_CONTEXT)
+    
+    model = (model_name or '').lower()
+    for fragment, size in MODEL_CONTEXT_WINDOWS:
+        if fragment in model:
+            return size
+    return DEFAULT_CONTEXT_WINDOW
 
 
 def check_library_versions():
@@ -4,8 +4,8 @@ from bson.objectid import ObjectId
 import os
 from datetime import datetime
 from functools import wraps
-from llm import LLMConnector
-from llm.config import ProviderConfig
+from llm.aws_clients import client_settings, release_clients
+from llm.config import bedrock_config_from_settings
 from werkzeug.security import generate_password_hash
 
 # Create Blueprint
@@ -65,21 +65,24 @@ def admin_bedrock():
         
         # Create a new provider config for Bedrock
         try:
-            from llm.providers.bedrock_connector import BedrockConnector
-            provider_config = ProviderConfig(
-                api_key=f"{aws_access_key}:{aws_secret_key}",
-                base_url=aws_region,
-                model_name=model_id,
-                max_tokens=1000,
-                temperature=0.7
-            )
+            provider_config = bedrock_config_from_settings({
+                'aws_access_key': aws_access_key,
+                'aws_secret_key': aws_secret_key,
+                'aws_region': aws_region,
+                'model_id': model_id
+            })
             
-            # Update the global LLM connector configuration
-            llm_connector.config.providers['bedrock'] = provider_config
+            # Replace the pooled boto3 clients of the previous settings; the
+            # default credential chain may also have changed behind the same ones
+            previous_config = llm_connector.config.get_provider_config('bedrock')
+            for config in filter(None, (previous_config, provider_config)):
+                release_clients(client_settings(config))
             
-            # Clear any existing instance
-            if 'bedrock' in llm_connector.provider_instances:
-                del llm_connector.provider_instances['bedrock']
+            # Update the shared LLM connector configuration; only the Bedrock
+            # client is rebuilt, and the other workers reload it
+            llm_connector.config.add_provider('bedrock', provider_config)
+            # Create the new client now rather than on the first request
+            llm_connector.get_provider('bedrock')
                 
             flash('AWS Bedrock configuration saved successfully!', 'success')
             flash('Note: Some models require inference profiles to be set up in AWS Bedrock before they can be used.', 'info')
@@ -296,6 +299,7 @@ def update_user():
                 'role': role
             }}
         )
+        current_app.user_cache.invalidate(user_id)
         
         if result.modified_count > 0:
             flash(f'User {username} updated successfully', 'success')
@@ -334,6 +338,7 @@ def reset_user_password():
             {'_id': ObjectId(user_id)},
             {'$set': {'password': password_hash}}
         )
+        current_app.user_cache.invalidate(user_id)
         
         if result.modified_count > 0:
             flash('Password reset successfully', 'success')
@@ -366,6 +371,7 @@ def delete_user():
             
         # Delete the user
         result = mongo.db.users.delete_one({'_id': ObjectId(user_id)})
+        current_app.user_cache.invalidate(user_id)
         
         if result.deleted_count > 0:
             flash(f'User {user["username"]} deleted successfully', 'success')
@@ -0,0 +1,122 @@
+from flask import Blueprint, request, jsonify, current_app, Response
+from flask_login import login_required, current_user
+import json
+
+from services.jobs import serialize_job
+
+# Create Blueprint
+jobs_bp = Blueprint('jobs_bp', __name__)
+
+# Milliseconds EventSource waits before reconnecting to the stream endpoint
+STREAM_RETRY_MS = 2000
+
+
+@jobs_bp.route('/enrichment', methods=['POST'])
+@login_required
+def submit_enrichment_job():
+    """Start a background enrichment job for a list of companies."""
+    data = request.get_json() or {}
+    company_ids = data.get('company_ids', [])
+    fields = data.get('fields', 'all')
+    provider = data.get('provider')
+
+    if not company_ids:
+        return jsonify({
+            "success": False,
+            "message": "No company IDs provided"
+        }), 400
+
+    try:
+        job_id = current_app.job_manager.submit_enrichment(
+            company_ids,
+            fields=fields,
+            provider=provider,
+            user_id=current_user.get_id()
+        )
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "message": str(e)
+        }), 400
+
+    return jsonify({
+        "success": True,
+        "job_id": job_id,
+        "message": f"Enrichment job started for {len(company_ids)} companies"
+    })
+
+
+@jobs_bp.route('/extraction', methods=['POST'])
+@login_required
+def submit_extraction_job():
+    """Start a background job that runs a saved AI prompt over companies in batches."""
+    data = request.get_json() or {}
+    company_ids = data.get('company_ids', [])
+    prompt_id = data.get('prompt_id')
+
+    if not company_ids or not prompt_id:
+        return jsonify({
+            "success": False,
+            "message": "Missing company IDs or prompt"
+        }), 400
+
+    try:
+        job_id = current_app.job_manager.submit_extraction(
+            company_ids,
+            prompt_id,
+            provider=data.get('provider'),
+            target_field=data.get('target_field', 'all'),
+            batch_size=data.get('batch_size'),
+            user_id=current_user.get_id()
+        )
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "message": str(e)
+        }), 400
+
+    return jsonify({
+        "success": True,
+        "job_id": job_id,
+        "message": f"Extraction job started for {len(company_ids)} companies"
+    })
+
+
+@jobs_bp.route('/<job_id>', methods=['GET'])
+@login_required
+def get_job_status(job_id):
+    """Get the progress of a background job."""
+    job = current_app.job_manager.get_job(job_id)
+    if not job:
+        return jsonify({"success": False, "message": "Job not found"}), 404
+
+    return jsonify({"success": True, "job": serialize_job(job)})
+
+
+@jobs_bp.route('/<job_id>/stream', methods=['GET'])
+@login_required
+def stream_job_status(job_id):
+    """Send the job's progress as one Server-Sent Event and close.
+
+    The response ends right away so a long job never holds a worker; the
+    `retry` field makes EventSource reconnect for the next update.
+    """
+    job = current_app.job_manager.get_job(job_id)
+    if not job:
+        return jsonify({"success": False, "message": "Job not found"}), 404
+
+    event = f"retry: {STREAM_RETRY_MS}\ndata: {json.dumps(serialize_job(job))}\n\n"
+    return Response(
+        event,
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@jobs_bp.route('/<job_id>/cancel', methods=['POST'])
+@login_required
+def cancel_job(job_id):
+    """Cancel a background job."""
+    if current_app.job_manager.cancel_job(job_id):
+        return jsonify({"success": True, "message": "Job cancellation requested"})
+    return jsonify({"success": False, "message": "Job not found or already finished"}), 404
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Re-enrich companies through a provider's batch inference API.
+
+Meant to run from cron (for example nightly), outside the web workers. It
+uses the application's database and LLM settings.
+
+Usage:
+    python scripts/batch_enrich.py submit PROMPT_ID [--provider bedrock] [--backend local]
+                                   [--target-field all] [--per-request 8] [--limit N]
+    python scripts/batch_enrich.py poll RUN_ID
+    python scripts/batch_enrich.py run PROMPT_ID [...]     (submit, then wait for the results)
+
+`poll` checks a run once and applies its results when the batch job has
+finished, so it can be scheduled every few minutes instead of keeping
+`run` waiting. `--backend local` runs the requests through the provider's
+normal API from a local file, for testing.
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.batch_extraction import DEFAULT_BATCH_SIZE
+from services.batch_inference import (
+    submit_batch_run, poll_batch_run, wait_for_batch_run, DEFAULT_POLL_INTERVAL, DEFAULT_WORK_DIR
+)
+
+
+def describe(run):
+    print(f"Run {run['_id']}: {run.get('status')} (batch job: {run.get('batch_status', '-')})")
+    if run.get('message'):
+        print(run['message'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('command', choices=['submit', 'poll', 'run'])
+    parser.add_argument('id', help='Prompt ID (submit, run) or run ID (poll)')
+    parser.add_argument('--provider', default='bedrock', help='LLM provider key')
+    parser.add_argument('--backend', choices=['local'], help="Use the local file-based stand-in")
+    parser.add_argument('--target-field', default='all', help="'all' or a single field name")
+    parser.add_argument('--per-request', type=int, default=DEFAULT_BATCH_SIZE, help='Companies per request')
+    parser.add_argument('--limit', type=int, help='Only read this many companies')
+    parser.add_argument('--work-dir', default=os.environ.get('BATCH_INFERENCE_DIR', DEFAULT_WORK_DIR),
+                        help='Directory for the run files')
+    parser.add_argument('--poll-interval', type=int, default=DEFAULT_POLL_INTERVAL, help='Seconds between checks')
+    args = parser.parse_args()
+
+    # The application module sets up the database and the configured providers
+    from app import app, mongo
+
+    with app.app_context():
+        db = mongo.db
+        llm_connector = app.llm_connector
+
+        if args.command == 'poll':
+            run_id = args.id
+        else:
+            run_id = submit_batch_run(db, llm_connector, args.id, args.provider, backend=args.backend,
+                                      target_field=args.target_field, companies_per_record=args.per_request,
+                                      work_dir=args.work_dir, limit=args.limit)
+            print(f"Submitted run {run_id}")
+
+        if args.command == 'run':
+            run = wait_for_batch_run(db, llm_connector, run_id, work_dir=args.work_dir,
+                                     poll_interval=args.poll_interval)
+        else:
+            run = poll_batch_run(db, llm_connector, run_id, work_dir=args.work_dir)
+        describe(run)
+
+
+if __name__ == '__main__':
+    main()
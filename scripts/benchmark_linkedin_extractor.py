@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the LinkedIn URL extractor.
+
+Compares the old approach (three separate re.findall passes over the whole
+page) with the combined precompiled pattern, both on whole pages and fed in
+download-sized chunks with early stopping.
+
+Usage:
+    python scripts/benchmark_linkedin_extractor.py [DIRECTORY_OF_HTML_FILES] [--repeat N]
+
+Without a directory a synthetic corpus is generated (pages of typical size
+with the LinkedIn link in the footer, in the header, or missing).
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.enrichment import LinkedInURLScanner, find_linkedin_url
+from services.page_fetch import CHUNK_SIZE
+
+LEGACY_PATTERNS = [
+    r'https?://(?:www\.)?linkedin\.com/company/[a-zA-Z0-9_-]+',
+    r'https?://(?:www\.)?linkedin\.com/in/[a-zA-Z0-9_-]+',
+    r'https?://(?:www\.)?linkedin\.com/school/[a-zA-Z0-9_-]+'
+]
+
+
+def legacy_extract(content):
+    """The original extractor: one findall per pattern."""
+    for pattern in LEGACY_PATTERNS:
+        matches = re.findall(pattern, content)
+        if matches:
+            return matches[0]
+    return None
+
+
+def streamed_extract(content, chunk_size=CHUNK_SIZE):
+    """Feed the page in download-sized chunks, as PageFetcher does."""
+    scanner = LinkedInURLScanner()
+    for start in range(0, len(content), chunk_size):
+        if scanner.feed(content[start:start + chunk_size]):
+            break
+    return scanner.finish()
+
+
+def load_corpus(directory):
+    pages = []
+    for name in sorted(os.listdir(directory)):
+        if name.lower().endswith(('.html', '.htm')):
+            with open(os.path.join(directory, name), encoding='utf-8', errors='replace') as f:
+                pages.append(f.read())
+    return pages
+
+
+def synthetic_corpus(count=200, seed=42):
+    rng = random.Random(seed)
+    filler = '<div class="section"><p>Lorem ipsum dolor sit amet, <a href="/page">link</a></p></div>\n'
+    pages = []
+    for i in range(count):
+        body = filler * rng.randint(500, 2500)
+        link = f'<a href="https://www.linkedin.com/company/company-{i}">LinkedIn</a>'
+        placement = i % 4
+        if placement == 0:
+            pages.append(f'<html><header>{link}</header>{body}</html>')
+        elif placement == 1:
+            pages.append(f'<html>{body}<footer>{link}</footer></html>')
+        elif placement == 2:
+            person = f'<a href="https://linkedin.com/in/founder-{i}">Founder</a>'
+            pages.append(f'<html>{person}{body}<footer>{link}</footer></html>')
+        else:
+            pages.append(f'<html>{body}</html>')
+    return pages
+
+
+def run(name, extract, pages, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        results = [extract(page) for page in pages]
+    elapsed = time.perf_counter() - started
+    total_bytes = sum(len(page) for page in pages) * repeat
+    print(f"{name:<22} {len(pages) * repeat / elapsed:>10.1f} pages/s {total_bytes / elapsed / 1e6:>10.1f} MB/s")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('directory', nargs='?', help='Directory of saved HTML pages')
+    parser.add_argument('--repeat', type=int, default=5, help='Passes over the corpus')
+    args = parser.parse_args()
+
+    pages = load_corpus(args.directory) if args.directory else synthetic_corpus()
+    if not pages:
+        print("No HTML files found.")
+        return
+    print(f"{len(pages)} pages, {sum(len(page) for page in pages) / 1e6:.1f} MB, {args.repeat} passes\n")
+
+    legacy = run('three findall passes', legacy_extract, pages, args.repeat)
+    combined = run('combined pattern', find_linkedin_url, pages, args.repeat)
+    streamed = run('streamed, early stop', streamed_extract, pages, args.repeat)
+
+    if legacy != combined or legacy != streamed:
+        mismatches = sum(1 for a, b, c in zip(legacy, combined, streamed) if not a == b == c)
+        print(f"\nWarning: {mismatches} pages gave different results")
+
+
+if __name__ == '__main__':
+    main()
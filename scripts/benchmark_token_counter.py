@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Benchmark the token estimators against a real BPE vocabulary.
+
+Compares, per kind of text (prose, HTML, URLs, JSON, non-English):
+
+    - the old word + punctuation estimate from llm.utils
+    - four characters per token
+    - the heuristic counter from llm.tokens
+
+against tiktoken's cl100k_base counts, and times each estimator. tiktoken
+downloads the vocabulary on first use; on offline hosts, copy
+cl100k_base.tiktoken into the directory named by TIKTOKEN_CACHE_DIR as
+9b5ad71b2ce5302211f9c61530b329a4922fc6a4 (see README).
+
+Usage:
+    python scripts/benchmark_token_counter.py [DIRECTORY_OF_TEXT_FILES] [--repeat N]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm.tokens import HeuristicCounter, TiktokenCounter, _load_encoding
+
+SAMPLES = {
+    'prose': (
+        "Acme Widgets is a family-owned manufacturer of industrial fasteners, founded in 1990 in "
+        "Columbus, Ohio. The company supplies automotive, aerospace and construction customers "
+        "across North America, and offers custom engineering, rapid prototyping and just-in-time "
+        "delivery services from its three regional warehouses."
+    ),
+    'html': (
+        '<div class="container"><nav class="navbar navbar-expand-lg"><ul class="nav">'
+        '<li class="nav-item"><a class="nav-link" href="/about-us">About</a></li>'
+        '<li class="nav-item"><a class="nav-link" href="/products?category=fasteners&sort=asc">Products</a></li>'
+        '</ul></nav><section id="hero"><h1>Fasteners that hold</h1>'
+        '<p style="margin:0 auto;max-width:640px">Precision parts since 1990.</p></section></div>'
+    ),
+    'urls': (
+        "https://www.linkedin.com/company/acme-widgets-inc https://acme-widgets.example.com/products/"
+        "hex-bolts-m8x40?utm_source=newsletter&utm_medium=email&utm_campaign=spring_2024 "
+        "https://cdn.example.net/assets/img/logo-2x.png?v=3f9a2c1"
+    ),
+    'json': (
+        '{"company_id": "64f1c2a9e4b0a1b2c3d4e5f6", "name": "Acme Widgets", "products": ["hex bolts", '
+        '"lock nuts", "washers"], "location": "Columbus, OH", "employees": 240, "founded": 1990}'
+    ),
+    'german': (
+        "Die Acme Widgets GmbH ist ein familiengeführter Hersteller von Verbindungselementen mit Sitz "
+        "in München. Zu unseren Kunden gehören Unternehmen der Automobil- und Luftfahrtindustrie."
+    ),
+    'chinese': "Acme 公司是一家家族经营的工业紧固件制造商，成立于1990年，总部位于俄亥俄州哥伦布市。",
+}
+
+
+def old_estimate(text):
+    """The previous llm.utils.estimate_tokens."""
+    words = text.split()
+    punctuation = sum(c in '.,;:!?"\'()[]{}' for c in text) // 3
+    return len(words) + punctuation
+
+
+def chars_estimate(text):
+    return len(text) // 4 + 1
+
+
+def load_samples(directory):
+    samples = {}
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+            with open(path, encoding='utf-8', errors='replace') as f:
+                samples[name] = f.read()
+    return samples
+
+
+def time_per_call(func, texts, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            func(text)
+    return (time.perf_counter() - started) / (repeat * len(texts)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('directory', nargs='?', help='Directory of text/HTML files to use as samples')
+    parser.add_argument('--repeat', type=int, default=200, help='Timing passes over the samples')
+    args = parser.parse_args()
+
+    samples = load_samples(args.directory) if args.directory else SAMPLES
+    if not samples:
+        print("No samples found.")
+        return
+
+    heuristic = HeuristicCounter()
+    estimators = {
+        'old words+punct': old_estimate,
+        'chars / 4': chars_estimate,
+        'heuristic': heuristic.count,
+    }
+
+    encoding = _load_encoding(encoding_name='cl100k_base')
+    if encoding is None:
+        sys.exit("tiktoken and the cl100k_base vocabulary are needed as the reference "
+                 "(pip install tiktoken; see the docstring for offline hosts).")
+    reference = TiktokenCounter(encoding)
+
+    print("Accuracy (vs tiktoken cl100k_base)")
+    print(f"{'sample':<14}{'actual':>8}" + ''.join(f"{name:>18}" for name in estimators))
+    errors = {name: [] for name in estimators}
+    for sample_name, text in samples.items():
+        actual = reference.count(text)
+        row = f"{sample_name[:13]:<14}{actual:>8}"
+        for name, estimate in estimators.items():
+            count = estimate(text)
+            error = (count - actual) / actual * 100
+            errors[name].append(abs(error))
+            row += f"{count:>10} ({error:+4.0f}%)"
+        print(row)
+    print(f"{'mean |error|':<22}" + ''.join(f"{sum(e) / len(e):>17.1f}%" for e in errors.values()))
+
+    print(f"\nSpeed (microseconds per call, {args.repeat} passes)")
+    texts = list(samples.values())
+    timings = {name: time_per_call(estimate, texts, args.repeat) for name, estimate in estimators.items()}
+    timings['tiktoken'] = time_per_call(reference.count, texts, args.repeat)
+    for name, micros in timings.items():
+        print(f"{name:<22}{micros:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
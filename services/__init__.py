@@ -0,0 +1 @@
+"""Background services shared by the web routes (enrichment, jobs, ...)."""
@@ -0,0 +1,412 @@
+"""
+Multi-company extraction with the `ai_prompts` templates.
+
+The saved prompts are mostly fixed instruction text, so sending one request
+per company repeats that text every time. Batch mode renders a template once
+and packs several companies into the same request, each in its own
+delimited section, and asks for a single JSON object keyed by company ID.
+The answer is split back per company and normalized with
+`normalize_company_data`. Companies whose section is missing or does not
+parse are sent again in a smaller batch; the others are not.
+
+The fixed part of each prompt comes first and is passed to the connector as
+`cache_prefix`, so providers with prompt caching (Anthropic, Bedrock Claude)
+only process it once while it stays in their cache.
+"""
+import json
+import re
+from datetime import datetime
+from bson.objectid import ObjectId
+from pymongo import UpdateOne
+
+DEFAULT_BATCH_SIZE = 8
+MAX_BATCH_SIZE = 25
+DEFAULT_MAX_RETRIES = 2
+TOKENS_PER_COMPANY = 300      # answer tokens allowed per company in a batch
+MAX_BATCH_TOKENS = 4000
+
+# Company fields passed to the prompts (and checked for missing values)
+PROMPT_FIELDS = ['name', 'website', 'products', 'services', 'location', 'description', 'industry',
+                 'founded', 'employees', 'revenue']
+
+# Fields stored as lists
+ARRAY_FIELDS = ['products', 'services', 'location', 'keyword']
+
+# Other keys the model may use for a field
+FIELD_ALIASES = {
+    'name': ['company_name', 'company'],
+    'keyword': ['keywords', 'tags'],
+    'products': ['product'],
+    'services': ['service'],
+    'location': ['locations', 'address', 'addresses']
+}
+
+# Placeholders used when a template is rendered as fixed instructions for one company
+SINGLE_PLACEHOLDERS = {
+    'company_name': 'the company named below',
+    'company_website': 'the company website given below',
+    'missing_fields': 'the fields listed below'
+}
+
+# Placeholders used when a template is rendered once for a whole batch
+BATCH_PLACEHOLDERS = {
+    'company_name': 'the name given for each company below',
+    'company_website': "each company's website (listed below)",
+    'missing_fields': 'the fields listed for each company below'
+}
+
+BATCH_INSTRUCTIONS = """
+The same task applies to each of the companies below. Each company has its own section.
+
+Ignore the response format given above. Answer with a single JSON object and nothing else:
+- one key per company, using the exact ID from its section header
+- each value is an object with only the fields listed for that company, using those field names as keys
+- products, services, location and keyword values are JSON arrays of strings
+- leave out fields you cannot find, but include every company ID (use {} if nothing was found)
+"""
+
+
+def normalize_company_data(data, missing_fields):
+    """Normalize company data to ensure proper structure."""
+    normalized = {}
+
+    # Process each requested field
+    for field in missing_fields:
+        # Get the value, accounting for different possible keys
+        value = None
+        for key in [field] + FIELD_ALIASES.get(field, []):
+            if key in data:
+                value = data[key]
+                break
+
+        # Skip if no value found
+        if value is None:
+            continue
+
+        # Normalize array fields
+        if field in ARRAY_FIELDS:
+            if isinstance(value, list):
+                # Keep arrays as arrays, but ensure all items are strings
+                normalized[field] = [str(item).strip() for item in value if item]
+            elif isinstance(value, str):
+                # Convert string to array, splitting by comma if present
+                if ',' in value:
+                    normalized[field] = [item.strip() for item in value.split(',') if item.strip()]
+                else:
+                    normalized[field] = [value.strip()]
+            else:
+                # For other types, convert to string and wrap in array
+                normalized[field] = [str(value).strip()]
+        else:
+            # For non-array fields, ensure they're strings
+            if not isinstance(value, str):
+                value = str(value)
+            normalized[field] = value.strip()
+
+    return normalized
+
+
+def company_prompt_data(company, website=None):
+    """The company values the prompts work with."""
+    data = {field: company.get(field, "") for field in PROMPT_FIELDS}
+    if website:
+        data['website'] = website
+    return data
+
+
+def prompt_missing_fields(company_data, ai_prompt, target_field='all'):
+    """Work out which fields a prompt should fill in for a company."""
+    if target_field != 'all':
+        # If specific field selected, only include that field if empty
+        return [target_field] if not company_data.get(target_field) else []
+
+    # Check prompt's target field first
+    target = ai_prompt.get('target_field')
+    if target and target != 'general':
+        # If prompt is field-specific, use that field if empty
+        return [target] if not company_data.get(target) else []
+
+    # For general prompts, get all empty fields (the name is only filled when asked for)
+    return [field for field, value in company_data.items()
+            if field not in ('_id', 'website', 'name') and not value]
+
+
+def provider_caches_prompts(llm_connector, provider):
+    """Whether a provider caches prompt prefixes (False if it cannot be loaded)."""
+    try:
+        return llm_connector.get_provider(provider).supports_prompt_cache
+    except Exception:
+        return False
+
+
+def prompt_prefix(ai_prompt):
+    """The part of a single-company prompt that is the same for every company.
+
+    The templates start with the company website, so the template is
+    rendered with neutral placeholders and the company details follow it.
+    """
+    template = ai_prompt["value"].format(**SINGLE_PLACEHOLDERS)
+    return f"{template.strip()}\n\n"
+
+
+def render_prompt(ai_prompt, company_name, company_website, missing_fields, prompt_cache=False):
+    """Fill in a saved prompt template for one company.
+
+    With prompt_cache the instructions come first (see prompt_prefix) and
+    the company details after them, so the provider can cache the
+    instructions. Otherwise the details are substituted into the template.
+    """
+    if not prompt_cache:
+        return ai_prompt["value"].format(
+            company_name=company_name,
+            company_website=company_website,
+            missing_fields=", ".join(missing_fields)
+        )
+    return (
+        prompt_prefix(ai_prompt) +
+        f"Company name: {company_name or 'unknown'}\n"
+        f"Website: {company_website or 'unknown'}\n"
+        f"Fields: {', '.join(missing_fields)}\n"
+    )
+
+
+def batch_prompt_prefix(ai_prompt):
+    """The part of a batch prompt that is the same for every batch of a template."""
+    template = ai_prompt["value"].format(**BATCH_PLACEHOLDERS)
+    return f"{template.strip()}\n{BATCH_INSTRUCTIONS}\n"
+
+
+def build_batch_prompt(ai_prompt, items):
+    """Build one prompt covering several companies.
+
+    The rendered template and the batch instructions come first and are the
+    same for every batch of a prompt (see batch_prompt_prefix); the company
+    sections follow.
+
+    Args:
+        ai_prompt: The `ai_prompts` document
+        items: List of dicts with 'id', 'name', 'website' and 'fields'
+
+    Returns:
+        The prompt text
+    """
+    sections = []
+    for item in items:
+        sections.append(
+            f"=== COMPANY {item['id']} ===\n"
+            f"Name: {item['name'] or 'unknown'}\n"
+            f"Website: {item['website'] or 'unknown'}\n"
+            f"Fields: {', '.join(item['fields'])}\n"
+            f"=== END {item['id']} ==="
+        )
+    return batch_prompt_prefix(ai_prompt) + "\n\n".join(sections) + "\n"
+
+
+def _strip_code_fence(text):
+    match = re.search(r'```(?:json)?\s*([\s\S]*?)(?:```|$)', text)
+    return match.group(1) if match else text
+
+
+def split_batch_response(text, company_ids):
+    """Split a batch answer into per-company objects.
+
+    The whole answer is parsed as JSON first. If that fails (a truncated or
+    malformed answer), each company's value is decoded on its own, so one
+    broken section does not lose the others.
+
+    Returns:
+        Dictionary of company ID to the object found for it; companies whose
+        section is missing or unreadable are left out
+    """
+    text = _strip_code_fence(text or '')
+    sections = {}
+
+    start, end = text.find('{'), text.rfind('}')
+    if start != -1 and end > start:
+        try:
+            parsed = json.loads(text[start:end + 1])
+            if isinstance(parsed, dict):
+                sections = {key: value for key, value in parsed.items()
+                            if key in company_ids and isinstance(value, dict)}
+        except ValueError:
+            pass
+
+    decoder = json.JSONDecoder()
+    for company_id in company_ids:
+        if company_id in sections:
+            continue
+        match = re.search(r'"%s"\s*:\s*' % re.escape(company_id), text)
+        if not match:
+            continue
+        try:
+            value, _ = decoder.raw_decode(text, match.end())
+        except ValueError:
+            continue
+        if isinstance(value, dict):
+            sections[company_id] = value
+    return sections
+
+
+def _load_items(db, company_ids, ai_prompt, target_field):
+    """Load the companies and their missing fields.
+
+    Returns:
+        Tuple of (items, results): prompt items for companies with work to
+        do, and results for those without
+    """
+    object_ids = []
+    results = {}
+    for company_id in company_ids:
+        try:
+            object_ids.append(ObjectId(company_id))
+        except Exception:
+            results[company_id] = {'status': 'failed', 'message': 'Invalid company ID'}
+
+    companies = {str(company['_id']): company
+                 for company in db.companies.find({'_id': {'$in': object_ids}}, {field: 1 for field in PROMPT_FIELDS})}
+
+    items = []
+    for company_id in company_ids:
+        if company_id in results:
+            continue
+        company = companies.get(company_id)
+        if not company:
+            results[company_id] = {'status': 'failed', 'message': 'Company not found'}
+            continue
+        company_data = company_prompt_data(company)
+        fields = prompt_missing_fields(company_data, ai_prompt, target_field)
+        if not fields:
+            results[company_id] = {'status': 'skipped', 'message': 'No fields to update for the selected criteria'}
+            continue
+        items.append({'id': company_id, 'name': company_data['name'], 'website': company_data['website'],
+                      'fields': fields})
+    return items, results
+
+
+def extract_batch(db, llm_connector, company_ids, ai_prompt, provider, target_field='all',
+                  batch_size=DEFAULT_BATCH_SIZE, max_retries=DEFAULT_MAX_RETRIES, use_cache=True,
+                  on_result=None):
+    """Fill in missing company fields with a saved prompt, several companies per request.
+
+    Args:
+        db: MongoDB database handle
+        llm_connector: LLMConnector used to reach the provider
+        company_ids: IDs of the companies to update
+        ai_prompt: The `ai_prompts` document to use
+        provider: LLM provider key
+        target_field: 'all' or a single field name
+        batch_size: Companies per request
+        max_retries: Times a company whose section failed to parse is sent again
+        use_cache: Set to False to skip the LLM response cache
+        on_result: Optional callback(company_id, result) called as each company finishes
+
+    Returns:
+        Dictionary of company ID to a result with 'status' ('success',
+        'failed' or 'skipped'), 'message' and 'updated_fields'
+    """
+    batch_size = max(1, min(int(batch_size or DEFAULT_BATCH_SIZE), MAX_BATCH_SIZE))
+    company_ids = list(dict.fromkeys(str(company_id) for company_id in company_ids))
+    items, results = _load_items(db, company_ids, ai_prompt, target_field)
+
+    def finish(company_id, result):
+        results[company_id] = result
+        if on_result:
+            on_result(company_id, result)
+
+    for company_id, result in list(results.items()):
+        if on_result:
+            on_result(company_id, result)
+
+    attempt = 0
+    pending = items
+    while pending:
+        retry = []
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            retry.extend(_run_batch(db, llm_connector, batch, ai_prompt, provider,
+                                    use_cache=use_cache and attempt == 0, finish=finish))
+
+        attempt += 1
+        if retry and attempt > max_retries:
+            for item in retry:
+                finish(item['id'], {'status': 'failed', 'message': "Could not parse the AI response for this company",
+                                    'updated_fields': []})
+            break
+        if retry:
+            print(f"Retrying {len(retry)} companies whose batch section failed to parse")
+            # Smaller batches on retry: long answers are the usual cause of broken sections
+            batch_size = max(1, batch_size // 2)
+        pending = retry
+
+    return results
+
+
+def _run_batch(db, llm_connector, batch, ai_prompt, provider, use_cache, finish):
+    """Send one batch, write what parsed and return the items to retry."""
+    prompt = build_batch_prompt(ai_prompt, batch)
+    company_ids = [item['id'] for item in batch]
+    try:
+        response = llm_connector.generate_text(
+            prompt=prompt,
+            provider=provider,
+            max_tokens=min(MAX_BATCH_TOKENS, TOKENS_PER_COMPANY * len(batch)),
+            temperature=0.5,
+            use_cache=use_cache,
+            failover=True,
+            cache_prefix=batch_prompt_prefix(ai_prompt)
+        )
+    except Exception as e:
+        print(f"LLM error for batch of {len(batch)} companies: {str(e)}")
+        for item in batch:
+            finish(item['id'], {'status': 'failed', 'message': f"Error calling AI service: {str(e)}",
+                                'updated_fields': []})
+        return []
+
+    # Providers report some failures as an "Error: ..." text instead of raising;
+    # retrying smaller batches against the same provider would not help
+    if (response or '').startswith('Error:'):
+        print(f"LLM error for batch of {len(batch)} companies: {response}")
+        for item in batch:
+            finish(item['id'], {'status': 'failed', 'message': f"Error calling AI service: {response}",
+                                'updated_fields': []})
+        return []
+
+    sections = split_batch_response(response, company_ids)
+    operations = []
+    updates = {}
+    retry = []
+    for item in batch:
+        if item['id'] not in sections:
+            retry.append(item)
+            continue
+        update_data = normalize_company_data(sections[item['id']], item['fields'])
+        # Drop empty answers ("", [])
+        update_data = {field: value for field, value in update_data.items() if value}
+        if update_data:
+            updates[item['id']] = update_data
+            operations.append(UpdateOne({'_id': ObjectId(item['id'])},
+                                        {'$set': dict(update_data, updated_at=datetime.now())}))
+
+    if operations:
+        try:
+            db.companies.bulk_write(operations, ordered=False)
+        except Exception as e:
+            print(f"Error saving batch results: {str(e)}")
+            for company_id in updates:
+                finish(company_id, {'status': 'failed', 'message': f"Error saving results: {str(e)}",
+                                    'updated_fields': []})
+            return retry
+
+    for item in batch:
+        if item['id'] not in sections:
+            continue
+        update_data = updates.get(item['id'])
+        if update_data:
+            fields_text = "fields" if len(update_data) > 1 else "field"
+            finish(item['id'], {'status': 'success',
+                                'message': f"Successfully updated {len(update_data)} {fields_text} with AI",
+                                'updated_fields': list(update_data)})
+        else:
+            finish(item['id'], {'status': 'failed', 'message': "AI couldn't extract useful information",
+                                'updated_fields': []})
+    return retry
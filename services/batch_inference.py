@@ -0,0 +1,287 @@
+"""
+Offline re-enrichment of the whole collection through provider batch APIs.
+
+A run renders a saved `ai_prompts` template for every company with missing
+fields (several companies per request, as in services.batch_extraction),
+writes the requests to a JSONL file and submits it as a batch job (see
+llm.batch). The job is polled until it finishes, then its results are
+split back per company and written to `companies` with bulk writes.
+
+Runs are recorded in the `enrichment_jobs` collection (type
+'batch_inference'), so their progress shows up in the jobs API, and
+cancelling the job there stops the provider job on the next poll. The work
+files live in `<work_dir>/<run id>/`. scripts/batch_enrich.py drives runs
+from cron, away from the web workers.
+"""
+import json
+import os
+import time
+from datetime import datetime
+from bson.objectid import ObjectId
+from pymongo import UpdateOne
+
+from llm.batch import get_batch_backend, BATCH_COMPLETED, FINISHED_BATCH_STATES
+
+from .batch_extraction import (
+    build_batch_prompt, company_prompt_data, normalize_company_data, prompt_missing_fields, split_batch_response,
+    DEFAULT_BATCH_SIZE, MAX_BATCH_SIZE, MAX_BATCH_TOKENS, PROMPT_FIELDS, TOKENS_PER_COMPANY
+)
+from .jobs import JOB_QUEUED, JOB_RUNNING, JOB_COMPLETED, JOB_CANCELLED, JOB_FAILED, FINISHED_STATES
+
+DEFAULT_WORK_DIR = 'batch_inference'
+DEFAULT_POLL_INTERVAL = 60       # seconds between status checks
+WRITE_BATCH_SIZE = 500           # company updates per bulk write
+
+INPUT_FILE = 'requests.jsonl'
+ITEMS_FILE = 'items.jsonl'
+
+
+def _run_dir(work_dir, run_id):
+    return os.path.join(work_dir, str(run_id))
+
+
+def _backend(llm_connector, run, work_dir):
+    return get_batch_backend(llm_connector, run['provider'], backend=run.get('backend'),
+                             directory=os.path.join(work_dir, 'local'))
+
+
+def write_batch_input(db, backend, ai_prompt, run_dir, target_field='all',
+                      companies_per_record=DEFAULT_BATCH_SIZE, query=None, limit=None):
+    """Write the request file and the record-to-companies map for a run.
+
+    Companies are read with a projected cursor, so the collection is never
+    held in memory.
+
+    Returns:
+        Dictionary with the number of 'records' and 'companies' written
+    """
+    counts = {'records': 0, 'companies': 0}
+    cursor = db.companies.find(query or {}, {field: 1 for field in PROMPT_FIELDS})
+    if limit:
+        cursor = cursor.limit(limit)
+
+    with open(os.path.join(run_dir, INPUT_FILE), 'w') as requests_file, \
+            open(os.path.join(run_dir, ITEMS_FILE), 'w') as items_file:
+
+        def write_record(items):
+            record_id = f"r{counts['records']}"
+            line = backend.request_line(record_id, build_batch_prompt(ai_prompt, items),
+                                        max_tokens=min(MAX_BATCH_TOKENS, TOKENS_PER_COMPANY * len(items)),
+                                        temperature=0.5)
+            requests_file.write(json.dumps(line) + '\n')
+            items_file.write(json.dumps({'record_id': record_id,
+                                         'companies': [{'id': item['id'], 'fields': item['fields']}
+                                                       for item in items]}) + '\n')
+            counts['records'] += 1
+            counts['companies'] += len(items)
+
+        pending = []
+        for company in cursor:
+            company_data = company_prompt_data(company)
+            fields = prompt_missing_fields(company_data, ai_prompt, target_field)
+            if not fields:
+                continue
+            pending.append({'id': str(company['_id']), 'name': company_data['name'],
+                            'website': company_data['website'], 'fields': fields})
+            if len(pending) >= companies_per_record:
+                write_record(pending)
+                pending = []
+        if pending:
+            write_record(pending)
+    return counts
+
+
+def submit_batch_run(db, llm_connector, prompt_id, provider, backend=None, target_field='all',
+                     companies_per_record=DEFAULT_BATCH_SIZE, work_dir=DEFAULT_WORK_DIR, query=None,
+                     limit=None, user_id=None):
+    """Build the request file for a prompt and submit it as a batch job.
+
+    Args:
+        db: MongoDB database handle
+        llm_connector: LLMConnector holding the provider
+        prompt_id: ID of the `ai_prompts` template to use
+        provider: Provider key ('openai' or 'bedrock', or any provider with backend='local')
+        backend: 'local' for the file-based stand-in, None for the provider's batch API
+        target_field: 'all' or a single field name
+        companies_per_record: Companies packed into each request
+        work_dir: Directory for the run files
+        query: Optional filter on the companies
+        limit: Optional maximum number of companies read
+        user_id: User starting the run
+
+    Returns:
+        The run (job) ID as a string
+    """
+    ai_prompt = db.ai_prompts.find_one({'_id': ObjectId(prompt_id)})
+    if not ai_prompt:
+        raise ValueError("AI prompt not found")
+    companies_per_record = max(1, min(int(companies_per_record or DEFAULT_BATCH_SIZE), MAX_BATCH_SIZE))
+
+    run = {
+        'type': 'batch_inference',
+        'status': JOB_QUEUED,
+        'provider': provider,
+        'backend': backend,
+        'fields': target_field,
+        'prompt_id': str(ai_prompt['_id']),
+        'batch_size': companies_per_record,
+        'cancel_requested': False,
+        'created_by': user_id,
+        'created_at': datetime.now(),
+        'updated_at': datetime.now()
+    }
+    run_id = db.enrichment_jobs.insert_one(run).inserted_id
+    run['_id'] = run_id
+
+    try:
+        batch_backend = _backend(llm_connector, run, work_dir)
+        run_dir = _run_dir(work_dir, run_id)
+        os.makedirs(run_dir, exist_ok=True)
+        counts = write_batch_input(db, batch_backend, ai_prompt, run_dir, target_field=target_field,
+                                   companies_per_record=companies_per_record, query=query, limit=limit)
+        if not counts['records']:
+            update = {'status': JOB_COMPLETED, 'total': 0, 'message': 'No companies with fields to update',
+                      'finished_at': datetime.now()}
+        else:
+            handle = batch_backend.submit(os.path.join(run_dir, INPUT_FILE), f"enrichment-{run_id}")
+            update = {'status': JOB_RUNNING, 'handle': handle, 'batch_status': 'submitted',
+                      'total': counts['companies'], 'records': counts['records'],
+                      'completed': 0, 'succeeded': 0, 'failed': 0, 'skipped': 0,
+                      'started_at': datetime.now()}
+    except Exception as e:
+        print(f"Error submitting batch run {run_id}: {str(e)}")
+        update = {'status': JOB_FAILED, 'message': f"Error: {str(e)}", 'finished_at': datetime.now()}
+
+    update['updated_at'] = datetime.now()
+    db.enrichment_jobs.update_one({'_id': run_id}, {'$set': update})
+    return str(run_id)
+
+
+def _load_items(run_dir):
+    """Read the record-to-companies map of a run."""
+    records = {}
+    with open(os.path.join(run_dir, ITEMS_FILE)) as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                records[entry['record_id']] = entry['companies']
+    return records
+
+
+def apply_batch_results(db, results, records):
+    """Split batch results per company and write them with bulk writes.
+
+    Args:
+        db: MongoDB database handle
+        results: Iterable of (record_id, text, error) from a batch backend
+        records: Dictionary of record ID to its list of {'id', 'fields'}
+
+    Returns:
+        Dictionary of counts: 'succeeded', 'failed' (request errors and
+        unparsed sections), 'empty' (parsed but nothing found) and 'missing'
+        (records without a result)
+    """
+    stats = {'succeeded': 0, 'failed': 0, 'empty': 0, 'missing': 0}
+    operations = []
+    seen = set()
+
+    def flush():
+        if operations:
+            db.companies.bulk_write(operations, ordered=False)
+            operations.clear()
+
+    for record_id, text, error in results:
+        companies = records.get(record_id)
+        if companies is None or record_id in seen:
+            continue
+        seen.add(record_id)
+        if error or not text:
+            print(f"Batch record {record_id} failed: {error}")
+            stats['failed'] += len(companies)
+            continue
+
+        sections = split_batch_response(text, [company['id'] for company in companies])
+        for company in companies:
+            if company['id'] not in sections:
+                stats['failed'] += 1
+                continue
+            update_data = normalize_company_data(sections[company['id']], company['fields'])
+            update_data = {field: value for field, value in update_data.items() if value}
+            if not update_data:
+                stats['empty'] += 1
+                continue
+            update_data['updated_at'] = datetime.now()
+            operations.append(UpdateOne({'_id': ObjectId(company['id'])}, {'$set': update_data}))
+            stats['succeeded'] += 1
+            if len(operations) >= WRITE_BATCH_SIZE:
+                flush()
+    flush()
+
+    stats['missing'] = sum(len(companies) for record_id, companies in records.items() if record_id not in seen)
+    return stats
+
+
+def poll_batch_run(db, llm_connector, run_id, work_dir=DEFAULT_WORK_DIR):
+    """Check a run's batch job once; apply its results when it has finished.
+
+    Returns:
+        The run document after the check
+    """
+    run_id = ObjectId(run_id)
+    run = db.enrichment_jobs.find_one({'_id': run_id})
+    if not run or run.get('type') != 'batch_inference':
+        raise ValueError("Batch run not found")
+    if run['status'] in FINISHED_STATES:
+        return run
+
+    backend = _backend(llm_connector, run, work_dir)
+    handle = run['handle']
+    if run.get('cancel_requested') and run.get('batch_status') not in FINISHED_BATCH_STATES:
+        try:
+            backend.cancel(handle)
+        except Exception as e:
+            print(f"Error cancelling batch run {run_id}: {str(e)}")
+
+    batch_status, counts = backend.status(handle)
+    update = {'batch_status': batch_status, 'batch_counts': counts, 'updated_at': datetime.now()}
+
+    if batch_status == BATCH_COMPLETED:
+        stats = apply_batch_results(db, backend.results(handle), _load_items(_run_dir(work_dir, run_id)))
+        update.update({
+            'status': JOB_COMPLETED,
+            'completed': run.get('total', 0),
+            'succeeded': stats['succeeded'],
+            'failed': stats['failed'] + stats['missing'],
+            'skipped': stats['empty'],
+            'stats': stats,
+            'message': f"Updated {stats['succeeded']} companies, {stats['failed'] + stats['missing']} failed, "
+                       f"{stats['empty']} without new data",
+            'finished_at': datetime.now()
+        })
+    elif batch_status in FINISHED_BATCH_STATES:
+        update.update({
+            'status': JOB_CANCELLED if run.get('cancel_requested') else JOB_FAILED,
+            'message': f"Batch job {batch_status}",
+            'finished_at': datetime.now()
+        })
+
+    db.enrichment_jobs.update_one({'_id': run_id}, {'$set': update})
+    run.update(update)
+    return run
+
+
+def wait_for_batch_run(db, llm_connector, run_id, work_dir=DEFAULT_WORK_DIR, poll_interval=DEFAULT_POLL_INTERVAL,
+                       timeout=None):
+    """Poll a run until it finishes (or `timeout` seconds pass).
+
+    Returns:
+        The run document
+    """
+    started = time.monotonic()
+    while True:
+        run = poll_batch_run(db, llm_connector, run_id, work_dir)
+        if run['status'] in FINISHED_STATES:
+            return run
+        if timeout is not None and time.monotonic() - started >= timeout:
+            return run
+        time.sleep(poll_interval)
@@ -0,0 +1,193 @@
+"""
+Small multi-page crawler for website enrichment.
+
+Instead of asking the model to "visit" a website it cannot open, the
+enrichment prompt gets a digest of the site's own text. The crawler fetches
+the homepage, finds its About / Products / Services / Contact pages and
+fetches those in parallel, then extracts the visible text (see
+services.html_text) and fits it into a token budget.
+
+Every request goes through the shared page cache (services.page_fetch).
+Requests to one domain are limited across the whole process (concurrency
+and a minimum delay between requests), and each crawl has a total time
+budget after which it returns whatever it has.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urljoin, urlsplit, urldefrag
+
+from llm.tokens import estimate_tokens
+
+from .html_text import compact_sections, html_to_text
+from .page_fetch import page_fetcher
+
+DEFAULT_TIME_BUDGET = 15.0        # seconds for the whole crawl
+DEFAULT_DIGEST_TOKENS = 2000      # token budget of the digest added to the prompt
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_DOMAIN_CONCURRENCY = 2    # parallel requests to one domain
+DEFAULT_DOMAIN_DELAY = 0.25       # seconds between requests to one domain
+
+# Pages looked for on the homepage, in digest order, with the words that identify them
+PAGE_KINDS = {
+    'about': ('about', 'about-us', 'company', 'who-we-are', 'our-story'),
+    'products': ('products', 'product', 'solutions', 'shop'),
+    'services': ('services', 'service', 'what-we-do'),
+    'contact': ('contact', 'contact-us', 'locations', 'offices')
+}
+
+
+def _host(url):
+    host = (urlsplit(url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+def discover_pages(links, base_url):
+    """Pick the About / Products / Services / Contact pages among a page's links.
+
+    Returns:
+        Dictionary of page kind to absolute URL (same site only)
+    """
+    site = _host(base_url)
+    found = {}
+    for href in links:
+        url = urldefrag(urljoin(base_url, href.strip()))[0]
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or _host(url) != site:
+            continue
+
+        segments = [segment for segment in parts.path.lower().split('/') if segment]
+        if not segments:
+            continue
+        # Prefer shallow pages (/about over /blog/about-our-new-office)
+        if len(segments) > 2:
+            continue
+        for kind, words in PAGE_KINDS.items():
+            if kind not in found and any(segment.split('.')[0] in words for segment in segments):
+                found[kind] = url
+                break
+    return found
+
+
+class DomainLimiter:
+    """Process-wide politeness limits: concurrent requests and spacing per domain."""
+
+    def __init__(self, concurrency=DEFAULT_DOMAIN_CONCURRENCY, delay=DEFAULT_DOMAIN_DELAY):
+        self.concurrency = concurrency
+        self.delay = delay
+        self._slots = {}
+        self._next_start = {}
+        self._lock = threading.Lock()
+
+    def _slot(self, domain):
+        with self._lock:
+            if domain not in self._slots:
+                self._slots[domain] = threading.BoundedSemaphore(max(1, self.concurrency))
+            return self._slots[domain]
+
+    def acquire(self, domain, deadline):
+        """Wait for a request slot; returns False if the deadline passes first."""
+        slot = self._slot(domain)
+        if not slot.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            return False
+
+        # Space out request starts to the same domain
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start.get(domain, now))
+            self._next_start[domain] = start + self.delay
+        if start > now:
+            if start >= deadline:
+                slot.release()
+                return False
+            time.sleep(start - now)
+        return True
+
+    def release(self, domain):
+        self._slot(domain).release()
+
+
+class SiteCrawler:
+    """Crawls a company website and builds a text digest for the enrichment prompt."""
+
+    def __init__(self, fetcher=None, time_budget=DEFAULT_TIME_BUDGET, digest_tokens=DEFAULT_DIGEST_TOKENS,
+                 max_workers=DEFAULT_MAX_WORKERS, domain_limiter=None, enabled=True):
+        self.fetcher = fetcher or page_fetcher
+        self.time_budget = time_budget
+        self.digest_tokens = digest_tokens
+        self.max_workers = max_workers
+        self.domain_limiter = domain_limiter or DomainLimiter()
+        self.enabled = enabled
+
+    def _fetch(self, url, deadline):
+        """Fetch one page within the politeness limits; returns its HTML or None."""
+        domain = _host(url)
+        if not self.domain_limiter.acquire(domain, deadline):
+            return None
+        try:
+            timeout = max(1.0, deadline - time.monotonic())
+            page = self.fetcher.fetch(url, timeout=timeout)
+            return page['text'] if page['status'] == 200 else None
+        except Exception as e:
+            print(f"Error fetching {url}: {str(e)}")
+            return None
+        finally:
+            self.domain_limiter.release(domain)
+
+    def crawl(self, website):
+        """Fetch the homepage and its key subpages.
+
+        Returns:
+            Dictionary with `pages` (list of {'kind', 'url', 'html', 'lines'}
+            in homepage/about/products/services/contact order), `elapsed`
+            and `timed_out`
+        """
+        started = time.monotonic()
+        deadline = started + self.time_budget
+        if '://' not in website:
+            website = f"https://{website}"
+
+        pages = []
+        html = self._fetch(website, deadline)
+        if html is None:
+            return {'pages': pages, 'elapsed': round(time.monotonic() - started, 2), 'timed_out': False}
+
+        lines, links = html_to_text(html)
+        pages.append({'kind': 'home', 'url': website, 'html': html, 'lines': lines})
+
+        subpages = {kind: url for kind, url in discover_pages(links, website).items()
+                    if url.rstrip('/') != website.rstrip('/')}
+        timed_out = False
+        if subpages:
+            results = {}
+            executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(subpages)),
+                                          thread_name_prefix='crawler')
+            futures = {executor.submit(self._fetch, url, deadline): kind for kind, url in subpages.items()}
+            pending = set(futures)
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    timed_out = True
+                    break
+                done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[futures[future]] = future.result()
+            # Don't wait for requests still running past the budget
+            executor.shutdown(wait=False)
+
+            for kind in PAGE_KINDS:
+                if results.get(kind):
+                    page_lines, _ = html_to_text(results[kind])
+                    pages.append({'kind': kind, 'url': subpages[kind], 'html': results[kind], 'lines': page_lines})
+
+        return {'pages': pages, 'elapsed': round(time.monotonic() - started, 2), 'timed_out': timed_out}
+
+    def build_digest(self, pages, max_tokens=None, count_tokens=estimate_tokens):
+        """Fit the crawled pages' text into a token budget (see html_text.compact_sections)."""
+        max_tokens = max_tokens or self.digest_tokens
+        sections = [(f"[{page['kind'].upper()}] {page['url']}", page['lines']) for page in pages]
+        return compact_sections(sections, max_tokens, count_tokens=count_tokens)
+
+
+# Shared by the enrichment routes and background jobs; app.py applies its settings
+site_crawler = SiteCrawler()
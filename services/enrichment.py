@@ -0,0 +1,502 @@
+"""
+Company enrichment from the company website and LinkedIn.
+
+The fetch, LLM, parse and write steps used by `/api/company/update_from_web`
+live here so that the single-company route and the background job engine
+run exactly the same logic.
+"""
+import re
+from datetime import datetime
+from bson.objectid import ObjectId
+
+from llm.tokens import estimate_tokens
+
+from .crawler import site_crawler
+from .page_fetch import page_fetcher
+
+# Fields that the web enrichment prompt knows how to fill
+ENRICHMENT_FIELDS = ['name', 'products', 'services', 'location', 'description', 'industry', 'keyword']
+
+# Mappings for the different labels the model may use in its answer
+FIELD_LABELS = {
+    'COMPANY NAME': 'name',
+    'Company Name': 'name',
+    'PRODUCTS': 'products',
+    'Products': 'products',
+    'SERVICES': 'services',
+    'Services': 'services',
+    'LOCATION': 'location',
+    'Location': 'location',
+    'DESCRIPTION': 'description',
+    'Description': 'description',
+    'INDUSTRY': 'industry',
+    'Industry': 'industry',
+    'KEYWORDS': 'keyword',
+    'Keywords': 'keyword',
+    'LINKEDIN': 'linkedin_url',
+    'LinkedIn': 'linkedin_url'
+}
+
+DEFAULT_ENRICHMENT_PROVIDER = 'bedrock'
+
+
+# One pass finds every kind of LinkedIn URL; company pages win over people and schools
+LINKEDIN_URL_PATTERN = re.compile(r'https?://(?:www\.)?linkedin\.com/(company|in|school)/[a-zA-Z0-9_-]+')
+LINKEDIN_KIND_PRIORITY = {'company': 0, 'in': 1, 'school': 2}
+
+# Characters of the previous chunk kept so a URL split across chunks is still found
+SCAN_OVERLAP = 64
+
+
+class LinkedInURLScanner:
+    """Finds the best LinkedIn URL in text fed to it piece by piece.
+
+    `feed` returns True once a company URL has been seen, so a streamed
+    download can stop there. Otherwise the first profile or school URL is
+    kept as a fallback.
+    """
+
+    def __init__(self):
+        self._tail = ''
+        self._best = None
+        self._best_rank = None
+
+    def feed(self, text):
+        buffer = self._tail + text
+        carry_from = max(0, len(buffer) - SCAN_OVERLAP)
+        for match in LINKEDIN_URL_PATTERN.finditer(buffer):
+            if match.end() == len(buffer):
+                # The URL may continue in the next chunk
+                carry_from = min(carry_from, match.start())
+                break
+            if self._record(match):
+                return True
+        self._tail = buffer[carry_from:]
+        return False
+
+    def finish(self):
+        """Scan what is left and return the best URL found, or None."""
+        for match in LINKEDIN_URL_PATTERN.finditer(self._tail):
+            if self._record(match):
+                break
+        self._tail = ''
+        return self._best
+
+    @property
+    def found_company(self):
+        return self._best_rank == 0
+
+    def _record(self, match):
+        rank = LINKEDIN_KIND_PRIORITY[match.group(1)]
+        if self._best_rank is None or rank < self._best_rank:
+            self._best, self._best_rank = match.group(0), rank
+        return rank == 0
+
+
+def find_linkedin_url(content):
+    """Return the best LinkedIn URL in a page, or None."""
+    scanner = LinkedInURLScanner()
+    scanner.feed(content)
+    return scanner.finish()
+
+
+def _scan_page(fetcher, url):
+    """Stream a page into a LinkedInURLScanner, stopping once a company URL is found.
+
+    Returns:
+        Tuple of (HTTP status, LinkedIn URL or None)
+    """
+    scanner = LinkedInURLScanner()
+    page = fetcher.fetch(url, on_text=scanner.feed)
+    if page['status'] != 200:
+        return page['status'], None
+    return page['status'], scanner.finish()
+
+
+def extract_linkedin_url(website_url, company_name=None, fetcher=None):
+    """Extract LinkedIn URL from a company website.
+
+    Pages are fetched through the shared page cache (see services.page_fetch)
+    and scanned as they download.
+    """
+    fetcher = fetcher or page_fetcher
+
+    try:
+        # Look for LinkedIn URLs in the website
+        status, linkedin_url = _scan_page(fetcher, website_url)
+        if status != 200:
+            print(f"Failed to fetch website: {status}")
+            return None
+        if linkedin_url:
+            return linkedin_url
+
+        # If company name is provided, try a backup approach with Google search
+        if company_name:
+            try:
+                google_search_url = f"https://www.google.com/search?q={company_name}+linkedin+company"
+                status, linkedin_url = _scan_page(fetcher, google_search_url)
+                if linkedin_url:
+                    return linkedin_url
+            except Exception as e:
+                print(f"Error in Google search fallback: {str(e)}")
+                # Continue with the process even if Google search fails
+
+        # No LinkedIn URL found
+        return None
+
+    except Exception as e:
+        print(f"Error extracting LinkedIn URL: {str(e)}")
+        return None
+
+
+def determine_missing_fields(company, fields_to_update='all'):
+    """Work out which fields an enrichment run should fill in."""
+    if fields_to_update == 'all':
+        # Check for empty or missing fields
+        return [field for field in ENRICHMENT_FIELDS if field not in company or not company[field]]
+    elif fields_to_update == 'all_override':
+        # Update all fields regardless of whether they're empty or not
+        return list(ENRICHMENT_FIELDS)
+    # Update only the specified field
+    return [fields_to_update]
+
+
+def build_web_prompt(website, company_name='', linkedin_url=None, site_digest=None):
+    """Build the enrichment prompt for a company website.
+
+    `site_digest` is text crawled from the website (see services.crawler);
+    without it the model is only given the URL.
+    """
+    if site_digest:
+        prompt = f"""Below is text taken from the company website {website} """
+    else:
+        prompt = f"""Visit the company website {website} """
+
+    if linkedin_url:
+        prompt += f"and their LinkedIn profile at {linkedin_url} "
+
+    prompt += f"""and extract the following information:
+
+Format your response with these EXACT labels (include the colon):
+COMPANY NAME: [official company name]
+PRODUCTS: [list of products, separated by commas]
+SERVICES: [list of services, separated by commas]
+LOCATION: [headquarters or office locations, separated by commas]
+DESCRIPTION: [brief description of what the company does]
+INDUSTRY: [main industry or sector]
+KEYWORDS: [relevant business keywords, separated by commas]
+LINKEDIN: [LinkedIn URL if found]
+
+Only include fields where you can find information. Do not add any explanations.
+"""
+
+    if site_digest:
+        prompt += f"\nWebsite text:\n---\n{site_digest}\n---\n"
+
+    if company_name:
+        prompt += f"\n\nNote: The company may be known as '{company_name}' but verify this from the website and LinkedIn."
+
+    if linkedin_url:
+        prompt += "\n\nPrioritize LinkedIn data for company name, industry, and location as it's likely to be more accurate."
+
+    return prompt
+
+
+def parse_labeled_response(ai_response):
+    """Parse a `LABEL: value` formatted model answer.
+
+    Returns:
+        Tuple of (update_data, updated_fields)
+    """
+    update_data = {}
+    updated_fields = []
+
+    lines = ai_response.strip().split('\n')
+    current_field = None
+    current_value = ""
+
+    for line in lines:
+        line = line.strip()
+        if not line or line == '---':  # Skip empty lines or separators
+            continue
+
+        # Check for field labels with more flexible matching
+        found_field = False
+        for label, field_name in FIELD_LABELS.items():
+            if line.startswith(f"{label}:"):
+                # Save the previous field if there was one
+                if current_field and current_value:
+                    update_data[current_field] = current_value.strip()
+                    updated_fields.append(current_field)
+
+                # Start a new field
+                current_field = field_name
+                current_value = line.split(':', 1)[1].strip()
+                found_field = True
+                break
+
+        if not found_field and current_field:
+            # Continuation of the current field
+            current_value += " " + line
+
+    # Add the last field
+    if current_field and current_value:
+        # Special handling for LinkedIn URL
+        if current_field == 'linkedin_url':
+            # Extract URL from markdown link format [text](url)
+            url_match = re.search(r'\[.*?\]\((.*?)\)', current_value)
+            if url_match:
+                current_value = url_match.group(1)
+
+        update_data[current_field] = current_value.strip()
+        updated_fields.append(current_field)
+
+    return update_data, updated_fields
+
+
+def _save_linkedin_only(db, company_id, linkedin_url):
+    """Store just the LinkedIn URL; returns a result dict or None if nothing changed."""
+    result = db.companies.update_one(
+        {"_id": ObjectId(company_id)},
+        {"$set": {
+            "linkedin_url": linkedin_url,
+            "updated_at": datetime.now()
+        }}
+    )
+
+    if result.modified_count > 0:
+        return {
+            "success": True,
+            "message": "Successfully updated LinkedIn URL",
+            "updated_fields": ["linkedin_url"],
+            "data": {"linkedin_url": linkedin_url},
+            "used_linkedin": True
+        }
+    return None
+
+
+def prompt_budget(llm_connector, provider):
+    """Prompt tokens the provider's model allows, or None if it cannot be worked out."""
+    try:
+        return llm_connector.get_prompt_budget(provider)
+    except Exception as e:
+        print(f"Could not work out the prompt budget for {provider}: {str(e)}")
+        return None
+
+
+def token_counter(llm_connector, provider):
+    """The provider's token counter, or the default estimate if it cannot be built."""
+    try:
+        return llm_connector.get_token_counter(provider)
+    except Exception as e:
+        print(f"Could not load the token counter for {provider}: {str(e)}")
+        return estimate_tokens
+
+
+def prepare_web_enrichment(db, company_id, website=None, fields_to_update='all', company=None, crawler=None,
+                           max_prompt_tokens=None, count_tokens=estimate_tokens):
+    """Load the company, crawl its website, look up its LinkedIn page and build the prompt.
+
+    The website is crawled by `crawler` (default: the shared site crawler)
+    unless crawling is disabled, in which case the model only gets the URL.
+    The website text is trimmed so the whole prompt fits `max_prompt_tokens`
+    (see `prompt_budget`) as well as the crawler's own digest budget, counting
+    tokens with `count_tokens` (the provider's counter, see `token_counter`).
+
+    Returns:
+        Tuple of (prompt, linkedin_url, error). `error` is a result dictionary
+        when there is nothing to send to the model, otherwise None.
+    """
+    # Get the company from the database
+    if company is None:
+        company = db.companies.find_one({"_id": ObjectId(company_id)})
+    if not company:
+        return None, None, {
+            "success": False,
+            "message": "Company not found"
+        }
+
+    website = (website or company.get('website') or '').strip()
+    if not website:
+        return None, None, {
+            "success": False,
+            "message": "Missing company ID or website URL"
+        }
+
+    # Determine which fields to update
+    missing_fields = determine_missing_fields(company, fields_to_update)
+    if not missing_fields:
+        return None, None, {
+            "success": False,
+            "message": "No empty fields to update"
+        }
+
+    company_name = company.get('name', '')
+
+    crawler = crawler or site_crawler
+    site_digest = None
+    linkedin_url = None
+    if crawler.enabled:
+        try:
+            crawl = crawler.crawl(website)
+            digest_tokens = crawler.digest_tokens
+            if max_prompt_tokens:
+                # Leave room for the instructions, the LinkedIn URL and the text framing
+                base_tokens = count_tokens(build_web_prompt(website, company_name)) + 64
+                digest_tokens = min(digest_tokens, max_prompt_tokens - base_tokens)
+            if digest_tokens > 0:
+                site_digest = crawler.build_digest(crawl['pages'], max_tokens=digest_tokens,
+                                                   count_tokens=count_tokens)
+            print(f"Crawled {len(crawl['pages'])} pages of {website} in {crawl['elapsed']}s")
+
+            # The crawled pages usually link to the LinkedIn page already
+            scanner = LinkedInURLScanner()
+            for page in crawl['pages']:
+                if scanner.feed(page['html'] + "\n"):
+                    break
+            linkedin_url = scanner.finish()
+        except Exception as e:
+            print(f"Error crawling website: {str(e)}")
+
+    # Otherwise try to extract the LinkedIn URL from the website
+    if not linkedin_url:
+        try:
+            linkedin_url = extract_linkedin_url(website, company_name)
+            print(f"Found LinkedIn URL: {linkedin_url}")
+        except Exception as e:
+            print(f"Error finding LinkedIn URL: {str(e)}")
+
+    prompt = build_web_prompt(website, company_name, linkedin_url, site_digest)
+    print(f"Using prompt for {website}:\n{prompt}")
+    return prompt, linkedin_url, None
+
+
+def apply_web_response(db, company_id, ai_response, linkedin_url=None):
+    """Parse a model answer and write the extracted fields to the company.
+
+    Returns:
+        Result dictionary with 'success' and 'message' keys
+    """
+    print(f"Raw response:\n\n{ai_response}")
+
+    try:
+        update_data, updated_fields = parse_labeled_response(ai_response)
+
+        # If we didn't extract any fields but found a LinkedIn URL earlier, use that
+        if not update_data and linkedin_url:
+            update_data["linkedin_url"] = linkedin_url
+            updated_fields.append("linkedin_url")
+
+        # Update the company in the database
+        if update_data:
+            update_data["updated_at"] = datetime.now()
+
+            result = db.companies.update_one(
+                {"_id": ObjectId(company_id)},
+                {"$set": update_data}
+            )
+
+            if result.modified_count > 0:
+                return {
+                    "success": True,
+                    "message": f"Successfully updated {len(updated_fields)} fields" + (" with LinkedIn data" if linkedin_url else ""),
+                    "updated_fields": updated_fields,
+                    "data": update_data,
+                    "used_linkedin": linkedin_url is not None
+                }
+            return {
+                "success": False,
+                "message": "No changes made to company"
+            }
+
+        return {
+            "success": False,
+            "message": "Could not extract any useful data from the website or LinkedIn"
+        }
+
+    except Exception as parsing_error:
+        print(f"Primary parsing failed, trying alternative approach: {str(parsing_error)}")
+
+        # Fallback: Just update the LinkedIn URL if we found it
+        if linkedin_url:
+            linkedin_result = _save_linkedin_only(db, company_id, linkedin_url)
+            if linkedin_result:
+                return linkedin_result
+
+        return {
+            "success": False,
+            "message": f"Error parsing AI response: {str(parsing_error)}"
+        }
+
+
+def enrich_company_from_web(db, llm_connector, company_id, website=None, fields_to_update='all',
+                            provider=DEFAULT_ENRICHMENT_PROVIDER, company=None, use_cache=True,
+                            failover=False):
+    """Fetch, prompt, parse and write enrichment data for a single company.
+
+    Args:
+        db: MongoDB database handle
+        llm_connector: LLMConnector used to reach the provider
+        company_id: ID of the company to update
+        website: Website to use (defaults to the stored company website)
+        fields_to_update: 'all', 'all_override' or a single field name
+        provider: LLM provider key
+        company: Already loaded company document, if available
+        use_cache: Set to False to skip the LLM response cache
+        failover: Fall back to other providers when this one is failing
+
+    Returns:
+        Result dictionary with 'success' and 'message' keys
+    """
+    prompt, linkedin_url, error = prepare_web_enrichment(db, company_id, website, fields_to_update, company,
+                                                         max_prompt_tokens=prompt_budget(llm_connector, provider),
+                                                         count_tokens=token_counter(llm_connector, provider))
+    if error:
+        return error
+
+    try:
+        # Generate the response
+        ai_response = llm_connector.generate_text(prompt, provider=provider, use_cache=use_cache,
+                                                  failover=failover)
+    except Exception as e:
+        return {
+            "success": False,
+            "message": f"Error: {str(e)}"
+        }
+    return apply_web_response(db, company_id, ai_response, linkedin_url)
+
+
+def stream_company_enrichment(db, llm_connector, company_id, website=None, fields_to_update='all',
+                              provider=DEFAULT_ENRICHMENT_PROVIDER, use_cache=True, failover=False):
+    """Streaming version of `enrich_company_from_web`.
+
+    Yields `(event, data)` pairs: a 'status' event while the website is
+    looked up, a 'delta' event for each piece of model output as it arrives,
+    and a final 'result' event carrying the same dictionary
+    `enrich_company_from_web` returns.
+    """
+    yield 'status', {"message": "Looking up the company website..."}
+
+    prompt, linkedin_url, error = prepare_web_enrichment(db, company_id, website, fields_to_update,
+                                                         max_prompt_tokens=prompt_budget(llm_connector, provider),
+                                                         count_tokens=token_counter(llm_connector, provider))
+    if error:
+        yield 'result', error
+        return
+
+    yield 'status', {"message": "Asking the model...", "used_linkedin": linkedin_url is not None}
+
+    parts = []
+    try:
+        for delta in llm_connector.stream_text(prompt, provider=provider, use_cache=use_cache,
+                                               failover=failover):
+            parts.append(delta)
+            yield 'delta', {"text": delta}
+    except Exception as e:
+        yield 'result', {
+            "success": False,
+            "message": f"Error: {str(e)}"
+        }
+        return
+
+    yield 'result', apply_web_response(db, company_id, "".join(parts), linkedin_url)
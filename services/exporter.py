@@ -0,0 +1,68 @@
+"""
+Streaming CSV export for companies.
+
+Rows are read from a projected cursor in batches and written out as CSV
+chunks by a generator, so an export of the whole collection uses the same
+memory as an export of ten companies. Chunks can optionally be gzipped on
+the fly.
+"""
+import csv
+import io
+import zlib
+
+# Columns written to the CSV file
+EXPORT_FIELDS = ['name', 'website', 'linkedin_url', 'industry', 'products', 'services', 'location',
+                 'description', 'keyword', 'email', 'phone']
+
+EXPORT_BATCH_SIZE = 1000
+
+# Rows buffered before a chunk is yielded
+ROWS_PER_CHUNK = 500
+
+
+def export_cursor(collection, query, sort=None, projection=None, fields=EXPORT_FIELDS,
+                  batch_size=EXPORT_BATCH_SIZE):
+    """Open a cursor that only loads the exported fields."""
+    export_projection = {field: 1 for field in fields}
+    export_projection['_id'] = 0
+    if projection:
+        export_projection.update(projection)
+
+    cursor = collection.find(query, export_projection, batch_size=batch_size)
+    return cursor.sort(sort or [('_id', 1)])
+
+
+def _format_value(value):
+    # Convert lists to comma-separated strings
+    if isinstance(value, list):
+        return ', '.join(str(item) for item in value)
+    return value if value is not None else ''
+
+
+def iter_csv(companies, fields=EXPORT_FIELDS, rows_per_chunk=ROWS_PER_CHUNK):
+    """Yield CSV text chunks (header first) for an iterable of company documents."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+
+    rows = 0
+    for company in companies:
+        writer.writerow([_format_value(company.get(field, '')) for field in fields])
+        rows += 1
+        if rows % rows_per_chunk == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_gzip(chunks, encoding='utf-8'):
+    """Gzip-compress a stream of text chunks on the fly."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode(encoding))
+        if data:
+            yield data
+    yield compressor.flush()
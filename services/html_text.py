@@ -0,0 +1,234 @@
+"""
+HTML-to-text extraction and token-budgeted compaction for prompts.
+
+Raw HTML costs many times more tokens than the text a visitor reads. Pages
+are reduced to their visible text: scripts, styles and other invisible
+elements are dropped, as are navigation, headers, sidebars, cookie banners
+and similar boilerplate (by tag and by class/id). Footers are kept because
+they often hold the address and contact details; repeated lines, such as a
+footer seen on every page, are removed. Whitespace is collapsed.
+`compact_sections` then fits the text of several pages into a token budget.
+"""
+import re
+from html.parser import HTMLParser
+
+from llm.tokens import estimate_tokens
+
+# Elements whose text is never shown to visitors
+INVISIBLE_TAGS = {'script', 'style', 'noscript', 'template', 'svg', 'head', 'iframe', 'canvas', 'object'}
+
+# Elements that hold site chrome rather than page content
+BOILERPLATE_TAGS = {'nav', 'header', 'aside', 'form', 'button', 'select', 'dialog'}
+
+# Words that mark site chrome when a class/id/role token is or ends with one
+# ("nav", "site-nav", "main_menu", "cookie-banner")
+BOILERPLATE_WORDS = {'nav', 'navbar', 'navigation', 'menu', 'breadcrumb', 'breadcrumbs', 'cookie', 'cookies',
+                     'consent', 'banner', 'header', 'sidebar', 'social', 'share', 'newsletter', 'subscribe',
+                     'popup', 'modal', 'skip', 'widget'}
+
+# Tokens starting with these describe a state ("has-sidebar", "is-menu-open"), not chrome
+STATE_PREFIXES = {'has', 'is', 'no', 'with', 'without', 'show', 'hide'}
+
+# Elements that hold the page content; never dropped for their class/id
+CONTENT_TAGS = {'html', 'body', 'main', 'article'}
+
+# Elements that end a line of text
+BLOCK_TAGS = {'p', 'div', 'br', 'li', 'ul', 'ol', 'tr', 'td', 'th', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+              'section', 'article', 'header', 'footer', 'nav', 'aside', 'main', 'table', 'form',
+              'blockquote', 'address', 'dd', 'dt', 'title', 'hr'}
+
+# Elements without a closing tag
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source',
+             'track', 'wbr'}
+
+# Lines this short (in words) are dropped first when a page is over budget
+SHORT_LINE_WORDS = 3
+
+
+def _is_boilerplate_token(token):
+    words = [word for word in re.split(r'[_-]+', token.lower()) if word]
+    return bool(words) and words[0] not in STATE_PREFIXES and words[-1] in BOILERPLATE_WORDS
+
+
+def _is_boilerplate(tag, attrs):
+    if tag in BOILERPLATE_TAGS:
+        return True
+    if tag in CONTENT_TAGS:
+        return False
+    attributes = dict(attrs)
+    marker = ' '.join(filter(None, (attributes.get('class'), attributes.get('id'), attributes.get('role'))))
+    return any(_is_boilerplate_token(token) for token in marker.split())
+
+
+class _TextExtractor(HTMLParser):
+    """Collects visible content lines and every link target of a page."""
+
+    def __init__(self, strip_boilerplate=True):
+        super().__init__(convert_charrefs=True)
+        self.strip_boilerplate = strip_boilerplate
+        self.lines = []
+        self.links = []
+        self._current = []
+        # [tag, depth, matched by class/id] of the element being skipped, if any
+        self._skipping = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'a':
+            # Links in the navigation are still needed to discover pages
+            href = dict(attrs).get('href')
+            if href:
+                self.links.append(href)
+
+        if tag in VOID_TAGS:
+            if tag in BLOCK_TAGS:
+                self._end_line()
+            return
+
+        if self._skipping:
+            if self._skipping[2] and tag in CONTENT_TAGS:
+                # A wrapper whose class looked like chrome holds the page content
+                self._skipping = None
+            else:
+                if tag == self._skipping[0]:
+                    self._skipping[1] += 1
+                return
+
+        if tag in INVISIBLE_TAGS:
+            self._end_line()
+            self._skipping = [tag, 1, False]
+        elif self.strip_boilerplate and _is_boilerplate(tag, attrs):
+            self._end_line()
+            self._skipping = [tag, 1, tag not in BOILERPLATE_TAGS]
+        elif tag in BLOCK_TAGS:
+            self._end_line()
+
+    def handle_endtag(self, tag):
+        if self._skipping:
+            if tag == self._skipping[0]:
+                self._skipping[1] -= 1
+                if not self._skipping[1]:
+                    self._skipping = None
+            return
+        if tag in BLOCK_TAGS:
+            self._end_line()
+
+    def handle_data(self, data):
+        if not self._skipping:
+            self._current.append(data)
+
+    def _end_line(self):
+        line = re.sub(r'\s+', ' ', ''.join(self._current)).strip()
+        if line:
+            self.lines.append(line)
+        self._current = []
+
+    def close(self):
+        super().close()
+        self._end_line()
+
+
+def html_to_text(html, strip_boilerplate=True):
+    """Extract the visible content of a page.
+
+    Returns:
+        Tuple of (lines, links): content lines without repeats, and the raw
+        href of every link on the page (including navigation links)
+    """
+    parser = _TextExtractor(strip_boilerplate=strip_boilerplate)
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception as e:
+        print(f"Error parsing page: {str(e)}")
+
+    if strip_boilerplate and not parser.lines:
+        # Some sites put everything in a <header> or a "menu" block; keep their text
+        return html_to_text(html, strip_boilerplate=False)
+    return dedupe_lines(parser.lines), parser.links
+
+
+def dedupe_lines(lines, seen=None):
+    """Drop repeated lines (case-insensitive), keeping the first occurrence.
+
+    Pass the same `seen` set for several pages to drop lines repeated
+    across them.
+    """
+    seen = set() if seen is None else seen
+    unique = []
+    for line in lines:
+        key = line.lower()
+        if key not in seen:
+            seen.add(key)
+            unique.append(line)
+    return unique
+
+
+def _cut_line(line, max_tokens, count_tokens):
+    """The longest start of a line, cut at a word and marked with ' ...', within max_tokens."""
+    words = line.split(' ')
+    low, high = 0, len(words)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(' '.join(words[:middle]) + ' ...') <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return ' '.join(words[:low]) + ' ...' if low else None
+
+
+def _fit_lines(lines, max_tokens, count_tokens):
+    """Keep lines in order until the budget is used; short lines go first if it is tight."""
+    total = sum(count_tokens(line) for line in lines)
+    if total > max_tokens:
+        # Short lines are mostly labels and buttons ("Read more", "Learn more")
+        lines = [line for line in lines if len(line.split()) > SHORT_LINE_WORDS]
+
+    kept = []
+    used = 0
+    for line in lines:
+        cost = count_tokens(line)
+        if used + cost > max_tokens:
+            remaining = max_tokens - used
+            if remaining > 8:
+                # Cut the line at a word boundary rather than lose it entirely
+                cut = _cut_line(line, remaining, count_tokens)
+                if cut:
+                    kept.append(cut)
+                    used += count_tokens(cut)
+            break
+        kept.append(line)
+        used += cost
+    return kept, used
+
+
+def compact_sections(sections, max_tokens, count_tokens=estimate_tokens):
+    """Fit titled sections of text lines into a token budget.
+
+    Lines repeated across sections are dropped. Every section gets an equal
+    share of the budget, and what a short section does not use is passed
+    on to the following ones.
+
+    Args:
+        sections: List of (title, lines) tuples in priority order
+        max_tokens: Token budget for the whole result
+        count_tokens: Function returning the token count of a string
+
+    Returns:
+        The compacted text
+    """
+    seen = set()
+    sections = [(title, dedupe_lines(lines, seen)) for title, lines in sections]
+    sections = [(title, lines) for title, lines in sections if lines]
+
+    parts = []
+    budget_left = max_tokens
+    for index, (title, lines) in enumerate(sections):
+        share = budget_left // (len(sections) - index)
+        title_cost = count_tokens(title)
+        if share <= title_cost:
+            continue
+        kept, used = _fit_lines(lines, share - title_cost, count_tokens)
+        if kept:
+            parts.append("\n".join([title] + kept))
+            budget_left -= used + title_cost
+    return "\n\n".join(parts)
@@ -0,0 +1,269 @@
+"""
+Streaming CSV import for companies.
+
+The upload is decoded incrementally and written in unordered batches, so
+memory use stays flat and a 200k-row file takes a few hundred round trips
+instead of 200k. Small files are imported inside the request; large ones run
+as a background job (see `JobManager.submit_import`).
+
+Rows are either always inserted, or upserted on the company's normalized
+website domain (`domain`, unique index) with one of the MERGE_POLICIES, which
+makes re-importing the same file idempotent.
+"""
+import codecs
+import csv
+import re
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+# Columns read from the CSV file (website is required)
+IMPORT_FIELDS = ['name', 'website', 'products', 'services', 'location', 'keyword']
+
+DEFAULT_BATCH_SIZE = 1000
+
+# Uploads larger than this (in bytes) are imported in the background
+DEFAULT_BACKGROUND_THRESHOLD = 2 * 1024 * 1024
+
+
+# Merge policies for upsert imports; None inserts every row
+MERGE_FILL_EMPTY = 'fill_empty'
+MERGE_OVERWRITE = 'overwrite'
+MERGE_SKIP = 'skip'
+
+MERGE_POLICIES = (MERGE_FILL_EMPTY, MERGE_OVERWRITE, MERGE_SKIP)
+
+DOMAIN_INDEX_NAME = 'companies_domain_unique'
+
+
+class CSVImportError(ValueError):
+    """Raised when a CSV file cannot be imported at all (e.g. a bad header)."""
+
+
+def read_csv_rows(binary_stream, encoding='utf-8-sig'):
+    """Decode a binary stream incrementally and yield parsed CSV rows.
+
+    `utf-8-sig` also accepts files saved with a byte order mark.
+    """
+    text_stream = codecs.getreader(encoding)(binary_stream, errors='replace')
+    return csv.reader(text_stream)
+
+
+def normalize_domain(website):
+    """Reduce a website to its canonical domain, e.g. 'https://www.Acme.com/about' -> 'acme.com'."""
+    website = (website or '').strip().lower()
+    if not website:
+        return ''
+    if '://' not in website:
+        website = f"http://{website}"
+    try:
+        host = urlsplit(website).hostname or ''
+    except ValueError:
+        return ''
+    host = re.sub(r'^www\d*\.', '', host.rstrip('.'))
+    return host
+
+
+def ensure_import_indexes(db):
+    """Create the unique index that backs upsert imports.
+
+    Only companies that have a `domain` are indexed, so older records and
+    companies added without deduplication are not affected.
+    """
+    db.companies.create_index(
+        'domain',
+        name=DOMAIN_INDEX_NAME,
+        unique=True,
+        partialFilterExpression={'domain': {'$type': 'string'}}
+    )
+
+
+def backfill_domains(db, batch_size=DEFAULT_BATCH_SIZE):
+    """Set `domain` on companies that do not have one yet.
+
+    Companies whose domain already belongs to another company are left
+    without one, so existing duplicates never block an import.
+
+    Returns:
+        Number of companies updated
+    """
+    updated = 0
+    ops = []
+
+    def flush():
+        nonlocal updated
+        if not ops:
+            return
+        try:
+            updated += db.companies.bulk_write(ops, ordered=False).modified_count
+        except BulkWriteError as e:
+            updated += e.details.get('nModified', 0)
+        ops.clear()
+
+    cursor = db.companies.find({'domain': {'$exists': False}, 'website': {'$nin': ['', None]}}, {'website': 1})
+    for company in cursor:
+        domain = normalize_domain(company.get('website'))
+        if domain:
+            ops.append(UpdateOne({'_id': company['_id'], 'domain': {'$exists': False}}, {'$set': {'domain': domain}}))
+        if len(ops) >= batch_size:
+            flush()
+    flush()
+    return updated
+
+
+def _upsert_op(company, merge_policy, user_id, now):
+    """Build the UpdateOne for a company row under a merge policy."""
+    fields = {field: value for field, value in company.items() if value}
+    on_insert = {'added_by': user_id, 'created_at': now}
+
+    if merge_policy == MERGE_SKIP:
+        # Only create companies that do not exist yet
+        update = {'$setOnInsert': dict(company, **on_insert)}
+    elif merge_policy == MERGE_OVERWRITE:
+        # Non-empty CSV values replace what is stored; empty cells never clear data
+        update = {
+            '$set': dict(fields, updated_at=now),
+            '$setOnInsert': dict({k: v for k, v in company.items() if not v}, **on_insert)
+        }
+    else:
+        # Fill only fields that are missing or empty on the stored company. CSV
+        # values go in as $literal, or one starting with "$" would be read as a field path
+        stage = {
+            field: {'$cond': [{'$in': [{'$ifNull': [f'${field}', '']}, ['', None]]}, {'$literal': value}, f'${field}']}
+            for field, value in company.items()
+        }
+        stage['added_by'] = {'$ifNull': ['$added_by', {'$literal': user_id}]}
+        stage['created_at'] = {'$ifNull': ['$created_at', {'$literal': now}]}
+        update = [{'$set': stage}]
+
+    return UpdateOne({'domain': company['domain']}, update, upsert=True)
+
+
+def _field_indices(header):
+    """Map import fields to their column position in the header."""
+    header = [h.strip().lower() for h in header]
+
+    # Check if website field exists in the header
+    if 'website' not in header:
+        raise CSVImportError('Website field is required in the CSV file')
+
+    return len(header), {field: header.index(field) for field in IMPORT_FIELDS if field in header}
+
+
+def parse_company_row(row, header_length, indices):
+    """Validate a CSV row and build the company fields, or return None to skip it."""
+    # Ensure the row has enough columns
+    if len(row) < header_length:
+        return None
+
+    company = {}
+    for field in IMPORT_FIELDS:
+        idx = indices.get(field)
+        company[field] = row[idx].strip() if idx is not None and idx < len(row) else ''
+
+    # Check if website field is empty
+    if not company['website']:
+        return None
+    return company
+
+
+def import_companies(db, binary_stream, user_id=None, batch_size=DEFAULT_BATCH_SIZE, progress=None,
+                     merge_policy=None):
+    """Stream companies from a CSV file into the database.
+
+    Args:
+        db: MongoDB database handle
+        binary_stream: File-like object opened in binary mode
+        user_id: ID of the importing user, stored as `added_by`
+        batch_size: Number of rows per database write
+        progress: Optional callback receiving the stats dict after each batch
+        merge_policy: None to insert every row, or one of MERGE_POLICIES to
+            upsert on the normalized website domain
+
+    Returns:
+        Stats dictionary with processed, added, updated, unchanged, skipped,
+        duration and rows_per_sec
+    """
+    if merge_policy is not None and merge_policy not in MERGE_POLICIES:
+        raise CSVImportError(f"Unknown merge policy: {merge_policy}")
+
+    started = time.perf_counter()
+    stats = {'processed': 0, 'added': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0,
+             'duration': 0.0, 'rows_per_sec': 0.0}
+
+    rows = read_csv_rows(binary_stream)
+    try:
+        header = next(rows)
+    except StopIteration:
+        raise CSVImportError('The CSV file is empty')
+    header_length, indices = _field_indices(header)
+
+    if merge_policy:
+        # Give older companies a domain so the upserts can find them
+        backfill_domains(db, batch_size=batch_size)
+
+    def flush(batch):
+        if batch and merge_policy:
+            try:
+                result = db.companies.bulk_write(batch, ordered=False).bulk_api_result
+            except BulkWriteError as e:
+                # Unordered writes keep going past rows that fail
+                result = e.details
+                stats['skipped'] += len(e.details.get('writeErrors', []))
+            stats['added'] += result.get('nUpserted', 0)
+            stats['updated'] += result.get('nModified', 0)
+            stats['unchanged'] += result.get('nMatched', 0) - result.get('nModified', 0)
+        elif batch:
+            try:
+                result = db.companies.insert_many(batch, ordered=False)
+                stats['added'] += len(result.inserted_ids)
+            except BulkWriteError as e:
+                # Unordered inserts keep going past bad documents
+                inserted = e.details.get('nInserted', 0)
+                stats['added'] += inserted
+                stats['skipped'] += len(batch) - inserted
+        elapsed = time.perf_counter() - started
+        stats['duration'] = round(elapsed, 2)
+        stats['rows_per_sec'] = round(stats['processed'] / elapsed, 1) if elapsed else 0.0
+        if progress:
+            progress(dict(stats))
+
+    batch = []
+    for row in rows:
+        # Skip empty rows
+        if not row:
+            continue
+
+        stats['processed'] += 1
+        company = parse_company_row(row, header_length, indices)
+        if company is None:
+            stats['skipped'] += 1
+            continue
+
+        if merge_policy:
+            company['domain'] = normalize_domain(company['website'])
+            if not company['domain']:
+                stats['skipped'] += 1
+                continue
+            batch.append(_upsert_op(company, merge_policy, user_id, datetime.now()))
+        else:
+            company['added_by'] = user_id
+            company['created_at'] = datetime.now()
+            batch.append(company)
+
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+
+    flush(batch)
+    return stats
+
+
+def describe_import(stats):
+    """One-line summary of an import for flash messages and job status."""
+    message = f"Added {stats['added']} companies"
+    if stats.get('updated') or stats.get('unchanged'):
+        message += f", updated {stats['updated']}, unchanged {stats['unchanged']}"
+    return message + f", skipped {stats['skipped']} ({stats['rows_per_sec']} rows/sec)"
@@ -0,0 +1,405 @@
+"""
+Server-side job engine for bulk company enrichment and large CSV imports.
+
+Jobs are persisted in the `enrichment_jobs` collection so that any gunicorn
+worker can report progress, while the work itself runs on a bounded thread
+pool inside the worker that accepted the job. Calls to each LLM provider go
+through the connector's rate limiter (`max_in_flight`, `rpm` and `tpm` in the
+provider's `additional_params`) so a bulk run cannot flood a single backend.
+
+Each JobManager records a heartbeat in `job_workers`. Jobs left queued or
+running by a worker whose heartbeat has stopped (killed on timeout,
+restarted) are marked failed, at startup and on every heartbeat.
+"""
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+
+from .batch_extraction import extract_batch, DEFAULT_BATCH_SIZE as DEFAULT_EXTRACTION_BATCH_SIZE, MAX_BATCH_SIZE
+from .enrichment import enrich_company_from_web, DEFAULT_ENRICHMENT_PROVIDER
+from .importer import import_companies, describe_import, DEFAULT_BATCH_SIZE
+
+DEFAULT_MAX_WORKERS = 8
+WORKER_HEARTBEAT_INTERVAL = 30      # seconds between heartbeats
+WORKER_TIMEOUT = 120                # a worker without a heartbeat for this long is gone
+
+# Job states
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_CANCELLED = 'cancelled'
+JOB_FAILED = 'failed'
+
+FINISHED_STATES = (JOB_COMPLETED, JOB_CANCELLED, JOB_FAILED)
+
+# Job types run by JobManager (batch inference runs are driven by a script)
+WORKER_JOB_TYPES = ('enrichment', 'extraction', 'import')
+
+
+class _JobCancelled(Exception):
+    """Raised inside a running import when its job has been cancelled."""
+
+
+class JobManager:
+    """Runs enrichment jobs on a bounded worker pool."""
+
+    def __init__(self, db, llm_connector, max_workers=DEFAULT_MAX_WORKERS):
+        self.db = db
+        self.llm_connector = llm_connector
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='enrichment')
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        try:
+            self.db.job_workers.create_index('seen_at', expireAfterSeconds=24 * 60 * 60)
+            self._heartbeat()
+            self.fail_orphaned_jobs()
+        except Exception as e:
+            print(f"Error checking for orphaned jobs: {str(e)}")
+        self._heartbeat_thread = threading.Thread(target=self._run_heartbeat, name='job-heartbeat', daemon=True)
+        self._heartbeat_thread.start()
+
+    def _heartbeat(self):
+        self.db.job_workers.update_one(
+            {'_id': self.worker_id},
+            {'$set': {'seen_at': datetime.now()}},
+            upsert=True
+        )
+
+    def _run_heartbeat(self):
+        while True:
+            time.sleep(WORKER_HEARTBEAT_INTERVAL)
+            try:
+                self._heartbeat()
+                self.fail_orphaned_jobs()
+            except Exception as e:
+                print(f"Error recording job worker heartbeat: {str(e)}")
+
+    def fail_orphaned_jobs(self):
+        """Mark jobs whose worker process has stopped as failed.
+
+        Returns:
+            Number of jobs marked failed
+        """
+        cutoff = datetime.now() - timedelta(seconds=WORKER_TIMEOUT)
+        live_workers = [doc['_id'] for doc in self.db.job_workers.find({'seen_at': {'$gte': cutoff}}, {'_id': 1})]
+        result = self.db.enrichment_jobs.update_many(
+            {
+                'type': {'$in': list(WORKER_JOB_TYPES)},
+                'status': {'$in': [JOB_QUEUED, JOB_RUNNING]},
+                'worker': {'$nin': live_workers}
+            },
+            {'$set': {
+                'status': JOB_FAILED,
+                'message': 'The worker running this job stopped before it finished',
+                'finished_at': datetime.now(),
+                'updated_at': datetime.now()
+            }}
+        )
+        if result.modified_count:
+            print(f"Marked {result.modified_count} orphaned job(s) as failed")
+        return result.modified_count
+
+    def submit_enrichment(self, company_ids, fields='all', provider=None, user_id=None):
+        """Create an enrichment job and schedule its companies.
+
+        Returns:
+            The new job ID as a string
+        """
+        provider = provider or DEFAULT_ENRICHMENT_PROVIDER
+        if not self.llm_connector.config.get_provider_config(provider):
+            raise ValueError(f"Provider '{provider}' not configured")
+
+        # Keep the submitted order but drop duplicates
+        company_ids = list(dict.fromkeys(str(company_id) for company_id in company_ids))
+
+        job = {
+            'type': 'enrichment',
+            'status': JOB_QUEUED,
+            'provider': provider,
+            'fields': fields,
+            'total': len(company_ids),
+            'completed': 0,
+            'succeeded': 0,
+            'failed': 0,
+            'skipped': 0,
+            'cancel_requested': False,
+            'items': {company_id: {'status': 'pending'} for company_id in company_ids},
+            'created_by': user_id,
+            'worker': self.worker_id,
+            'created_at': datetime.now(),
+            'updated_at': datetime.now()
+        }
+        job_id = self.db.enrichment_jobs.insert_one(job).inserted_id
+
+        for company_id in company_ids:
+            self._executor.submit(self._run_item, job_id, company_id, fields, provider)
+
+        return str(job_id)
+
+    def _is_cancelled(self, job_id):
+        job = self.db.enrichment_jobs.find_one({'_id': job_id}, {'cancel_requested': 1})
+        return not job or job.get('cancel_requested')
+
+    def _run_item(self, job_id, company_id, fields, provider):
+        """Enrich one company of a job and record the outcome."""
+        try:
+            if self._is_cancelled(job_id):
+                self._record(job_id, company_id, {'status': 'skipped', 'message': 'Job cancelled'})
+                return
+
+            self.db.enrichment_jobs.update_one(
+                {'_id': job_id, 'status': JOB_QUEUED},
+                {'$set': {'status': JOB_RUNNING, 'started_at': datetime.now()}}
+            )
+            self.db.enrichment_jobs.update_one(
+                {'_id': job_id},
+                {'$set': {f'items.{company_id}.status': 'running'}}
+            )
+
+            started = time.time()
+            result = enrich_company_from_web(
+                self.db,
+                self.llm_connector,
+                company_id,
+                fields_to_update=fields,
+                provider=provider
+            )
+
+            self._record(job_id, company_id, {
+                'status': 'success' if result.get('success') else 'failed',
+                'message': result.get('message', ''),
+                'updated_fields': result.get('updated_fields', []),
+                'duration': round(time.time() - started, 2)
+            })
+        except Exception as e:
+            print(f"Error in enrichment job {job_id} for company {company_id}: {str(e)}")
+            self._record(job_id, company_id, {'status': 'failed', 'message': f"Error: {str(e)}"})
+
+    def submit_extraction(self, company_ids, prompt_id, provider=None, target_field='all',
+                          batch_size=DEFAULT_EXTRACTION_BATCH_SIZE, user_id=None):
+        """Create a job that fills company fields with a saved AI prompt, several companies per request.
+
+        Returns:
+            The new job ID as a string
+        """
+        provider = provider or DEFAULT_ENRICHMENT_PROVIDER
+        if not self.llm_connector.config.get_provider_config(provider):
+            raise ValueError(f"Provider '{provider}' not configured")
+        try:
+            ai_prompt = self.db.ai_prompts.find_one({'_id': ObjectId(prompt_id)})
+        except Exception:
+            ai_prompt = None
+        if not ai_prompt:
+            raise ValueError("AI prompt not found")
+        batch_size = max(1, min(int(batch_size or DEFAULT_EXTRACTION_BATCH_SIZE), MAX_BATCH_SIZE))
+
+        company_ids = list(dict.fromkeys(str(company_id) for company_id in company_ids))
+
+        job = {
+            'type': 'extraction',
+            'status': JOB_QUEUED,
+            'provider': provider,
+            'fields': target_field,
+            'prompt_id': str(ai_prompt['_id']),
+            'batch_size': batch_size,
+            'total': len(company_ids),
+            'completed': 0,
+            'succeeded': 0,
+            'failed': 0,
+            'skipped': 0,
+            'cancel_requested': False,
+            'items': {company_id: {'status': 'pending'} for company_id in company_ids},
+            'created_by': user_id,
+            'worker': self.worker_id,
+            'created_at': datetime.now(),
+            'updated_at': datetime.now()
+        }
+        job_id = self.db.enrichment_jobs.insert_one(job).inserted_id
+
+        for start in range(0, len(company_ids), batch_size):
+            self._executor.submit(self._run_extraction, job_id, company_ids[start:start + batch_size],
+                                  ai_prompt, provider, target_field)
+
+        return str(job_id)
+
+    def _run_extraction(self, job_id, company_ids, ai_prompt, provider, target_field):
+        """Run one batch of an extraction job; failed sections are retried inside the batch."""
+        recorded = set()
+
+        def record(company_id, result):
+            recorded.add(company_id)
+            self._record(job_id, company_id, result)
+
+        try:
+            if self._is_cancelled(job_id):
+                for company_id in company_ids:
+                    record(company_id, {'status': 'skipped', 'message': 'Job cancelled'})
+                return
+
+            self.db.enrichment_jobs.update_one(
+                {'_id': job_id, 'status': JOB_QUEUED},
+                {'$set': {'status': JOB_RUNNING, 'started_at': datetime.now()}}
+            )
+            self.db.enrichment_jobs.update_one(
+                {'_id': job_id},
+                {'$set': {f'items.{company_id}.status': 'running' for company_id in company_ids}}
+            )
+
+            extract_batch(
+                self.db,
+                self.llm_connector,
+                company_ids,
+                ai_prompt,
+                provider,
+                target_field=target_field,
+                batch_size=len(company_ids),
+                on_result=record
+            )
+        except Exception as e:
+            print(f"Error in extraction job {job_id}: {str(e)}")
+            for company_id in company_ids:
+                if company_id not in recorded:
+                    record(company_id, {'status': 'failed', 'message': f"Error: {str(e)}"})
+
+    def _record(self, job_id, company_id, item):
+        """Store an item result and finish the job once every item is done."""
+        counter = {'success': 'succeeded', 'skipped': 'skipped'}.get(item['status'], 'failed')
+        job = self.db.enrichment_jobs.find_one_and_update(
+            {'_id': job_id},
+            {
+                '$set': {f'items.{company_id}': item, 'updated_at': datetime.now()},
+                '$inc': {'completed': 1, counter: 1}
+            },
+            projection={'completed': 1, 'total': 1, 'cancel_requested': 1},
+            return_document=ReturnDocument.AFTER
+        )
+
+        if job and job['completed'] >= job['total']:
+            self.db.enrichment_jobs.update_one(
+                {'_id': job_id},
+                {'$set': {
+                    'status': JOB_CANCELLED if job.get('cancel_requested') else JOB_COMPLETED,
+                    'finished_at': datetime.now(),
+                    'updated_at': datetime.now()
+                }}
+            )
+
+    def submit_import(self, file_path, filename=None, user_id=None, batch_size=DEFAULT_BATCH_SIZE,
+                      merge_policy=None):
+        """Create a CSV import job for an uploaded file saved at `file_path`.
+
+        The file is removed once the import has finished.
+
+        Returns:
+            The new job ID as a string
+        """
+        job = {
+            'type': 'import',
+            'status': JOB_QUEUED,
+            'filename': filename,
+            'batch_size': batch_size,
+            'merge_policy': merge_policy,
+            'stats': {'processed': 0, 'added': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0,
+                      'duration': 0.0, 'rows_per_sec': 0.0},
+            'cancel_requested': False,
+            'created_by': user_id,
+            'worker': self.worker_id,
+            'created_at': datetime.now(),
+            'updated_at': datetime.now()
+        }
+        job_id = self.db.enrichment_jobs.insert_one(job).inserted_id
+
+        self._executor.submit(self._run_import, job_id, file_path, user_id, batch_size, merge_policy)
+        return str(job_id)
+
+    def _run_import(self, job_id, file_path, user_id, batch_size, merge_policy=None):
+        """Stream an uploaded CSV file into the database, reporting progress per batch."""
+        def progress(stats):
+            job = self.db.enrichment_jobs.find_one_and_update(
+                {'_id': job_id},
+                {'$set': {'stats': stats, 'updated_at': datetime.now()}},
+                projection={'cancel_requested': 1}
+            )
+            if not job or job.get('cancel_requested'):
+                raise _JobCancelled()
+
+        self.db.enrichment_jobs.update_one(
+            {'_id': job_id},
+            {'$set': {'status': JOB_RUNNING, 'started_at': datetime.now(), 'updated_at': datetime.now()}}
+        )
+
+        update = {}
+        try:
+            with open(file_path, 'rb') as f:
+                stats = import_companies(self.db, f, user_id=user_id, batch_size=batch_size,
+                                         progress=progress, merge_policy=merge_policy)
+            update = {
+                'status': JOB_COMPLETED,
+                'stats': stats,
+                'message': describe_import(stats)
+            }
+        except _JobCancelled:
+            update = {'status': JOB_CANCELLED, 'message': 'Import cancelled'}
+        except Exception as e:
+            print(f"Error in import job {job_id}: {str(e)}")
+            update = {'status': JOB_FAILED, 'message': f"Error: {str(e)}"}
+        finally:
+            update.update({'finished_at': datetime.now(), 'updated_at': datetime.now()})
+            self.db.enrichment_jobs.update_one({'_id': job_id}, {'$set': update})
+            try:
+                os.remove(file_path)
+            except OSError as e:
+                print(f"Error removing import file {file_path}: {str(e)}")
+
+    def get_job(self, job_id):
+        """Get a job document, or None if it does not exist."""
+        try:
+            return self.db.enrichment_jobs.find_one({'_id': ObjectId(job_id)})
+        except Exception:
+            return None
+
+    def cancel_job(self, job_id):
+        """Ask a job to stop; companies already in flight still finish."""
+        try:
+            job_id = ObjectId(job_id)
+        except Exception:
+            return False
+
+        result = self.db.enrichment_jobs.update_one(
+            {'_id': job_id, 'status': {'$nin': list(FINISHED_STATES)}},
+            {'$set': {'cancel_requested': True, 'updated_at': datetime.now()}}
+        )
+        return result.modified_count > 0
+
+
+def serialize_job(job):
+    """Convert a job document to a JSON-friendly dict."""
+    return {
+        'job_id': str(job['_id']),
+        'type': job.get('type'),
+        'status': job.get('status'),
+        'provider': job.get('provider'),
+        'fields': job.get('fields'),
+        'prompt_id': job.get('prompt_id'),
+        'batch_size': job.get('batch_size'),
+        'batch_status': job.get('batch_status'),
+        'total': job.get('total', 0),
+        'completed': job.get('completed', 0),
+        'succeeded': job.get('succeeded', 0),
+        'failed': job.get('failed', 0),
+        'skipped': job.get('skipped', 0),
+        'cancel_requested': job.get('cancel_requested', False),
+        'items': job.get('items', {}),
+        'filename': job.get('filename'),
+        'stats': job.get('stats'),
+        'message': job.get('message'),
+        'created_at': job['created_at'].isoformat() if job.get('created_at') else None,
+        'finished_at': job['finished_at'].isoformat() if job.get('finished_at') else None
+    }
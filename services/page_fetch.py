@@ -0,0 +1,252 @@
+"""
+Cached fetching of company web pages.
+
+Enrichment downloads the same homepages again and again (retries, bulk jobs,
+re-running a company). Pages are kept in an in-process LRU and, when
+attached, in the shared `page_cache` collection:
+
+    - a cached page is served as-is for `ttl` seconds
+    - after that it is revalidated with If-None-Match / If-Modified-Since,
+      so an unchanged page costs a 304 instead of a download
+    - entries are dropped after `max_age` (MongoDB TTL index)
+
+Responses are streamed and decoded incrementally, and downloads stop after
+`max_bytes`, so a huge or endless page cannot blow up a worker.
+"""
+import codecs
+import hashlib
+import threading
+import time
+from datetime import datetime, timedelta
+
+import requests
+
+from llm.cache import LRUCache
+
+DEFAULT_PAGE_TTL = 6 * 60 * 60           # seconds a page is served without revalidation
+DEFAULT_PAGE_MAX_AGE = 7 * 24 * 60 * 60  # seconds a page is kept for revalidation
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024
+DEFAULT_TIMEOUT = 10
+DEFAULT_MAX_ENTRIES = 256
+
+CHUNK_SIZE = 16 * 1024
+
+USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+              'Chrome/91.0.4472.124 Safari/537.36')
+
+
+def page_key(url):
+    """Cache key for a URL."""
+    return hashlib.sha256(url.strip().encode('utf-8')).hexdigest()
+
+
+class PageCache:
+    """Two-tier (memory, then MongoDB) store of fetched pages keyed by URL."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_age=DEFAULT_PAGE_MAX_AGE, collection=None):
+        self.max_age = max_age
+        self.memory = LRUCache(max_entries=max_entries, ttl=max_age)
+        self.collection = None
+        if collection is not None:
+            self.attach_mongo(collection)
+
+    def attach_mongo(self, collection):
+        """Share cached pages across workers through a MongoDB collection."""
+        # MongoDB removes documents once expires_at has passed
+        collection.create_index('expires_at', expireAfterSeconds=0)
+        self.collection = collection
+
+    def get(self, url):
+        """Return the stored entry for a URL (fresh or stale), or None."""
+        key = page_key(url)
+        entry = self.memory.get(key)
+        if entry is not None or self.collection is None:
+            return entry
+
+        try:
+            doc = self.collection.find_one({'_id': key, 'expires_at': {'$gt': datetime.utcnow()}})
+        except Exception as e:
+            print(f"Error reading page cache from database: {str(e)}")
+            return None
+        if not doc:
+            return None
+        entry = {field: doc.get(field) for field in ('url', 'text', 'etag', 'last_modified', 'truncated',
+                                                     'partial', 'fresh_until')}
+        self.memory.set(key, entry)
+        return entry
+
+    def set(self, url, entry):
+        """Store an entry in every tier."""
+        key = page_key(url)
+        self.memory.set(key, entry)
+        if self.collection is None:
+            return
+        try:
+            self.collection.update_one(
+                {'_id': key},
+                {'$set': dict(entry, expires_at=datetime.utcnow() + timedelta(seconds=self.max_age))},
+                upsert=True
+            )
+        except Exception as e:
+            print(f"Error writing page cache to database: {str(e)}")
+
+    def clear(self):
+        self.memory.clear()
+        if self.collection is not None:
+            self.collection.delete_many({})
+
+
+class PageFetcher:
+    """Fetches pages through a PageCache with conditional requests and a size cap."""
+
+    def __init__(self, cache=None, ttl=DEFAULT_PAGE_TTL, max_bytes=DEFAULT_MAX_BYTES, timeout=DEFAULT_TIMEOUT):
+        self.cache = cache if cache is not None else PageCache()
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = USER_AGENT
+
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'revalidated': 0, 'downloads': 0, 'truncated': 0, 'stopped': 0,
+                          'errors': 0, 'bytes': 0}
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            self._counters[counter] += amount
+
+    def fetch(self, url, use_cache=True, on_text=None, timeout=None):
+        """Fetch a page, from the cache when possible.
+
+        Args:
+            url: Page URL
+            use_cache: Set to False to always download (the result is not stored)
+            on_text: Optional callback receiving the text as it is decoded;
+                returning True stops the download there. Pages cut short this
+                way are returned with `stopped` set and cached as partial
+                pages, which are only served to later `on_text` callers
+                (they replay the text that stopped the download).
+            timeout: Request timeout in seconds (defaults to `self.timeout`)
+
+        Returns:
+            Dictionary with url, status, text, truncated, stopped and from_cache.
+            Failed requests return a status other than 200 and empty text;
+            network errors are raised.
+        """
+        entry = self.cache.get(url) if use_cache else None
+        if entry and entry.get('partial') and on_text is None:
+            # A partial page is no use to a caller that needs the whole text
+            entry = None
+        if entry and entry.get('fresh_until', 0) > time.time():
+            self._count('hits')
+            return _page(entry, 200, from_cache=True, on_text=on_text)
+
+        headers = {}
+        if entry and not entry.get('partial'):
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        try:
+            with self.session.get(url, headers=headers, timeout=timeout or self.timeout, stream=True) as response:
+                if response.status_code == 304 and entry:
+                    # Unchanged since we stored it
+                    entry = dict(entry, fresh_until=time.time() + self.ttl)
+                    self.cache.set(url, entry)
+                    self._count('revalidated')
+                    return _page(entry, 200, from_cache=True, on_text=on_text)
+
+                if response.status_code != 200:
+                    return {'url': url, 'status': response.status_code, 'text': '', 'truncated': False,
+                            'stopped': False, 'from_cache': False}
+
+                text, size, truncated, stopped = self._read_text(response, on_text)
+                entry = {
+                    'url': url,
+                    'text': text,
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                    'truncated': truncated,
+                    'partial': stopped,
+                    'fresh_until': time.time() + self.ttl
+                }
+        except requests.RequestException:
+            self._count('errors')
+            raise
+
+        self._count('downloads')
+        self._count('bytes', size)
+        if truncated:
+            self._count('truncated')
+        if stopped:
+            self._count('stopped')
+        if use_cache:
+            self.cache.set(url, entry)
+        return _page(entry, 200)
+
+    def _read_text(self, response, on_text=None):
+        """Decode a streamed response body up to `max_bytes`.
+
+        Returns:
+            Tuple of (text, bytes read, truncated, stopped by on_text)
+        """
+        decoder = _decoder_for(response)
+        parts = []
+        size = 0
+        truncated = False
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            if size + len(chunk) > self.max_bytes:
+                chunk = chunk[:self.max_bytes - size]
+                truncated = True
+            size += len(chunk)
+            text = decoder.decode(chunk)
+            parts.append(text)
+            if on_text and text and on_text(text):
+                return ''.join(parts), size, truncated, True
+            if truncated:
+                break
+        text = decoder.decode(b'', final=True)
+        parts.append(text)
+        if on_text and text:
+            on_text(text)
+        return ''.join(parts), size, truncated, False
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        counters.update({
+            'memory_entries': len(self.cache.memory),
+            'ttl': self.ttl,
+            'max_bytes': self.max_bytes,
+            'mongo_enabled': self.cache.collection is not None
+        })
+        return counters
+
+
+def _decoder_for(response):
+    """Incremental decoder for the response charset (UTF-8 when none is declared)."""
+    encoding = 'utf-8'
+    if 'charset' in response.headers.get('Content-Type', '').lower() and response.encoding:
+        encoding = response.encoding
+    try:
+        return codecs.getincrementaldecoder(encoding)(errors='replace')
+    except LookupError:
+        return codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+
+def _page(entry, status, from_cache=False, on_text=None):
+    if on_text:
+        on_text(entry['text'])
+    return {
+        'url': entry['url'],
+        'status': status,
+        'text': entry['text'],
+        'truncated': entry.get('truncated', False),
+        'stopped': bool(entry.get('partial')),
+        'from_cache': from_cache
+    }
+
+
+# Shared by the enrichment routes and background jobs; app.py attaches MongoDB
+page_fetcher = PageFetcher()
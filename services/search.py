@@ -0,0 +1,250 @@
+"""
+Company search for the dashboard.
+
+"All fields" searches go through a weighted MongoDB text index and are
+ranked by relevance. Field-specific searches keep the case-insensitive
+substring match on the chosen field.
+
+Pages are addressed with opaque keyset cursors and totals are approximate
+(estimated or briefly cached), so deep pages cost the same as the first.
+"""
+import base64
+import json
+import threading
+import time
+
+import pymongo
+from bson.objectid import ObjectId
+from pymongo.errors import OperationFailure
+
+# Fields covered by the dashboard search
+SEARCH_FIELDS = ['name', 'website', 'products', 'services', 'location', 'keyword']
+
+TEXT_INDEX_NAME = 'companies_text_search'
+
+# Seconds a filtered match count is reused before it is recounted
+COUNT_CACHE_TTL = 60
+
+# Matches on the company name rank above matches in longer free-text fields
+TEXT_INDEX_WEIGHTS = {
+    'name': 10,
+    'keyword': 5,
+    'products': 3,
+    'services': 3,
+    'website': 2,
+    'location': 2
+}
+
+
+def ensure_search_indexes(db):
+    """Create the text index used by the "All Fields" search."""
+    db.companies.create_index(
+        [(field, pymongo.TEXT) for field in SEARCH_FIELDS],
+        name=TEXT_INDEX_NAME,
+        weights=TEXT_INDEX_WEIGHTS,
+        default_language='english'
+    )
+
+
+def regex_query(search_query, search_field='all'):
+    """Case-insensitive substring filter on one field, or on every search field."""
+    if search_field == 'all':
+        return {'$or': [{field: {'$regex': search_query, '$options': 'i'}} for field in SEARCH_FIELDS]}
+    return {search_field: {'$regex': search_query, '$options': 'i'}}
+
+
+def text_query(search_query):
+    """Text index filter plus the projection and sort for relevance ranking."""
+    query = {'$text': {'$search': search_query}}
+    projection = {'score': {'$meta': 'textScore'}}
+    sort = [('score', {'$meta': 'textScore'})]
+    return query, projection, sort
+
+
+def count_companies(collection, query):
+    """Total for the pagination bar.
+
+    Unfiltered totals come from the collection metadata
+    (`estimated_document_count`); filtered totals are counted once and
+    cached for COUNT_CACHE_TTL seconds.
+    """
+    if not query:
+        return collection.estimated_document_count()
+    return _count_cache.get_or_count(collection, query)
+
+
+def resolve_search(collection, search_query='', search_field='all'):
+    """Work out the filter for a dashboard search.
+
+    Whole-word "All Fields" searches use the text index. When the text index
+    finds nothing (e.g. a partial word) or is not available, the search falls
+    back to the substring match so results never go missing.
+
+    Returns:
+        Tuple of (query, projection, sort, total). `sort` is only set for
+        relevance-ranked text searches.
+    """
+    if not search_query:
+        return {}, None, None, count_companies(collection, {})
+
+    if search_field == 'all':
+        query, projection, sort = text_query(search_query)
+        try:
+            total = count_companies(collection, query)
+            if total:
+                return query, projection, sort, total
+        except OperationFailure as e:
+            print(f"Text search unavailable, using regex search: {str(e)}")
+
+    query = regex_query(search_query, search_field)
+    return query, None, None, count_companies(collection, query)
+
+
+def encode_cursor(state):
+    """Pack pagination state into an opaque URL-safe token."""
+    payload = json.dumps(state, separators=(',', ':'), default=str).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Unpack a cursor token; returns None for missing or malformed tokens."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if 'after' in state:
+            state['after'] = ObjectId(state['after'])
+        if 'before' in state:
+            state['before'] = ObjectId(state['before'])
+        return state
+    except Exception:
+        return None
+
+
+def paginate_companies(collection, search_query='', search_field='all', per_page=10, cursor=None, page=None):
+    """Load one dashboard page.
+
+    Pages are walked with keyset cursors over `_id`, so the cost of a page
+    does not depend on how deep it is. Relevance-ranked text searches and
+    explicit page jumps (`page`) fall back to skip/limit.
+
+    Returns:
+        Dictionary with companies, total, total_pages, current_page,
+        prev_cursor, next_cursor and last_cursor
+    """
+    query, projection, sort, total = resolve_search(collection, search_query, search_field)
+
+    if per_page is None:
+        companies = list(collection.find(query, projection).sort(sort or [('_id', 1)]))
+        return _page_result(companies, len(companies), 1, 1)
+
+    total_pages = max(1, (total + per_page - 1) // per_page)  # Ceiling division
+    state = decode_cursor(cursor) or {}
+    current_page = min(max(int(state.get('p', page or 1)), 1), total_pages)
+
+    if sort or ('after' not in state and 'before' not in state and not state.get('last')):
+        # Offset pagination: ranked results, the first page and page jumps
+        companies = list(
+            collection.find(query, projection).sort(sort or [('_id', 1)])
+            .skip((current_page - 1) * per_page).limit(per_page)
+        )
+        if sort:
+            return _page_result(
+                companies, total, current_page, total_pages,
+                prev_cursor=encode_cursor({'p': current_page - 1}) if current_page > 1 else None,
+                next_cursor=encode_cursor({'p': current_page + 1}) if current_page < total_pages else None,
+                last_cursor=encode_cursor({'p': total_pages})
+            )
+        has_prev = current_page > 1
+        has_next = len(companies) == per_page and current_page < total_pages
+    elif 'after' in state:
+        companies = list(
+            collection.find(_and_id(query, {'$gt': state['after']}), projection)
+            .sort('_id', 1).limit(per_page + 1)
+        )
+        has_next = len(companies) > per_page
+        companies = companies[:per_page]
+        has_prev = True
+    else:
+        # Walk backwards from a cursor, or from the end for the last page
+        if 'before' in state:
+            id_query = _and_id(query, {'$lt': state['before']})
+            page_size = per_page
+        else:
+            # The last page only holds the remainder, so it lines up with the others
+            id_query = query
+            page_size = total - (total_pages - 1) * per_page
+            if not 0 < page_size <= per_page:
+                page_size = per_page
+            current_page = total_pages
+        companies = list(collection.find(id_query, projection).sort('_id', -1).limit(page_size + 1))
+        has_prev = len(companies) > page_size
+        companies = list(reversed(companies[:page_size]))
+        has_next = 'before' in state
+
+    if not companies:
+        return _page_result(companies, total, current_page, total_pages,
+                            last_cursor=encode_cursor({'last': True, 'p': total_pages}))
+
+    return _page_result(
+        companies, total, current_page, total_pages,
+        prev_cursor=encode_cursor({'before': companies[0]['_id'], 'p': current_page - 1}) if has_prev else None,
+        next_cursor=encode_cursor({'after': companies[-1]['_id'], 'p': current_page + 1}) if has_next else None,
+        last_cursor=encode_cursor({'last': True, 'p': total_pages})
+    )
+
+
+def _and_id(query, id_condition):
+    """Add an `_id` range condition to a search filter."""
+    if not query:
+        return {'_id': id_condition}
+    return {'$and': [query, {'_id': id_condition}]}
+
+
+def _page_result(companies, total, current_page, total_pages,
+                 prev_cursor=None, next_cursor=None, last_cursor=None):
+    return {
+        'companies': companies,
+        'total': total,
+        'current_page': current_page,
+        'total_pages': total_pages,
+        'prev_cursor': prev_cursor,
+        'next_cursor': next_cursor,
+        'last_cursor': last_cursor
+    }
+
+
+class CountCache:
+    """Short-lived cache of filtered counts, keyed by the query."""
+
+    def __init__(self, ttl=COUNT_CACHE_TTL, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get_or_count(self, collection, query):
+        key = (collection.full_name, json.dumps(query, sort_keys=True, default=str))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > now:
+                return entry[0]
+
+        total = collection.count_documents(query)
+
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries = {k: v for k, v in self._entries.items() if v[1] > now}
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+            self._entries[key] = (total, now + self.ttl)
+        return total
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_count_cache = CountCache()
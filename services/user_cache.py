@@ -0,0 +1,50 @@
+"""
+Short-lived in-process cache for Flask-Login user lookups.
+
+`load_user` runs on every authenticated request, so the identity fields are
+kept in memory for a few seconds instead of being read from MongoDB each
+time. The admin routes that change or delete a user invalidate its entry;
+other worker processes pick up the change once the TTL expires.
+"""
+import threading
+import time
+
+DEFAULT_USER_CACHE_TTL = 60  # seconds
+
+# Fields needed to build the Flask-Login user
+USER_FIELDS = {'username': 1, 'email': 1, 'role': 1}
+
+
+class UserCache:
+    """Thread-safe TTL cache of user documents keyed by user ID."""
+
+    def __init__(self, ttl=DEFAULT_USER_CACHE_TTL, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id, loader):
+        """Return the cached user document, calling `loader(user_id)` on a miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[1] > now:
+                return entry[0]
+
+        user_data = loader(user_id)
+        if user_data is not None and self.ttl > 0:
+            with self._lock:
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+                self._entries[user_id] = (user_data, now + self.ttl)
+        return user_data
+
+    def invalidate(self, user_id):
+        """Drop a user so the next request reads it from the database."""
+        with self._lock:
+            self._entries.pop(str(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()